@@ -12,14 +12,20 @@ Year: 2024-2025
 ####python third party
 import numpy
 from PySide6.QtWidgets import QWidget, QGridLayout, QLabel, QPlainTextEdit,\
-                              QPushButton, QSpinBox, QTabWidget, QFileDialog
+                              QPushButton, QSpinBox, QTabWidget, QFileDialog,\
+                              QCheckBox
 from matplotlib import patches
 
 ####Local imports
 from . import plots
+from . import slider
+from . import region_overlay
+from . import filter_worker
+from . import sweep_worker
 from ..utils import open_save_files
-from ..processing import enhancers
 from ..processing import segmentation_regions
+from ..processing import threshold_sweep
+from ..processing import region_index
 
 class AnalysisWindow(QWidget):
     """
@@ -52,6 +58,19 @@ class AnalysisWindow(QWidget):
         ##areas are in number of pixel, so to get an area in mm2 we need
         self.conversion_area = pix_to_mm * pix_to_mm
 
+        ###The gaussian filter runs in the background
+        self.gaussian = filter_worker.BackgroundFilter(self)
+        self.gaussian.finished.connect(self.gaussian_filter_done)
+        self.gaussian.failed.connect(self.gaussian_filter_failed)
+        self.filter_source = None
+        self.filter_sigma = 0
+
+        ###The threshold sweep runs in the background
+        self.sweeper = sweep_worker.BackgroundSweep(self)
+        self.sweeper.finished.connect(self.threshold_sweep_done)
+        self.sweeper.failed.connect(self.threshold_sweep_failed)
+        self.sweep_source = None
+
         ##Make the layout
         self.make_layout()
 
@@ -76,11 +95,15 @@ class AnalysisWindow(QWidget):
         grid.addWidget(reset_to_cropped_button, row, 2, 1, 1)
 
         ###Gaussian filter
-        gaussian_filter = QPushButton('Gaussian Filtering')
-        grid.addWidget(gaussian_filter, row, 3, 1, 1)
+        self.gaussian_button = QPushButton('Gaussian Filtering')
+        grid.addWidget(self.gaussian_button, row, 3, 1, 1)
         self.filtersigma = QSpinBox()
         grid.addWidget(self.filtersigma, row, 4, 1, 1)
 
+        ##Threshold sweep
+        self.sweep_button = QPushButton('Threshold sweep')
+        grid.addWidget(self.sweep_button, row, 5, 1, 1)
+
         ##Run region labelling
         self.run_region_label = QPushButton('Run Region identification')
         grid.addWidget(self.run_region_label, row, 9, 1, 2)
@@ -114,6 +137,11 @@ class AnalysisWindow(QWidget):
                                       conversion=self.conversion_area)
         self.tabbox.addTab(self.indiv_region_plot, 'Explore Regions')
 
+        ###Threshold sweep panel
+        self.sweep_plot = Plot(sweep=True)
+        self.tabbox.addTab(self.sweep_plot, 'Threshold sweep')
+        self.sweep_plot.display_data(clear = True, datatype='empty')
+
         ##Result box
         self.resultsbox = QPlainTextEdit()
         self.resultsbox.setReadOnly(True)
@@ -132,10 +160,12 @@ class AnalysisWindow(QWidget):
         crop_button.clicked.connect(self.crop_image)
         reset_button.clicked.connect(self.reset_image)
         reset_to_cropped_button.clicked.connect(self.reset_to_cropped)
-        gaussian_filter.clicked.connect(self.apply_gaussian_filter)
+        self.gaussian_button.clicked.connect(self.apply_gaussian_filter)
         clr_txt_button.clicked.connect(self.clear_result_box)
         save_txt_button.clicked.connect(self.save_result_box)
         self.run_region_label.clicked.connect(self.run_region_id)
+        self.sweep_button.clicked.connect(self.run_threshold_sweep)
+        self.sweep_plot.threshold.valueChanged.connect(self.update_threshold)
 
     def reset_image(self):
         '''
@@ -211,6 +241,9 @@ class AnalysisWindow(QWidget):
     def apply_gaussian_filter(self):
         '''
         This method applies a gaussian filter
+        The filter runs in the background, the filtered image is displayed
+        when it is ready (see gaussian_filter_done)
+
         Parameter
         ---------
         none
@@ -220,21 +253,62 @@ class AnalysisWindow(QWidget):
         None 
         '''
         ###Get sigma
-        sigma = self.filtersigma.value()
+        self.filter_sigma = self.filtersigma.value()
 
         ##get image
-        ondisplay = self.primary.ondisplay.get_array()
+        self.filter_source = self.primary.ondisplay.get_array()
 
         ##apply filter
-        filtered = enhancers.gaussian_filter(ondisplay, sigma)
+        self.gaussian_button.setEnabled(False)
+        self.gaussian.start(self.filter_source, self.filter_sigma)
+
+    def gaussian_filter_done(self, filtered, duration):
+        '''
+        This method displays the image filtered in the background
+
+        Parameter
+        ---------
+        filtered    :   numpy array
+                        filtered image
+        duration    :   float
+                        time needed to filter [s]
+
+        Return
+        ------
+        None 
+        '''
+        self.gaussian_button.setEnabled(True)
+
+        ##the image changed in the meantime (reset, crop): nothing to display
+        if self.primary.ondisplay.get_array() is not self.filter_source:
+            self.filter_source = None
+            return
+        self.filter_source = None
 
         ##display it
         self.primary.display_data(filtered, clear=True)
 
         ###Write info the result box
-        txt = f'Gaussian filter:\nsigma={sigma}'
+        txt = f'Gaussian filter:\nsigma={self.filter_sigma} ({duration:.2f} s)'
         self.write_to_result_box(txt)
 
+    def gaussian_filter_failed(self, error):
+        '''
+        This method is called if the gaussian filter could not be applied
+
+        Parameter
+        ---------
+        error   :   str
+                    error message
+
+        Return
+        ------
+        None 
+        '''
+        self.gaussian_button.setEnabled(True)
+        self.filter_source = None
+        self.write_to_result_box(f'Gaussian filter failed:\n{error}')
+
     def write_to_result_box(self, text):
         '''
         This method writes in the result box on the right
@@ -304,8 +378,14 @@ class AnalysisWindow(QWidget):
         ##get image
         ondisplay = self.primary.ondisplay.get_array()
 
-        ##Region segementaiton
-        labeled_image, self.results = segmentation_regions.find_regions(ondisplay, self.conf)
+        ##Region segementaiton (from the cache if this image was already analysed)
+        cache = self.conf.get('region_cache')
+        if cache is not None:
+            labeled_image, self.results = cache.find_regions(ondisplay, self.conf,
+                                                             segmentation_regions.find_regions)
+        else:
+            labeled_image, self.results = segmentation_regions.find_regions(ondisplay,
+                                                                            self.conf)
 
         ##Update plots
         self.region_plot.display_data(labeled_image, clear=True, cmap='gray')
@@ -314,7 +394,6 @@ class AnalysisWindow(QWidget):
         self.indiv_region_plot.draw_single_region(properties=self.results)
         self.indiv_region_plot.regioncounter.setMaximum(len(self.results['area']))
 
-        self.region_plot.display_data(self.results, datatype='scatter')
         self.region_plot.display_data(self.results, datatype='regions')
         self.region_hist.display_data(self.results['area'], datatype='hist',clear=True)
 
@@ -325,14 +404,128 @@ class AnalysisWindow(QWidget):
         txt += f"Number of regions identified: {len(self.results['area'])}\n"
         txt += f"Smallest region: {min(self.results['area'])} pixels\n"
         txt += f"Largest region: {max(self.results['area'])} pixels"
+        if 'peak_memory' in self.results:
+            txt += f"\nPeak memory used: {round(self.results['peak_memory'], 1)} MB"
+        self.write_to_result_box(txt)
+
+    def run_threshold_sweep(self):
+        '''
+        This method computes the regions of the image on display
+        for all the thresholds at once. The slider of the threshold
+        sweep panel then shows the regions for each threshold.
+        The component tree is built in the background, the panel is
+        updated when it is ready (see threshold_sweep_done)
+
+        Parameter
+        ---------
+        None
+
+        Return
+        ------
+        None
+        '''
+        ##get image
+        self.sweep_source = self.primary.ondisplay.get_array()
+
+        ##build the component tree
+        self.sweep_button.setEnabled(False)
+        self.sweeper.start(numpy.asarray(self.sweep_source))
+
+    def threshold_sweep_done(self, sweep, duration):
+        '''
+        This method displays the threshold sweep computed in the background
+
+        Parameter
+        ---------
+        sweep       :   ThresholdSweep
+                        sweep of the image
+        duration    :   float
+                        time needed to compute the sweep [s]
+
+        Return
+        ------
+        None
+        '''
+        self.sweep_button.setEnabled(True)
+
+        ##the image changed in the meantime (reset, crop, filter): nothing to display
+        if self.primary.ondisplay.get_array() is not self.sweep_source:
+            self.sweep_source = None
+            return
+        self.sweep_source = None
+
+        self.sweep = sweep
+        self.sweep_counts = self.sweep.counts(self.conf['Analysis']['minimum_size'])
+        self.sweep_white = self.sweep.white_ratios()
+
+        ##display the binary image at the threshold used by the region identification
+        threshold = self.sweep.default_threshold()
+        self.sweep_plot.display_data(self.sweep.gray > threshold, clear=True, cmap='gray')
+        self.sweep_plot.threshold.setEnabled(True)
+        self.sweep_plot.threshold.blockSignals(True)
+        self.sweep_plot.threshold.setValue(threshold)
+        self.sweep_plot.threshold.blockSignals(False)
+        self.update_threshold(threshold)
+        self.tabbox.setCurrentWidget(self.sweep_plot)
+
+        txt = 'Threshold sweep (look at corresponding panel):\n'
+        txt += f'Default threshold: {threshold}\n'
+        txt += f'Maximum number of regions: {max(self.sweep_counts)} '
+        txt += f'(threshold={numpy.argmax(self.sweep_counts)})\n'
+        txt += f'Computed in {duration:.2f} s'
         self.write_to_result_box(txt)
 
+    def threshold_sweep_failed(self, error):
+        '''
+        This method is called if the threshold sweep could not be computed
+
+        Parameter
+        ---------
+        error   :   str
+                    error message
+
+        Return
+        ------
+        None
+        '''
+        self.sweep_button.setEnabled(True)
+        self.sweep_source = None
+        self.write_to_result_box(f'Threshold sweep failed:\n{error}')
+
+    def update_threshold(self, threshold):
+        '''
+        This method updates the threshold sweep panel when the
+        threshold slider is moved (no computation is needed)
+
+        Parameter
+        ---------
+        threshold   :   int
+                        new threshold
+
+        Return
+        ------
+        None
+        '''
+        if not hasattr(self, 'sweep'):
+            return
+
+        areas = self.sweep.areas(threshold, self.conf['Analysis']['minimum_size'])
+        txt = f'Threshold: {threshold} | Regions: {self.sweep_counts[threshold]} | '
+        txt += f'White: {round(100*self.sweep_white[threshold], 1)}%'
+        if len(areas) > 0:
+            txt += f' | Median area: {numpy.median(areas):g} pixels'
+        self.sweep_plot.threshold_label.setText(txt)
+
+        ##update the image on display (no new plot)
+        self.sweep_plot.ondisplay.set_data(self.sweep.gray > threshold)
+        self.sweep_plot.plot.draw_idle()
+
 class Plot(QTabWidget):
     '''
     This class codes a simple panel with a plot inside
     '''
     def __init__(self, explorer=False, allregions=False, results_box_write=False,\
-                 conversion=False):
+                 conversion=False, sweep=False):
         '''
         Class initialization
         Paramaeters
@@ -347,6 +540,9 @@ class Plot(QTabWidget):
 
         results_box:    method (function)
                         the method to write in the result box
+
+        sweep:      bool
+                    if True, a threshold slider is displayed
         '''
         ###create the tab
         QTabWidget.__init__(self)
@@ -377,19 +573,36 @@ class Plot(QTabWidget):
             grid.addWidget(self.regioncounter, 7, 7, 1, 1)
             self.print_properties = QPushButton('Print region prop')
             grid.addWidget(self.print_properties, 7, 5, 1, 1)
+            self.hover_label = QLabel('Click on a region to select it')
+            grid.addWidget(self.hover_label, 8, 0, 1, 8)
 
             ###events
             self.regioncounter.valueChanged.connect(self.draw_single_region)
             self.print_properties.clicked.connect(self.write_to_box_in_analysis_window)
+            self.plot.mpl_connect('button_press_event', self.select_region)
+            self.plot.mpl_connect('motion_notify_event', self.hover_region)
 
         elif allregions is True:
             ##Conversion pix_to_mm area
             self.conversion = conversion
             ##widgets
+            self.show_regions = QCheckBox('Show regions')
+            self.show_regions.setChecked(True)
+            grid.addWidget(self.show_regions, 7, 6, 1, 1)
             self.save_properties = QPushButton('Save all regions properties')
             grid.addWidget(self.save_properties, 7, 7, 1, 1)
+            self.show_regions.toggled.connect(self.toggle_regions)
             self.save_properties.clicked.connect(self.save_properties_to_text)
 
+        elif sweep is True:
+            ##widgets
+            self.threshold_label = QLabel('Run the threshold sweep first')
+            grid.addWidget(self.threshold_label, 8, 0, 1, 8)
+            self.threshold = slider.Slider()
+            self.threshold.setMaximum(threshold_sweep.NLEVELS - 1)
+            self.threshold.setEnabled(False)
+            grid.addWidget(self.threshold, 7, 5, 1, 3)
+
     def display_data(self, data=None, cmap=None, datatype='image', clear=False):
         '''
         Display data in the plot area
@@ -414,6 +627,9 @@ class Plot(QTabWidget):
                 del self.region_indiv
                 del self.region_center
 
+            ###the regions were drawn on the previous axes
+            self.overlay = None
+
         ###Display
         if datatype == 'image':
             self.ondisplay = self.axs.imshow(data, cmap=cmap)
@@ -459,18 +675,29 @@ class Plot(QTabWidget):
         ##make the region an attribute
         self.results = regions
 
-        ##Loop over the region
-        for region in self.results['bbox']:
-            ##get the box limits
-            min_row, min_col, max_row, max_col = region
-            ##Define the rectanle
-            rect = patches.Rectangle((min_col, min_row), max_col-min_col,
-                                     max_row - min_row,
-                                     linewidth=1,
-                                     edgecolor='y',
-                                     facecolor='none')
-            ##And draw it
-            self.axs.add_patch(rect)
+        ##All the boxes and centers at once (only the visible ones are drawn)
+        if getattr(self, 'overlay', None) is not None:
+            self.overlay.remove()
+        self.overlay = region_overlay.RegionOverlay(self.axs, self.results)
+        if hasattr(self, 'show_regions'):
+            self.overlay.set_visible(self.show_regions.isChecked())
+
+    def toggle_regions(self, visible):
+        '''
+        This method shows or hides the regions (nothing is drawn again
+        from scratch)
+
+        Parameters
+        ----------
+        visible     : bool
+                      if True the regions are displayed
+
+        Return
+        ------
+        None
+        '''
+        if getattr(self, 'overlay', None) is not None:
+            self.overlay.set_visible(visible)
 
     def draw_single_region(self, properties = None):
         '''
@@ -496,8 +723,11 @@ class Plot(QTabWidget):
             self.region_center.remove()
 
         ###if properties dictionary is passed, we update the results
+        ###(and the index used to find the region under the cursor)
         if isinstance(properties, dict):
             self.results = properties
+            self.index = region_index.RegionIndex(self.results['bbox'])
+            self.hovered = -1
 
         if hasattr(self, 'results'):
 
@@ -526,6 +756,67 @@ class Plot(QTabWidget):
             self.plot.draw()
             self.fig.tight_layout()
 
+    def region_under_cursor(self, event):
+        '''
+        This method finds the region under the mouse
+
+        Parameters
+        ----------
+        event   :   matplotlib MouseEvent
+                    mouse event on the plot
+
+        Return
+        ------
+        region  :   int
+                    index of the region (0 is the biggest), -1 if none
+        '''
+        ##no region, outside the image, or zoom/pan in use
+        if not hasattr(self, 'index') or event.inaxes is not self.axs \
+                or event.xdata is None or self.toolbar.mode != '':
+            return -1
+
+        return self.index.find(numpy.floor(event.ydata + 0.5),
+                               numpy.floor(event.xdata + 0.5))
+
+    def select_region(self, event):
+        '''
+        This method selects the region that was clicked on
+
+        Parameters
+        ----------
+        event   :   matplotlib MouseEvent
+                    mouse click on the plot
+        '''
+        region = self.region_under_cursor(event)
+        if region >= 0:
+            ##the spinbox draws the region
+            self.regioncounter.setValue(region + 1)
+
+    def hover_region(self, event):
+        '''
+        This method gives the properties of the region under the mouse
+
+        Parameters
+        ----------
+        event   :   matplotlib MouseEvent
+                    mouse move on the plot
+        '''
+        region = self.region_under_cursor(event)
+        if region == getattr(self, 'hovered', -1):
+            return
+        self.hovered = region
+
+        if region < 0:
+            self.hover_label.setText('Click on a region to select it')
+            return
+
+        area = self.results['area'][region]
+        self.hover_label.setText(f"Region #{region + 1}: "
+                                 f"area = {int(area)} pixels "
+                                 f"({round(self.conversion * area, 4)} mm2), "
+                                 f"center = ({round(self.results['x'][region], 1)}, "
+                                 f"{round(self.results['y'][region], 1)})")
+
     def write_to_box_in_analysis_window(self):
         '''
         This method uses the function passed as argument 
@@ -557,19 +848,11 @@ class Plot(QTabWidget):
         ------
         None
         '''
-        ##Prepare catalog
-        txt = '#x\ty\tarea[pixels]\tarea[mm2]\n'
-
-        for i,x in enumerate(self.results['x']):
-            del x
-            line = f"{self.results['x'][i]}\t{self.results['y'][i]}"
-            line += f"\t{int(self.results['area'][i])}"
-            line += f"\t{self.conversion*self.results['area'][i]}\n"
-            txt += line
-
+        ##the format is given by the extension (streamed to the file)
         save_path, _ = QFileDialog.getSaveFileName(self, "Export region catalog",
                                                    "Catalog.txt",
-                                                   "Text Files, (*.txt)")
+                                                   "Text Files (*.txt);;CSV Files (*.csv);;"
+                                                   "Numpy binary catalog (*.npy)")
 
         if save_path:
-            open_save_files.save_txt_to_file(save_path, txt)
+            open_save_files.save_catalogue(save_path, self.results, self.conversion)
@@ -0,0 +1,164 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It draws the close-up of the detail window: a small window of the image
+around the cursor.
+
+The image artist is created once for each image. When the cursor moves,
+only the window around the cursor is sliced from the full image and given
+to the artist, and only that artist is drawn again (blitting). The cursor
+positions are collected and the close-up is updated at most once per
+display frame.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+
+####python third party
+import numpy
+from PySide6.QtCore import QTimer
+
+####local imports
+
+###Time between two updates of the close-up [ms] (one display frame)
+FRAME_INTERVAL = 16
+
+
+class CloseUp:
+    '''
+    This class draws the close-up of an image around a position
+    '''
+    def __init__(self, canvas, fig, axs):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        canvas  :   FigureCanvasQT
+                    area onto which the close-up is drawn
+        fig     :   Figure
+                    figure of the close-up
+        axs     :   Axes
+                    axes of the close-up
+        '''
+        self.canvas = canvas
+        self.fig = fig
+        self.axs = axs
+
+        self.data = None
+        self.image = None
+        self.window = (0, 0)
+        self.position = None
+        self.background = None
+
+        ###cursor positions are coalesced: one update per frame
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(FRAME_INTERVAL)
+        self.timer.timeout.connect(self.update)
+
+        ###the background is saved each time the whole figure is drawn
+        self.canvas.mpl_connect('draw_event', self.save_background)
+
+    def set_image(self, data, window_size):
+        '''
+        This method gives a new image to the close-up. The image artist
+        is created here, once.
+
+        Parameters
+        ----------
+        data        :   numpy array
+                        full image
+        window_size :   int
+                        size of the close-up [pixels of the image]
+        '''
+        self.data = data
+        self.window = (min(int(window_size), data.shape[0]),
+                       min(int(window_size), data.shape[1]))
+
+        ##for grayscale images the colours are the ones of the full image
+        limits = {}
+        if data.ndim == 2 and data.size > 0:
+            limits = {'vmin': numpy.min(data), 'vmax': numpy.max(data)}
+
+        self.axs.cla()
+        self.image = self.axs.imshow(data[:self.window[0], :self.window[1]],
+                                     animated=True, **limits)
+        self.axs.axis('off')
+
+        ##the window shows the cursor position if there is one
+        if self.position is not None:
+            self.image.set_data(self.slice_window(*self.position))
+        self.canvas.draw()
+
+    def slice_window(self, xcursor, ycursor):
+        '''
+        This method extracts the window around the cursor. The window is
+        kept inside the image (no blank space in the corners).
+
+        Parameters
+        ----------
+        xcursor :   float
+                    column of the cursor
+        ycursor :   float
+                    row of the cursor
+
+        Return
+        ------
+        window  :   numpy array
+                    part of the image around the cursor (view, no copy)
+        '''
+        height, width = self.window
+        row0 = int(numpy.clip(round(ycursor - 0.5 * height), 0, self.data.shape[0] - height))
+        col0 = int(numpy.clip(round(xcursor - 0.5 * width), 0, self.data.shape[1] - width))
+
+        return self.data[row0:row0 + height, col0:col0 + width]
+
+    def move_to(self, xcursor, ycursor):
+        '''
+        This method is called for each cursor move: the position is kept
+        and the close-up is updated at the next frame
+
+        Parameters
+        ----------
+        xcursor :   float
+                    column of the cursor
+        ycursor :   float
+                    row of the cursor
+        '''
+        self.position = (xcursor, ycursor)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def update(self):
+        '''
+        This method draws the close-up at the last cursor position
+        '''
+        if self.image is None or self.position is None:
+            return
+
+        self.image.set_data(self.slice_window(*self.position))
+
+        if self.background is None:
+            ##first frame: the whole figure is drawn (and the background saved)
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.axs.draw_artist(self.image)
+            self.canvas.blit(self.axs.bbox)
+
+    def save_background(self, _event):
+        '''
+        This method saves the figure without the image (after a full draw)
+        and draws the image on top of it
+
+        Parameters
+        ----------
+        _event  :   matplotlib DrawEvent
+                    the figure was drawn
+        '''
+        self.background = self.canvas.copy_from_bbox(self.axs.bbox)
+        if self.image is not None:
+            self.axs.draw_artist(self.image)
@@ -9,26 +9,43 @@ Year: 2024-2025
 """
 
 ####Standard Library
-import os
 from functools import partial
 
 ####python third party
 from PySide6 import QtCore
-from PySide6.QtWidgets import QWidget, QListWidget, QListWidgetItem, QGridLayout,\
+from PySide6.QtWidgets import QWidget, QListWidget, QGridLayout,\
                               QScrollArea, QHBoxLayout, QListView, QAbstractItemView,\
-                              QApplication, QPushButton, QDialog, QDialogButtonBox,\
+                              QPushButton, QDialog, QDialogButtonBox,\
                               QLabel, QComboBox, QLineEdit, QFileDialog
 
 ####local imports
 from ..processing import image_processing
-from . import image_qt_display
+from . import thumbnail_loader
 
 class ClusterWindow(QWidget):
     """
     This "window" is a QWidget. If it has no parent, it
     will appear as a free-floating window as we want.
     """
-    def __init__(self, config, images_with_path, images_without_path, zoom_window):
+    def __init__(self, config, images_with_path, images_without_path, zoom_window,
+                 printinlog=None):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        config              :   dict
+                                configuration of STON
+        images_with_path    :   list
+                                images of the cluster, with their path
+        images_without_path :   list
+                                names of the images
+        zoom_window         :   ZoomWindow
+                                detail window of the main window
+        printinlog          :   function or None
+                                prints messages in the log of the main window
+                                (msgtype, text), they are printed if None
+        '''
         super().__init__()
 
         ###setup
@@ -39,8 +56,9 @@ class ClusterWindow(QWidget):
         ##attributes
         self.images_with_path, self.images_without_path = images_with_path, images_without_path
         self.conf = config
-        self.files_dict = self.conf['files_dict']
+        self.project_index = self.conf['project_index']
         self.zoom_window = zoom_window
+        self.printinlog = printinlog
         self.parent()
 
         ##Make the widgets
@@ -105,26 +123,61 @@ class ClusterWindow(QWidget):
 
     def load_images(self):
         '''
-        Load the images
+        Load the images (in the background, see thumbnail_loader)
         '''
-        ###Start displaying
-        for name,nameandpath in zip(self.images_without_path, self.images_with_path):
-            ##Create and Widget item with the file name
-            ##it will go below the image
-            newitem = QListWidgetItem(name)
+        self.loader = thumbnail_loader.ThumbnailLoader(self.images_without_path,
+                                    self.images_with_path,
+                                    self.conf['General_image_display']['downgrade_factor'],
+                                    cache=self.conf.get('thumbnail_cache'),
+                                    image_cache=self.conf.get('image_cache'),
+                                    parent=self)
+
+        ##and add them to the display area when they are ready
+        self.loader.item_ready.connect(self.add_thumbnail)
+        self.loader.failed.connect(self.thumbnail_failed)
+        self.loader.start()
+
+    def closeEvent(self, event): # pylint: disable=invalid-name
+        '''
+        The loading of the images stops when the window is closed
 
-            ##process image
-            data, image = \
-                image_qt_display.make_thumbnail_from_image(nameandpath,
-                                                           self.conf['General_image_display']['downgrade_factor'])
-            ##create the icon
-            item_with_icon = image_qt_display.create_icon(data, image, newitem)
+        Parameters
+        ----------
+        event   :   QCloseEvent
+                    the window is closed
+        '''
+        self.loader.cancel()
+        super().closeEvent(event)
 
-            ##and add it to the display area
-            self.image_list.addItem(item_with_icon)
+    def add_thumbnail(self, _name, item_with_icon):
+        '''
+        Add a thumbnail created by the loader to the display area
 
-            ###Process the event
-            QApplication.processEvents()
+        Parameters
+        ----------
+        _name           :   str
+                            name of the image
+        item_with_icon  :   QListWidgetItem
+                            item with the icon of the image
+        '''
+        self.image_list.addItem(item_with_icon)
+
+    def thumbnail_failed(self, name, error):
+        '''
+        An image of the cluster could not be loaded
+
+        Parameters
+        ----------
+        name    :   str
+                    name of the image
+        error   :   str
+                    error message
+        '''
+        text = f'{name} could not be displayed in the cluster window: {error}'
+        if self.printinlog is None:
+            print(text)
+        else:
+            self.printinlog('Error', text)
 
     def export_cluster_list(self):
         ''' 
@@ -148,11 +201,7 @@ class ClusterWindow(QWidget):
 
         ###if some items are selected we remove them
         image_name = listitems[0].text()
-        for folder in self.files_dict:
-            if os.path.basename(folder) != image_name:
-                for files in self.files_dict[folder]:
-                    if files == image_name:
-                        filepath = os.path.join(folder, image_name)
+        filepath = self.project_index.find(image_name)
 
         ###send to zoom window
         if filepath:
@@ -176,7 +225,8 @@ class ClusterWindow(QWidget):
             ###if the user clicked 'ok' on the mashup dialog we retrieve the configuration and
             ###send it to the mashup maker
             configmashup = dialog.get_mashup_config()
-            final_image = image_processing.make_mashup(configmashup, self.images_with_path)
+            final_image = image_processing.make_mashup(configmashup, self.images_with_path,
+                            self.conf['Meta_image_options'].get('n_processes', 0))
             self.zoom_window.change_image(final_image)
             self.zoom_window.reset_sliders(False)
 
@@ -9,17 +9,18 @@ Year: 2024-2025
 """
 
 ####Standard Library
-from functools import partial
 import os
 
 ####python third party
-import numpy
 from PySide6.QtWidgets import QWidget, QGridLayout, QLabel, QComboBox
 
-from PIL import Image
-
 ##Local imports
 from . import plots
+from . import linked_views
+from ..utils import image_cache
+
+###Maximum number of images in the comparison window
+MAX_IMAGES = 4
 
 
 class CompareWindow(QWidget):
@@ -37,7 +38,7 @@ class CompareWindow(QWidget):
                  configuration dictionary
 
         images_with_path: list
-                          list of files with their path
+                          list of files with their path (2 to MAX_IMAGES)
 
         images_without_path:    list
                                 list of image names
@@ -54,11 +55,13 @@ class CompareWindow(QWidget):
         self.move(400,400)
 
         ###create some attributes
+        self.conf = config
         self.images = images_with_path
-        self.setWindowTitle('STON: Comparison: ' +
-                           f'{images_without_path[0]} and {images_without_path[1]}')
-        self.data1 = None
-        self.data2 = None
+        self.setWindowTitle('STON: Comparison: ' + ' and '.join(images_without_path))
+        self.panes = []
+
+        ###crosshair and common zoom of all the plots
+        self.views = linked_views.LinkedViews()
 
         ###add all the widgets
         self.make_layout()
@@ -68,7 +71,8 @@ class CompareWindow(QWidget):
 
     def make_layout(self):
         '''
-        This method organises the widgets
+        This method organises the widgets: the plots are one below
+        the other (two columns for more than two images)
         Parameter
         ---------
         None
@@ -80,22 +84,19 @@ class CompareWindow(QWidget):
 
         grid = QGridLayout()
         self.setLayout(grid)
-        row = 0
-
-        self.plot1, self.fig1, self.axs1, self.toolbar1 =\
-                plots.create_plot(toolbar=True, transparent=True)
-        self.change_image(self.images[0], 1)
-        grid.addWidget(self.plot1, row, 0, 2, 8)
-        row += 2
-        grid.addWidget(self.toolbar1, row, 4, 1, 4)
-        row += 1
-
-        self.plot2, self.fig2, self.axs2, self.toolbar2 =\
-                plots.create_plot(toolbar=True, transparent=True)
-        self.change_image(self.images[1], 2)
-        grid.addWidget(self.plot2, row, 0, 2, 8)
-        row += 2
-        grid.addWidget(self.toolbar2, row, 4, 1, 4)
+        ncolumns = 1 if len(self.images) <= 2 else 2
+        width = 8 // ncolumns
+
+        for n, image in enumerate(self.images):
+            plot, fig, axs, toolbar = plots.create_plot(toolbar=True, transparent=True)
+            self.panes.append({'plot': plot, 'fig': fig, 'axs': axs, 'toolbar': toolbar,
+                               'data': None})
+            self.change_image(image, n + 1)
+
+            row, column = 3 * (n // ncolumns), width * (n % ncolumns)
+            grid.addWidget(plot, row, column, 2, width)
+            grid.addWidget(toolbar, row + 2, column + width // 2, 1, width - width // 2)
+        row = 3 * ((len(self.images) + ncolumns - 1) // ncolumns)
 
         ###Label for common zoom
         common_zoom = QLabel('Common zoom?')
@@ -112,18 +113,19 @@ class CompareWindow(QWidget):
 
         ###Choice of primary plot
         self.primary = QComboBox()
-        self.primary.addItems(['Top', 'Bottom'])
+        if len(self.images) == 2:
+            self.primary.addItems(['Top', 'Bottom'])
+        else:
+            self.primary.addItems([f'Image {n + 1}' for n in range(len(self.images))])
         grid.addWidget(self.primary, row, 3, 1, 1)
 
         ###Connect events
-        self.plot1.mpl_connect('motion_notify_event', partial(self.crosshair)) ###Crosshair on plot
-        self.plot2.mpl_connect('motion_notify_event', partial(self.crosshair)) ###Crosshair on plot
         self.choice.currentTextChanged.connect(self.setup_common_zoom_and_primary_plot)
         self.primary.currentTextChanged.connect(self.setup_common_zoom_and_primary_plot)
 
     def setup_common_zoom_and_primary_plot(self):
         '''
-        Select the plot that controls the zoom on both plots 
+        Select the plot that controls the zoom on all the plots
 
         Parameters
         ----------
@@ -135,134 +137,9 @@ class CompareWindow(QWidget):
         '''
         ###check if we do a common zoom
         if self.choice.currentText() == 'Yes':
-
-            ###if yes we check what plot is primary
-            if self.primary.currentText() == 'Top':
-                ###if it is the top one we must track the changes on the top one
-                ###And disconnect the bottom one
-                if hasattr(self, 'callback_y_bottom'):
-                    self.axs2.callbacks.disconnect(self.callback_x_bottom)
-                    self.axs2.callbacks.disconnect(self.callback_y_bottom)
-                    delattr(self, 'callback_y_bottom')
-                    delattr(self, 'callback_x_bottom')
-
-                ###and then create the connect the axis to the function
-                self.callback_x_top = \
-                        self.axs1.callbacks.connect('xlim_changed',
-                                                    partial(self.change_limits, 'Top'))
-
-                self.callback_y_top = \
-                        self.axs1.callbacks.connect('ylim_changed',
-                                                    partial(self.change_limits, 'Top'))
-
-            else:
-                ###Same if it is the bottom one
-                if hasattr(self, 'callback_y_top'):
-                    self.axs1.callbacks.disconnect(self.callback_x_top)
-                    self.axs1.callbacks.disconnect(self.callback_y_top)
-                    delattr(self, 'callback_y_top')
-                    delattr(self, 'callback_x_top')
-
-                self.callback_x_bottom = \
-                        self.axs2.callbacks.connect('xlim_changed',
-                                                    partial(self.change_limits, 'Bottom'))
-
-                self.callback_y_bottom = \
-                        self.axs2.callbacks.connect('ylim_changed',
-                                                    partial(self.change_limits, 'Bottom'))
-
-        else: ###<---If the common zoom is set to 'No'
-
-            ###Disconnect the events
-            if hasattr(self, 'callback_y_bottom'):
-                self.axs2.callbacks.disconnect(self.callback_x_bottom)
-                self.axs2.callbacks.disconnect(self.callback_y_bottom)
-
-            if hasattr(self, 'callback_y_top'):
-                self.axs1.callbacks.disconnect(self.callback_x_top)
-                self.axs1.callbacks.disconnect(self.callback_y_top)
-
-
-    def change_limits(self, plot_id, axs):
-        '''
-        When the limits on a plot are changed, we changed the limis of the
-        other plots accordingly. This happens only if the common zoom option
-        is used.
-
-        Parameters
-        ----------
-        plotID      str
-                    name of the plot it comes from
-        axs         matplotlib axes
-                    plot where the changes has been made
-
-        Return
-        ------
-        None
-        '''
-        ##get the x and y limits
-        new_x_min, new_x_max = axs.get_xlim()
-        new_y_min, new_y_max = axs.get_ylim()
-
-        if plot_id == 'Top':
-            ###check we are ok wrt plot2 limits
-            self.axs2.set_xlim((new_x_min, new_x_max))
-            self.axs2.set_ylim((new_y_min, new_y_max))
-            self.fig2.tight_layout()
-            self.plot2.draw()
-
-        ###Check what plots we changed
-        if plot_id == 'Bottom':
-            ###check we are ok wrt plot1 limits
-            self.axs1.set_xlim((new_x_min, new_x_max))
-            self.axs1.set_ylim((new_y_min, new_y_max))
-            self.fig1.tight_layout()
-            self.plot1.draw()
-
-    def crosshair(self, event):
-        '''
-        This method draws the crosshair on both plot
-
-        Parameters
-        ----------
-        event   :   matplotlib MouseEvent
-                    holds the position of the mouse on the plot            
-
-        Return
-        ------
-        None
-        '''
-        ##check that some coordinate are available.
-        if event.xdata is not None and event.ydata is not None:
-            ##remove the previous lines
-            if len(self.axs1.lines) > 0:
-                self.axs1.lines[-1].remove()
-                self.axs1.lines[-1].remove()
-            if len(self.axs2.lines) > 0:
-                self.axs2.lines[-1].remove()
-                self.axs2.lines[-1].remove()
-
-            ##get the position of the cursor
-            x = float(event.xdata)
-            y = float(event.ydata)
-
-            ##Draw the crosshair
-            crosshair_color = 'red'
-
-            ####if coordinate inside the image we draw
-            if 0 < x < self.data1.shape[1] and 0 < y < self.data1.shape[0]:
-                self.axs1.axhline(y, lw=0.8, color=crosshair_color)
-                self.axs1.axvline(x, lw=0.8, color=crosshair_color)
-                self.fig1.tight_layout()
-                self.plot1.draw()
-
-            ####same for second plot
-            if 0 < x < self.data2.shape[1] and 0 < y < self.data2.shape[0]:
-                self.axs2.axhline(y, lw=0.8, color=crosshair_color)
-                self.axs2.axvline(x, lw=0.8, color=crosshair_color)
-                self.fig2.tight_layout()
-                self.plot2.draw()
-
+            self.views.set_primary(self.primary.currentIndex())
+        else:
+            self.views.set_primary(None)
 
     def change_image(self, file, n):
         '''
@@ -274,48 +151,34 @@ class CompareWindow(QWidget):
                     path to image
             
         n   :   int
-                plot number to change
+                plot number to change (starts at 1)
         Return
         ------
         None
         '''
-        ##open image
-        image = Image.open(file)
-
-        if n == 1:
-            ##clear the plot
-            self.axs1.cla()
-
-            ##remove axis
-            self.axs1.axis('off')
-
-            ##display it
-            self.data1 = numpy.array(image)
-            self.axs1.imshow(self.data1)
-
-            ##display the name of the image:
-            name = os.path.basename(file)
-            self.axs1.text(0, 0, f'{name}', transform=self.axs1.transAxes, color='w')
+        ##decoded image (from memory if it was already opened)
+        pane = self.panes[n - 1]
 
-            ##redraw
-            self.fig1.tight_layout()
-            self.plot1.draw()
+        ##clear the plot
+        pane['axs'].cla()
 
-        if n == 2:
-            ##clear the plot
-            self.axs2.cla()
+        ##remove axis
+        pane['axs'].axis('off')
 
-            ##remove axis
-            self.axs2.axis('off')
+        ##display it
+        pane['data'] = image_cache.load_image_data(file, self.conf.get('image_cache'))
+        pane['axs'].imshow(pane['data'])
 
-            ##display it
-            self.data2 = numpy.array(image)
-            self.axs2.imshow(self.data2)
+        ##display the name of the image:
+        name = os.path.basename(file)
+        pane['axs'].text(0, 0, f'{name}', transform=pane['axs'].transAxes, color='w')
 
-            ##display the name of the image:
-            name = os.path.basename(file)
-            self.axs2.text(0, 0, f'{name}', transform=self.axs2.transAxes, color='w')
+        ##crosshair and common zoom
+        if n - 1 < len(self.views.panes):
+            self.views.set_axes(n - 1, pane['axs'], pane['data'].shape)
+        else:
+            self.views.add_pane(pane['plot'], pane['axs'], pane['data'].shape)
 
-            ##redraw
-            self.fig2.tight_layout()
-            self.plot2.draw()
+        ##redraw (the layout is only adjusted here, not during the interaction)
+        pane['fig'].tight_layout()
+        pane['plot'].draw()
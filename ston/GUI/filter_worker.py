@@ -0,0 +1,166 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It runs the gaussian filter of the analysis window in the background,
+so the window stays responsive while big images are filtered.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import threading
+import time
+
+####python third party
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+####local imports
+from ..processing import enhancers
+from ..processing.gaussian_filtering import FilterCancelled
+
+
+class FilterSignals(QObject):
+    '''
+    Signals emitted by the filter worker.
+    QRunnable is not a QObject so the signals must live here.
+    '''
+    finished = Signal(int, object, float)
+    failed = Signal(int, str)
+
+
+class FilterWorker(QRunnable):
+    '''
+    This class filters one image in a thread of the pool
+    '''
+    def __init__(self, job, image_data, sigma, cancel_event, signals):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        job             :   int
+                            number of the filtering
+        image_data      :   numpy array
+                            image to filter
+        sigma           :   float
+                            sigma of the gaussian filter
+        cancel_event    :   threading.Event
+                            set when the filtering is cancelled
+        signals         :   FilterSignals
+                            signals of the filter
+        '''
+        super().__init__()
+        self.job = job
+        self.image_data = image_data
+        self.sigma = sigma
+        self.cancel_event = cancel_event
+        self.signals = signals
+
+    def run(self):
+        '''
+        Filter the image (this is executed in the thread pool)
+        '''
+        start = time.perf_counter()
+        try:
+            filtered = enhancers.gaussian_filter(self.image_data, self.sigma,
+                                                 cancel_event=self.cancel_event)
+        except FilterCancelled:
+            return
+        except Exception as error: # pylint: disable=broad-except
+            ##any error is reported, so the window is never left waiting
+            self.signals.failed.emit(self.job, str(error))
+            return
+
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.job, filtered, time.perf_counter() - start)
+
+
+class BackgroundFilter(QObject):
+    '''
+    This class filters images in the background, one at a time
+
+    Signals
+    -------
+    finished    :   (numpy array, float) filtered image, time [s]
+    failed      :   (str) error message
+    '''
+    finished = Signal(object, float)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        '''
+        Class constructor
+        '''
+        super().__init__(parent)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.cancel_event = threading.Event()
+        self.job = 0
+        self.running = False
+
+        ###Signals are shared by the workers: they live as long as the filter
+        self.signals = FilterSignals()
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+
+    def start(self, image_data, sigma):
+        '''
+        This method starts filtering an image (the previous filtering,
+        if any, is cancelled)
+
+        Parameters
+        ----------
+        image_data  :   numpy array
+                        image to filter
+        sigma       :   float
+                        sigma of the gaussian filter
+        '''
+        self.cancel()
+        self.cancel_event = threading.Event()
+        self.job += 1
+        self.running = True
+        self.pool.start(FilterWorker(self.job, image_data, sigma, self.cancel_event,
+                                     self.signals))
+
+    def cancel(self):
+        '''
+        This method cancels the filtering (the result is dropped)
+        '''
+        self.cancel_event.set()
+        self.running = False
+
+    def on_finished(self, job, filtered, duration):
+        '''
+        An image was filtered (executed in the GUI thread)
+
+        Parameters
+        ----------
+        job         :   int
+                        number of the filtering
+        filtered    :   numpy array
+                        filtered image
+        duration    :   float
+                        time needed to filter [s]
+        '''
+        ##cancelled, or replaced by a newer filtering
+        if not self.running or job != self.job:
+            return
+        self.running = False
+        self.finished.emit(filtered, duration)
+
+    def on_failed(self, job, error):
+        '''
+        The filtering failed (executed in the GUI thread)
+
+        Parameters
+        ----------
+        job     :   int
+                    number of the filtering
+        error   :   str
+                    error message
+        '''
+        if not self.running or job != self.job:
+            return
+        self.running = False
+        self.failed.emit(error)
@@ -13,6 +13,9 @@ Year: 2024-2025
 from PIL import Image
 from PySide6 import QtGui
 
+###Local imports
+from ..processing import image_processing
+
 def create_icon(data, image, item):
     '''
     This function creates an icon to be displayed in the main window
@@ -46,7 +49,7 @@ def create_icon(data, image, item):
     return item
 
 
-def make_thumbnail_from_image(name_and_path, downgrade_factor):
+def make_thumbnail_from_image(name_and_path, downgrade_factor, cache=None, image_cache=None):
     '''
     This function open the original image and transform
     it to a thumbnail
@@ -57,6 +60,13 @@ def make_thumbnail_from_image(name_and_path, downgrade_factor):
                         name of the image with its path
     downgrade_factor    :   float
                             downgrade factor to apply to the original image
+    cache           :   ThumbnailCache or None
+                        on-disk thumbnail cache (see utils/thumbnail_cache)
+                        if given, the thumbnail is read from it when possible
+                        and stored in it when it had to be created
+    image_cache     :   ImageCache or None
+                        cache of the decoded images (see utils/image_cache)
+                        if the image is in it, the file is not read again
     Return
     ------
     data            :   bytes
@@ -64,11 +74,24 @@ def make_thumbnail_from_image(name_and_path, downgrade_factor):
     im              :   PIL.Image
                         Thumbnail
     '''
-    ###open the file
-    image = Image.open(name_and_path)
+    ###check the cache first
+    if cache is not None:
+        data, size = cache.get(name_and_path, downgrade_factor)
+        if data is not None:
+            return data, Image.frombytes('RGBA', size, data)
+
+    ###use the decoded image if it is in memory, otherwise open the file
+    ###at the lowest resolution we can use
+    decoded = image_cache.peek(name_and_path) if image_cache is not None else None
+    if decoded is not None:
+        image = Image.fromarray(decoded)
+        full_size = image.size
+    else:
+        image, full_size = image_processing.open_image_reduced(name_and_path,
+                                                               downgrade_factor)
 
     ##reduce size (no need to have full resolution for the list of image)
-    im = image.thumbnail((image.size[0]/downgrade_factor, image.size[1]/downgrade_factor))
+    im = image.thumbnail((full_size[0]/downgrade_factor, full_size[1]/downgrade_factor))
 
     ##apply color
     im = image.convert("RGBA")
@@ -76,4 +99,8 @@ def make_thumbnail_from_image(name_and_path, downgrade_factor):
     ##convert to bytes (that's what QT needs)
     data = im.tobytes("raw", "RGBA")
 
+    ##and keep it for next time
+    if cache is not None:
+        cache.put(name_and_path, downgrade_factor, data, im.size)
+
     return data, im
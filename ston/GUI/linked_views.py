@@ -0,0 +1,208 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It links the views of several plots (panes) showing images of the same
+size: a crosshair follows the mouse on all the panes, and the zoom of a
+primary pane is given to the other panes.
+
+The crosshairs are created once and drawn with blitting on top of a
+cached background of each pane. The zoom is given to the other panes
+once the limits stop changing (debounce), without relayout of the figures.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+from functools import partial
+
+####python third party
+from PySide6.QtCore import QTimer
+
+####local imports
+
+###Time without limit change before the zoom is given to the other panes [ms]
+LIMITS_DELAY = 50
+
+###Crosshair style
+CROSSHAIR_COLOR = 'red'
+CROSSHAIR_WIDTH = 0.8
+
+
+class LinkedViews:
+    '''
+    This class links the crosshairs and the zoom of several panes
+    '''
+    def __init__(self):
+        '''
+        Class constructor (no pane)
+        '''
+        self.panes = []
+        self.primary = None
+
+        ###the zoom of the primary pane is given after a short delay
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(LIMITS_DELAY)
+        self.timer.timeout.connect(self.propagate_limits)
+
+    def add_pane(self, canvas, axs, shape):
+        '''
+        This method adds a pane
+
+        Parameters
+        ----------
+        canvas  :   FigureCanvasQT
+                    area onto which the pane is drawn
+        axs     :   Axes
+                    plot of the image
+        shape   :   tuple
+                    shape of the image
+
+        Return
+        ------
+        index   :   int
+                    index of the pane
+        '''
+        index = len(self.panes)
+        self.panes.append({'canvas': canvas, 'background': None, 'callbacks': []})
+        self.set_axes(index, axs, shape)
+        canvas.mpl_connect('draw_event', partial(self.save_background, index))
+        canvas.mpl_connect('motion_notify_event', self.mouse_moved)
+
+        return index
+
+    def set_axes(self, index, axs, shape):
+        '''
+        This method gives a (new) plot to a pane: e.g. after the image
+        of the pane was changed (the crosshair is created again)
+
+        Parameters
+        ----------
+        index   :   int
+                    index of the pane
+        axs     :   Axes
+                    plot of the image
+        shape   :   tuple
+                    shape of the image
+        '''
+        pane = self.panes[index]
+        for callback in pane['callbacks']:
+            pane['axs'].callbacks.disconnect(callback)
+        pane['axs'] = axs
+        pane['shape'] = shape
+        pane['lines'] = [axs.axhline(0, lw=CROSSHAIR_WIDTH, color=CROSSHAIR_COLOR,
+                                     animated=True, visible=False),
+                         axs.axvline(0, lw=CROSSHAIR_WIDTH, color=CROSSHAIR_COLOR,
+                                     animated=True, visible=False)]
+        pane['callbacks'] = [axs.callbacks.connect(limit, partial(self.limits_changed,
+                                                                  index))
+                             for limit in ['xlim_changed', 'ylim_changed']]
+
+    def set_primary(self, index):
+        '''
+        This method chooses the pane that controls the zoom of the others
+
+        Parameters
+        ----------
+        index   :   int or None
+                    index of the primary pane, None for independent zooms
+        '''
+        self.primary = index
+        self.timer.stop()
+
+    def save_background(self, index, event):
+        '''
+        This method keeps the pane without the crosshair after it was
+        drawn, and draws the crosshair on top of it
+
+        Parameters
+        ----------
+        index   :   int
+                    index of the pane
+        event   :   matplotlib DrawEvent
+                    the pane was drawn
+        '''
+        del event
+        pane = self.panes[index]
+        pane['background'] = pane['canvas'].copy_from_bbox(pane['axs'].bbox)
+        for line in pane['lines']:
+            pane['axs'].draw_artist(line)
+
+    def mouse_moved(self, event):
+        '''
+        This method moves the crosshair on all the panes
+
+        Parameters
+        ----------
+        event   :   matplotlib MouseEvent
+                    holds the position of the mouse on the plot
+        '''
+        if event.xdata is None or event.ydata is None:
+            return
+
+        x, y = float(event.xdata), float(event.ydata)
+        for pane in self.panes:
+            ##only drawn inside the image
+            inside = 0 < x < pane['shape'][1] and 0 < y < pane['shape'][0]
+            horizontal, vertical = pane['lines']
+            if not inside and not horizontal.get_visible():
+                continue
+
+            horizontal.set_ydata([y, y])
+            vertical.set_xdata([x, x])
+            horizontal.set_visible(inside)
+            vertical.set_visible(inside)
+            self.blit(pane)
+
+    def blit(self, pane):
+        '''
+        This method draws the crosshair of a pane on top of its background
+
+        Parameters
+        ----------
+        pane    :   dict
+                    the pane
+        '''
+        if pane['background'] is None:
+            pane['canvas'].draw_idle()
+            return
+
+        pane['canvas'].restore_region(pane['background'])
+        for line in pane['lines']:
+            pane['axs'].draw_artist(line)
+        pane['canvas'].blit(pane['axs'].bbox)
+
+    def limits_changed(self, index, axs):
+        '''
+        This method is called when the limits of a pane change. If it is
+        the primary pane, the other panes are updated once the limits
+        stop changing.
+
+        Parameters
+        ----------
+        index   :   int
+                    index of the pane
+        axs     :   Axes
+                    plot whose limits changed
+        '''
+        del axs
+        if index == self.primary:
+            self.timer.start()
+
+    def propagate_limits(self):
+        '''
+        This method gives the limits of the primary pane to the other panes
+        '''
+        if self.primary is None:
+            return
+
+        primary = self.panes[self.primary]['axs']
+        xlim, ylim = primary.get_xlim(), primary.get_ylim()
+        for index, pane in enumerate(self.panes):
+            if index == self.primary:
+                continue
+            ##emit=False: no callback loop between the panes
+            pane['axs'].set_xlim(xlim, emit=False)
+            pane['axs'].set_ylim(ylim, emit=False)
+            pane['canvas'].draw_idle()
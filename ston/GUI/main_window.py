@@ -11,7 +11,6 @@ Year: 2024-2025
 ####Standard Library
 import os
 import datetime
-import time
 
 ####python third party
 from PySide6 import QtGui, QtCore
@@ -19,13 +18,14 @@ from PySide6.QtWidgets import QMainWindow, QSplitter, QWidget, QGridLayout,\
                             QTreeWidgetItem, QTabWidget, QLabel, QTreeWidget,\
                             QHeaderView, QAbstractItemView, QPlainTextEdit,\
                             QScrollArea, QHBoxLayout, QListView, QListWidget,\
-                            QListWidgetItem, QPushButton, QVBoxLayout, QApplication,\
-                            QFileDialog
+                            QPushButton, QVBoxLayout, QApplication,\
+                            QFileDialog, QProgressBar
 
 
 ####local imports
-from ..utils import conf, explore_files
-from . import image_qt_display
+from ..utils import conf, thumbnail_cache, project_index, region_cache, image_cache
+from . import thumbnail_loader
+from . import project_watcher
 from . import zoom_window
 from . import cluster_window
 from . import comparison_window
@@ -53,10 +53,8 @@ class GUI(QMainWindow):
         ###The configuration becomes an attribute
         self.conf = configuration
 
-        ##get all files
-        self.conf['files_dict'] = \
-                explore_files.get_dir_and_files(self.conf['Project_info']['directory'],\
-                                                self.conf['Project_info']['extensions'])
+        ##get all files, thumbnail cache, etc
+        self.open_project()
 
         ###set the size and title of the window
         self.resize(self.conf['Conf']['main_window_width'], self.conf['Conf']['main_window_height'])
@@ -74,9 +72,15 @@ class GUI(QMainWindow):
         ###Comparison window counter
         self.n_comparison = 1
 
+        ###Background thumbnail loader (None when nothing is loading)
+        self.loader = None
+
         ##populate with widget
         self.make_layout()
 
+        ###watch the project directory
+        self.watcher.start()
+
         ###and display it
         self.show()
 
@@ -91,6 +95,60 @@ class GUI(QMainWindow):
         self.printinlog('Info', credit)
 
 
+    def open_project(self):
+        '''
+        This method indexes the files of the project, opens the thumbnail,
+        region and decoded image caches and prepares the watcher of the
+        project directory
+
+        Parameter
+        ---------
+        None
+
+        Return
+        ------
+        None
+        '''
+        ##get all files (only the directories that changed since the last time
+        ##the project was opened are listed again)
+        self.conf['project_index'] = \
+                project_index.ProjectIndex(self.conf['Project_info']['directory'],
+                                           self.conf['Project_info']['extensions'])
+        self.conf['project_index'].refresh()
+        self.conf['files_dict'] = self.conf['project_index'].files_dict()
+
+        ##Thumbnail and region identification caches of the project
+        self.conf['thumbnail_cache'] = thumbnail_cache.cache_from_conf(self.conf)
+        self.conf['region_cache'] = region_cache.cache_from_conf(self.conf)
+
+        ##Decoded images, shared by all the windows
+        self.conf['image_cache'] = image_cache.cache_from_conf(self.conf)
+
+        ##Watcher for new and removed files (started once the tree exists)
+        self.watcher = project_watcher.ProjectWatcher(self.conf['project_index'],
+                                                      self.conf['Project_info']['watch_interval'],
+                                                      parent=self)
+        self.watcher.changed.connect(self.update_tree)
+
+    def close_project(self):
+        '''
+        This method stops the watcher and closes the thumbnail cache
+        of the current project
+
+        Parameter
+        ---------
+        None
+
+        Return
+        ------
+        None
+        '''
+        self.watcher.stop()
+        self.watcher.deleteLater()
+
+        if self.conf['thumbnail_cache'] is not None:
+            self.conf['thumbnail_cache'].close()
+
     def make_layout(self):
         '''
         This method creates the layour of the window
@@ -127,6 +185,18 @@ class GUI(QMainWindow):
         left_grid.addWidget(button, row, 0, 1, 2)
         row += 1
 
+        ##Progress of the image loading
+        self.progress = QProgressBar()
+        self.progress.setFormat('%v/%m images')
+        self.progress.setValue(0)
+        left_grid.addWidget(self.progress, row, 0, 1, 1)
+
+        ##Cancel the loading
+        self.button_cancel = QPushButton('Cancel loading')
+        self.button_cancel.setEnabled(False)
+        left_grid.addWidget(self.button_cancel, row, 1, 1, 1)
+        row += 1
+
         ##Clear selection
         button_clear = QPushButton('Clear displayer')
         left_grid.addWidget(button_clear, row, 0, 1, 1)
@@ -194,6 +264,7 @@ class GUI(QMainWindow):
 
         ####Connect events
         button.clicked.connect(self.loadimages)
+        self.button_cancel.clicked.connect(self.cancel_loading)
         button_remove.clicked.connect(self.remove_single_image)
         button_clear.clicked.connect(self.remove_all_images)
         button_hide_zoom.clicked.connect(self.hide_zoom_window)
@@ -220,7 +291,9 @@ class GUI(QMainWindow):
         self.tree.clear()
 
         ###and update with the new list
+        ###(we keep the item of each directory to update the tree later)
         items = []
+        self.tree_items = {}
         for key, values in self.conf['files_dict'].items():
             item = QTreeWidgetItem([os.path.basename(key)])
             for value in values:
@@ -228,12 +301,64 @@ class GUI(QMainWindow):
                 child = QTreeWidgetItem([value, ext])
                 item.addChild(child)
             items.append(item)
+            self.tree_items[key] = item
         self.tree.insertTopLevelItems(0, items)
         ###Adjust some propertiess
         self.tree.header().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
         self.tree.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.tree.setDragDropMode(QAbstractItemView.DragDropMode.DragOnly)
 
+    def update_tree(self, added, removed):
+        '''
+        This method updates the file tree when files are added or removed
+        from the project directory (see project_watcher). Only the
+        directories that changed are modified.
+
+        Parameter
+        ---------
+        added   :   dict
+                    new files, by directory
+        removed :   dict
+                    removed files, by directory
+
+        Return
+        ------
+        None
+        '''
+        ###update the files dictionary
+        self.conf['files_dict'] = self.conf['project_index'].files_dict()
+
+        ###remove files
+        for key, values in removed.items():
+            item = self.tree_items.get(key)
+            if item is None:
+                continue
+            values = set(values)
+            for n in reversed(range(item.childCount())):
+                if item.child(n).text(0) in values:
+                    item.removeChild(item.child(n))
+
+            ##and the directory if it is empty
+            if item.childCount() == 0:
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+                del self.tree_items[key]
+
+        ###add files
+        for key, values in added.items():
+            item = self.tree_items.get(key)
+            if item is None:
+                item = QTreeWidgetItem([os.path.basename(key)])
+                self.tree.addTopLevelItem(item)
+                self.tree_items[key] = item
+            for value in values:
+                ext = value.split(".")[-1].upper()
+                item.addChild(QTreeWidgetItem([value, ext]))
+
+        nadded = sum(len(values) for values in added.values())
+        nremoved = sum(len(values) for values in removed.values())
+        self.printinlog('Info', f'Project directory changed: {nadded} new file(s), '+\
+                                f'{nremoved} file(s) removed')
+
     def printinlog(self, msgtype, text):
         '''
         Prints images in log window
@@ -273,7 +398,14 @@ class GUI(QMainWindow):
         Method is selected whem the load button is pressed
         It checks that some items have been selected and, if
         this is the case load the images.
+        The thumbnails are made in the background (see thumbnail_loader)
+        so the window stays responsive.
         '''
+        ##Only one loading at a time
+        if self.loader is not None:
+            self.printinlog('Warning', 'Images are still loading...wait or cancel the loading')
+            return
+
        	###Get the selected files in the tree
         listfiles = [file.text(0) for file in self.tree.selectedItems()]
 
@@ -287,9 +419,7 @@ class GUI(QMainWindow):
 
             ###assemble paths of selected objects
             images_with_path, images_without_path = \
-                    explore_files.get_files_and_path(listfiles,
-                                                     self.conf['files_dict'],
-                                                     listdisplayed)
+                    self.conf['project_index'].resolve(listfiles, listdisplayed)
 
             ##if some files are images we display
             if not images_with_path:
@@ -301,31 +431,113 @@ class GUI(QMainWindow):
                 self.printinlog('Info', f'{len(images_with_path)} image(s) selected')
                 self.printinlog('Info', 'Start displaying...')
 
+                ###Prepare the progress bar
+                self.progress.setMaximum(len(images_with_path))
+                self.progress.setValue(0)
+                self.button_cancel.setEnabled(True)
+
             	###Start displaying
-                for name,nameandpath in zip(images_without_path, images_with_path):
+                self.loader = thumbnail_loader.ThumbnailLoader(images_without_path,
+                                        images_with_path,
+                                        self.conf['General_image_display']['downgrade_factor'],
+                                        cache=self.conf['thumbnail_cache'],
+                                        image_cache=self.conf.get('image_cache'),
+                                        parent=self)
+                self.loader.item_ready.connect(self.add_thumbnail)
+                self.loader.failed.connect(self.thumbnail_failed)
+                self.loader.progress.connect(self.update_progress)
+                self.loader.finished.connect(self.loading_finished)
+                self.loader.start()
+
+        else:
+            self.printinlog('Warning', 'No files selected')
+
+    def add_thumbnail(self, name, item_with_icon):
+        '''
+        This method adds a thumbnail that was created by the loader
+        to the display area
 
-                    ##Create and Widget item with the file name
-                    ##it will go below the image
-                    newitem = QListWidgetItem(name)
+        Parameters
+        ----------
+        name            :   str
+                            name of the image
+        item_with_icon  :   QListWidgetItem
+                            item with the icon of the image
+
+        Return
+        ------
+        None
+        '''
+        ###And add to the list and print in log
+        self.image_list.addItem(item_with_icon)
+        self.printinlog('Info', f"{name} is displayed")
+
+    def thumbnail_failed(self, name, error):
+        '''
+        This method is called when an image could not be loaded
+
+        Parameters
+        ----------
+        name    :   str
+                    name of the image
+        error   :   str
+                    error message
 
-                    ##process image
-                    data, image = \
-                       image_qt_display.make_thumbnail_from_image(nameandpath,
-                                                                  self.conf['General_image_display']['downgrade_factor'])
+        Return
+        ------
+        None
+        '''
+        self.printinlog('Error', f'{name} could not be displayed: {error}')
 
-                    ##create the icon
-                    item_with_icon = image_qt_display.create_icon(data, image, newitem)
+    def update_progress(self, ndone, ntotal):
+        '''
+        This method updates the progress bar of the loading
 
-                    ###And add to the list and print in log
-                    self.image_list.addItem(item_with_icon)
-                    self.printinlog('Info', f"{name} is displayed")
+        Parameters
+        ----------
+        ndone   :   int
+                    number of images processed
+        ntotal  :   int
+                    number of images to load
 
-                    ###Process the event
-                    QApplication.processEvents()
-                    time.sleep(0.025)
+        Return
+        ------
+        None
+        '''
+        self.progress.setMaximum(ntotal)
+        self.progress.setValue(ndone)
 
+    def loading_finished(self, ndisplayed, cancelled):
+        '''
+        This method is called when the loader is done (or was cancelled)
+
+        Parameters
+        ----------
+        ndisplayed  :   int
+                        number of images that were displayed
+        cancelled   :   bool
+                        True if the loading was cancelled
+
+        Return
+        ------
+        None
+        '''
+        if cancelled:
+            self.printinlog('Warning', f'Loading cancelled, {ndisplayed} image(s) displayed')
         else:
-            self.printinlog('Warning', 'No files selected')
+            self.printinlog('Info', f'Loading done, {ndisplayed} image(s) displayed')
+
+        self.button_cancel.setEnabled(False)
+        ##deleted when its workers are done (they may still be decoding)
+        self.loader.release()
+        self.loader = None
+
+    def cancel_loading(self):
+        '''
+        This method cancels the loading of the images
+        '''
+        if self.loader is not None:
+            self.loader.cancel()
 
     def remove_single_image(self):
         '''
@@ -344,6 +556,7 @@ class GUI(QMainWindow):
         '''
         This method remove all the images from the displayed area
         '''
+        self.cancel_loading()
         self.image_list.clear()
         self.printinlog('Warning', 'Displayer has been cleared. No images are displayed.')
 
@@ -367,16 +580,15 @@ class GUI(QMainWindow):
 
         ###assemble paths of selected objects
         images_with_path, \
-                images_without_path = explore_files.get_files_and_path(listdisplayed,
-                                                                       self.conf['files_dict'],
-                                                                       [])
+                images_without_path = self.conf['project_index'].resolve(listdisplayed, [])
 
         ###if some files where found
         if images_with_path: #checks if something is selected
             ###create cluster window with a dynamic name
             setattr(self, f'Cluster_window_n{self.n_cluster}',
                     cluster_window.ClusterWindow(self.conf, images_with_path,
-                                                 images_without_path, self.zoom_window))
+                                                 images_without_path, self.zoom_window,
+                                                 printinlog=self.printinlog))
             ###extract it back
             window = getattr(self, f'Cluster_window_n{self.n_cluster}')
             ###display it
@@ -390,7 +602,7 @@ class GUI(QMainWindow):
 
     def open_compare_window(self):
         '''
-        This method open two images to the comparison window
+        This method open the selected images (2 to 4) in the comparison window
 
         Parameters
         ----------
@@ -408,12 +620,10 @@ class GUI(QMainWindow):
 
         ###assemble paths of selected objects
         images_with_path,\
-                images_without_path = explore_files.get_files_and_path(listdisplayed,
-                                                                       self.conf['files_dict'],
-                                                                       [])
+                images_without_path = self.conf['project_index'].resolve(listdisplayed, [])
 
         ###if some files where found
-        if len(images_with_path) == 2: #checks if two images where selected
+        if 2 <= len(images_with_path) <= comparison_window.MAX_IMAGES:
             ###create cluster window with a dynamic name
             setattr(self, f'Comparison_window_n{self.n_comparison}',
                     comparison_window.CompareWindow(self.conf, images_with_path,\
@@ -428,12 +638,14 @@ class GUI(QMainWindow):
             ##and print in log
             self.printinlog('Info', 'Selected images have been opened in comparison window.')
 
-        elif len(images_with_path) > 2:
-            self.printinlog('Error', 'You selected more than two images.'+
-                                     ' The comparison window only work with two. Try again.')
+        elif len(images_with_path) > comparison_window.MAX_IMAGES:
+            self.printinlog('Error', 'You selected too many images. The comparison window'+
+                                     f' works with up to {comparison_window.MAX_IMAGES}.'+
+                                     ' Try again.')
 
         else:
-            self.printinlog('Error', 'Not enough files were selected. Two are needed. Try again')
+            self.printinlog('Error', 'Not enough files were selected. At least two are'+
+                                     ' needed. Try again')
 
 
 
@@ -447,11 +659,7 @@ class GUI(QMainWindow):
 
         ###if some items are selected we remove them
         image_name = listitems[0].text()
-        for folder in self.conf['files_dict']:
-            if os.path.basename(folder) != image_name:
-                for files in self.conf['files_dict'][folder]:
-                    if files == image_name:
-                        filepath = os.path.join(folder, image_name)
+        filepath = self.conf['project_index'].find(image_name)
 
         ###send to zoom window
         if filepath:
@@ -498,31 +706,47 @@ class GUI(QMainWindow):
         if not file:
             self.printinlog('Error', 'No file selected, try again')
         else:
-            self.printinlog('Warning', f'Attempt to load configuation from {file}')
-            try:
-                ###load conf
-                configuration, _ = conf.load_conf(file)
-                self.conf = configuration
+            self.load_new_conf(file)
+
+    def load_new_conf(self, file):
+        '''
+        This method replaces the configuration by the one of a file
+        and opens the project of this configuration
+
+        Parameter
+        ---------
+        file    :   str
+                    configuration file
+
+        Return
+        ------
+        None
+        '''
+        self.printinlog('Warning', f'Attempt to load configuation from {file}')
+        try:
+            ###load conf
+            configuration, _ = conf.load_conf(file)
 
-                ###clear displayer
-                self.remove_all_images()
+            ###clear displayer
+            self.remove_all_images()
 
-                ##update the files dict
-                self.conf['files_dict'] = \
-                        explore_files.get_dir_and_files(self.conf['Project_info']['directory'],\
-                                                        self.conf['Project_info']['extensions'])
+            ###close the previous project and open the new one
+            self.close_project()
+            self.conf = configuration
+            self.open_project()
 
-                ##and repopulate the file tree
-                self.populate_tree()
+            ##and repopulate the file tree
+            self.populate_tree()
+            self.watcher.start()
 
-                ###and update the image size in the displayer area
-                self.image_list.setIconSize(self.conf['General_image_display']['image_width'] * \
-                                            QtCore.QSize(1, 1))
+            ###and update the image size in the displayer area
+            self.image_list.setIconSize(self.conf['General_image_display']['image_width'] * \
+                                        QtCore.QSize(1, 1))
 
-                self.printinlog('Info', f'Configuration from {file} loaded')
+            self.printinlog('Info', f'Configuration from {file} loaded')
 
-            except:
-                self.printinlog('Error', f'Could not read configuration from {file}')
+        except:
+            self.printinlog('Error', f'Could not read configuration from {file}')
 
 
     def closeevent(self, event):
@@ -0,0 +1,220 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It renders the previews of the enhancers in the background while a
+slider is moved, so the Qt event loop is never blocked.
+
+Only the last request matters (latest wins): a new request replaces the
+one waiting to be rendered, and a result is dropped if a newer request
+was made (or the rendering was cancelled) while it was rendered.
+When the slider is released, the full resolution image is rendered the
+same way, so the window stays responsive while big images are enhanced.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import threading
+
+####python third party
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+####local imports
+from ..processing import enhancers
+
+###Size of the live preview compared to the size of the screen
+LIVE_PREVIEW_SCALE = 0.5
+
+
+class PreviewSignals(QObject):
+    '''
+    Signals emitted by the preview worker.
+    QRunnable is not a QObject so the signals must live here.
+    '''
+    rendered = Signal(int, object, bool)
+
+
+class PreviewWorker(QRunnable):
+    '''
+    This class renders the waiting requests of a PreviewRenderer
+    It runs in the thread of the renderer
+    '''
+    def __init__(self, renderer):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        renderer    :   PreviewRenderer
+                        renderer holding the requests
+        '''
+        super().__init__()
+        self.renderer = renderer
+
+    def run(self):
+        '''
+        Render the requests (this is executed in the thread pool)
+        '''
+        self.renderer.work()
+
+
+class PreviewRenderer(QObject):
+    '''
+    This class renders previews of the enhanced image in a background
+    thread, the last request only.
+
+    Signals
+    -------
+    rendered        :   (PIL Image) preview for the last request
+    rendered_full   :   (PIL Image) full resolution image for the last request
+    '''
+    rendered = Signal(object)
+    rendered_full = Signal(object)
+
+    def __init__(self, parent=None):
+        '''
+        Class constructor
+        '''
+        super().__init__(parent)
+
+        ###One thread: the requests are rendered one after the other
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+
+        ###The worker has its own pipeline (its steps are not shared
+        ###with the pipeline used in the GUI thread)
+        self.pipeline = None
+
+        ###last request: (generation, factors, size, pipeline), size=None
+        ###for the full resolution
+        self.lock = threading.Lock()
+        self.pending = None
+        self.generation = 0
+        self.busy = False
+
+        ###Signals live as long as the renderer (no queued result is lost)
+        self.signals = PreviewSignals()
+        self.signals.rendered.connect(self.on_rendered)
+
+    def set_image(self, image):
+        '''
+        This method gives a new image to enhance (previous requests are dropped)
+
+        Parameters
+        ----------
+        image   :   PIL Image
+                    image to enhance
+        '''
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+            self.pipeline = enhancers.EnhancementPipeline(image)
+
+    def request(self, factors, size):
+        '''
+        This method asks for a preview. It replaces the request waiting
+        to be rendered, if any.
+
+        Parameters
+        ----------
+        factors :   dict
+                    with key=enhancer name, value=value of the slider
+        size    :   tuple
+                    (width, height) of the screen, the preview is smaller
+        '''
+        if self.pipeline is None:
+            return
+
+        size = (max(1, int(size[0] * LIVE_PREVIEW_SCALE)),
+                max(1, int(size[1] * LIVE_PREVIEW_SCALE)))
+        self.push(factors, size)
+
+    def request_full(self, factors):
+        '''
+        This method asks for the full resolution image (e.g. when the
+        slider is released). It replaces the request waiting to be rendered.
+
+        Parameters
+        ----------
+        factors :   dict
+                    with key=enhancer name, value=value of the slider
+        '''
+        if self.pipeline is None:
+            return
+
+        self.push(factors, None)
+
+    def push(self, factors, size):
+        '''
+        This method replaces the waiting request and starts the worker
+        if it is not running
+
+        Parameters
+        ----------
+        factors :   dict
+                    with key=enhancer name, value=value of the slider
+        size    :   tuple or None
+                    (width, height) of the preview, None for the full resolution
+        '''
+        with self.lock:
+            self.generation += 1
+            self.pending = (self.generation, dict(factors), size, self.pipeline)
+            start = not self.busy
+            self.busy = True
+
+        if start:
+            self.pool.start(PreviewWorker(self))
+
+    def cancel(self):
+        '''
+        This method drops the request waiting to be rendered and the
+        result of the one being rendered
+        '''
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+
+    def work(self):
+        '''
+        This method renders the requests until there is none left
+        (executed in the thread of the renderer)
+        '''
+        while True:
+            with self.lock:
+                if self.pending is None:
+                    self.busy = False
+                    return
+                generation, factors, size, pipeline = self.pending
+                self.pending = None
+
+            try:
+                preview = pipeline.render(factors, size)
+            except Exception: # pylint: disable=broad-except
+                ##an image that fails is not shown (the analysis tool
+                ##renders the full image again if needed)
+                continue
+
+            self.signals.rendered.emit(generation, preview, size is None)
+
+    def on_rendered(self, generation, preview, full):
+        '''
+        A preview is ready (executed in the GUI thread)
+
+        Parameters
+        ----------
+        generation  :   int
+                        number of the request
+        preview     :   PIL Image
+                        enhanced preview
+        full        :   bool
+                        if the image is at full resolution
+        '''
+        ##a newer request was made, or the rendering was cancelled
+        if generation != self.generation:
+            return
+
+        if full:
+            self.rendered_full.emit(preview)
+        else:
+            self.rendered.emit(preview)
@@ -0,0 +1,131 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It watches the project directory for new or removed files.
+The project index is refreshed at regular interval (polling, so it works
+the same way on every system and on network drives) in a background thread.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+
+####python third party
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+####local imports
+
+
+class WatcherSignals(QObject):
+    '''
+    Signals emitted by the refresh worker.
+    QRunnable is not a QObject so the signals must live here.
+    '''
+    refreshed = Signal(object, object)
+
+
+class RefreshWorker(QRunnable):
+    '''
+    This class refreshes the project index in a thread of the pool
+    '''
+    def __init__(self, index, signals):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        index   :   ProjectIndex
+                    index of the project
+        signals :   WatcherSignals
+                    signals of the watcher
+        '''
+        super().__init__()
+        self.index = index
+        self.signals = signals
+
+    def run(self):
+        '''
+        Refresh the index (this is executed in the thread pool)
+        '''
+        try:
+            added, removed = self.index.refresh()
+        except OSError:
+            added, removed = {}, {}
+
+        try:
+            self.signals.refreshed.emit(added, removed)
+        except RuntimeError:
+            ##the watcher was closed in the meantime
+            pass
+
+
+class ProjectWatcher(QObject):
+    '''
+    This class polls the project directory and tells the window
+    when files were added or removed
+
+    Signals
+    -------
+    changed :   (dict, dict) files added and removed, by directory
+    '''
+    changed = Signal(object, object)
+
+    def __init__(self, index, interval, parent=None):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        index       :   ProjectIndex
+                        index of the project
+        interval    :   int
+                        time between two refresh in seconds. 0 disables the watcher
+        '''
+        super().__init__(parent)
+        self.index = index
+        self.interval = interval
+        self.busy = False
+
+        self.signals = WatcherSignals()
+        self.signals.refreshed.connect(self.on_refreshed)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        '''
+        Start polling (if an interval was given)
+        '''
+        if self.interval > 0:
+            self.timer.start(self.interval * 1000)
+
+    def stop(self):
+        '''
+        Stop polling
+        '''
+        self.timer.stop()
+
+    def poll(self):
+        '''
+        Refresh the index in the background (one refresh at a time)
+        '''
+        if self.busy:
+            return
+        self.busy = True
+        QThreadPool.globalInstance().start(RefreshWorker(self.index, self.signals))
+
+    def on_refreshed(self, added, removed):
+        '''
+        The index was refreshed (executed in the GUI thread)
+
+        Parameters
+        ----------
+        added   :   dict
+                    new files, by directory
+        removed :   dict
+                    removed files, by directory
+        '''
+        self.busy = False
+        if added or removed:
+            self.changed.emit(added, removed)
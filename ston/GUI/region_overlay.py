@@ -0,0 +1,147 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It draws the regions found by the region identification on top of an
+image: all the bounding boxes are one LineCollection and all the centers
+are one scatter plot, so tens of thousands of regions are drawn at once.
+
+When zoomed out, only the regions that are visible and big enough on the
+screen are drawn (level of detail); the selection is updated each time
+the limits of the plot change.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+
+####python third party
+import numpy
+from matplotlib.collections import LineCollection
+
+####local imports
+
+###Regions smaller than this on the screen are not drawn [screen pixels]
+MIN_SCREEN_SIZE = 3
+
+###Maximum number of regions drawn at once (the biggest are kept)
+MAX_REGIONS = 5000
+
+
+class RegionOverlay:
+    '''
+    This class draws the bounding boxes and centers of regions
+    '''
+    def __init__(self, axs, regions, color='y', center_color='r'):
+        '''
+        Class constructor: creates the two artists
+
+        Parameters
+        ----------
+        axs             :   Axes
+                            where the regions are drawn
+        regions         :   dict
+                            results of find_regions (x, y, bbox),
+                            regions sorted from the biggest to the smallest
+        color           :   str
+                            colour of the bounding boxes
+        center_color    :   str
+                            colour of the centers
+        '''
+        self.axs = axs
+        self.visible = True
+
+        ##bounding boxes as closed lines (N, 5, 2) in (column, row)
+        bbox = numpy.asarray(regions['bbox'], dtype=numpy.float64).reshape(-1, 4)
+        min_row, min_col, max_row, max_col = bbox.T
+        self.segments = numpy.stack([numpy.stack([min_col, min_row], axis=1),
+                                     numpy.stack([max_col, min_row], axis=1),
+                                     numpy.stack([max_col, max_row], axis=1),
+                                     numpy.stack([min_col, max_row], axis=1),
+                                     numpy.stack([min_col, min_row], axis=1)], axis=1)
+        self.bbox = bbox
+        self.centers = numpy.stack([numpy.asarray(regions['y'], dtype=numpy.float64),
+                                    numpy.asarray(regions['x'], dtype=numpy.float64)],
+                                   axis=1).reshape(-1, 2)
+
+        ##the artists (they are updated, never created again)
+        self.boxes = LineCollection([], linewidths=1, colors=color)
+        self.axs.add_collection(self.boxes, autolim=False)
+        self.center_points = self.axs.scatter([], [], color=center_color, marker='x')
+
+        self.update_level_of_detail()
+        self.callbacks = [self.axs.callbacks.connect('xlim_changed', self.limits_changed),
+                          self.axs.callbacks.connect('ylim_changed', self.limits_changed)]
+
+    def selection(self):
+        '''
+        This method selects the regions to draw: the ones inside the
+        current limits that are big enough on the screen
+
+        Return
+        ------
+        selected    :   numpy array
+                        indices of the regions to draw
+        '''
+        x0, x1 = sorted(self.axs.get_xlim())
+        y0, y1 = sorted(self.axs.get_ylim())
+        min_row, min_col, max_row, max_col = self.bbox.T
+
+        inside = (max_col >= x0) & (min_col <= x1) & (max_row >= y0) & (min_row <= y1)
+
+        ##size of the regions on the screen
+        window = self.axs.get_window_extent()
+        scale = max(window.width / max(x1 - x0, 1e-9), window.height / max(y1 - y0, 1e-9))
+        big_enough = numpy.maximum(max_col - min_col, max_row - min_row) * scale \
+                        >= MIN_SCREEN_SIZE
+
+        ##regions are sorted by size: the first ones are the biggest
+        return numpy.flatnonzero(inside & big_enough)[:MAX_REGIONS]
+
+    def update_level_of_detail(self):
+        '''
+        This method updates the artists with the regions to draw
+        '''
+        selected = self.selection()
+        self.boxes.set_segments(self.segments[selected])
+        self.center_points.set_offsets(self.centers[selected])
+
+    def limits_changed(self, axs):
+        '''
+        This method is called when the limits of the plot change
+        (zoom, pan, home)
+
+        Parameters
+        ----------
+        axs     :   Axes
+                    plot whose limits changed
+        '''
+        del axs
+        if self.visible:
+            self.update_level_of_detail()
+            self.axs.figure.canvas.draw_idle()
+
+    def set_visible(self, visible):
+        '''
+        This method shows or hides the regions (the artists are kept)
+
+        Parameters
+        ----------
+        visible :   bool
+                    if True the regions are displayed
+        '''
+        self.visible = bool(visible)
+        if self.visible:
+            self.update_level_of_detail()
+        self.boxes.set_visible(self.visible)
+        self.center_points.set_visible(self.visible)
+        self.axs.figure.canvas.draw_idle()
+
+    def remove(self):
+        '''
+        This method removes the regions from the plot
+        '''
+        for callback in self.callbacks:
+            self.axs.callbacks.disconnect(callback)
+        self.boxes.remove()
+        self.center_points.remove()
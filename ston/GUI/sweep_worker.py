@@ -0,0 +1,159 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It runs the threshold sweep of the analysis window in the background,
+so the window stays responsive while the component tree is built.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import threading
+import time
+
+####python third party
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+####local imports
+from ..processing import threshold_sweep
+
+
+class SweepSignals(QObject):
+    '''
+    Signals emitted by the sweep worker.
+    QRunnable is not a QObject so the signals must live here.
+    '''
+    finished = Signal(int, object, float)
+    failed = Signal(int, str)
+
+
+class SweepWorker(QRunnable):
+    '''
+    This class computes the threshold sweep of one image in a thread of the pool
+    '''
+    def __init__(self, job, image_data, cancel_event, signals):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        job             :   int
+                            number of the sweep
+        image_data      :   numpy array
+                            image to analyse
+        cancel_event    :   threading.Event
+                            set when the sweep is cancelled
+        signals         :   SweepSignals
+                            signals of the sweep
+        '''
+        super().__init__()
+        self.job = job
+        self.image_data = image_data
+        self.cancel_event = cancel_event
+        self.signals = signals
+
+    def run(self):
+        '''
+        Build the component tree (this is executed in the thread pool)
+        '''
+        start = time.perf_counter()
+        try:
+            sweep = threshold_sweep.ThresholdSweep(self.image_data,
+                                                   cancel_event=self.cancel_event)
+        except threshold_sweep.SweepCancelled:
+            return
+        except Exception as error: # pylint: disable=broad-except
+            ##any error is reported, so the window is never left waiting
+            self.signals.failed.emit(self.job, str(error))
+            return
+
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.job, sweep, time.perf_counter() - start)
+
+
+class BackgroundSweep(QObject):
+    '''
+    This class computes threshold sweeps in the background, one at a time
+
+    Signals
+    -------
+    finished    :   (ThresholdSweep, float) sweep of the image, time [s]
+    failed      :   (str) error message
+    '''
+    finished = Signal(object, float)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        '''
+        Class constructor
+        '''
+        super().__init__(parent)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.cancel_event = threading.Event()
+        self.job = 0
+        self.running = False
+
+        ###Signals are shared by the workers: they live as long as the sweep
+        self.signals = SweepSignals()
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+
+    def start(self, image_data):
+        '''
+        This method starts the sweep of an image (the previous sweep,
+        if any, is cancelled)
+
+        Parameters
+        ----------
+        image_data  :   numpy array
+                        image to analyse
+        '''
+        self.cancel()
+        self.cancel_event = threading.Event()
+        self.job += 1
+        self.running = True
+        self.pool.start(SweepWorker(self.job, image_data, self.cancel_event, self.signals))
+
+    def cancel(self):
+        '''
+        This method cancels the sweep (the result is dropped)
+        '''
+        self.cancel_event.set()
+        self.running = False
+
+    def on_finished(self, job, sweep, duration):
+        '''
+        A sweep is ready (executed in the GUI thread)
+
+        Parameters
+        ----------
+        job         :   int
+                        number of the sweep
+        sweep       :   ThresholdSweep
+                        sweep of the image
+        duration    :   float
+                        time needed to compute the sweep [s]
+        '''
+        ##cancelled, or replaced by a newer sweep
+        if not self.running or job != self.job:
+            return
+        self.running = False
+        self.finished.emit(sweep, duration)
+
+    def on_failed(self, job, error):
+        '''
+        The sweep failed (executed in the GUI thread)
+
+        Parameters
+        ----------
+        job     :   int
+                    number of the sweep
+        error   :   str
+                    error message
+        '''
+        if not self.running or job != self.job:
+            return
+        self.running = False
+        self.failed.emit(error)
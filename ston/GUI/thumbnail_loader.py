@@ -0,0 +1,272 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It loads the thumbnails of the images in the background,
+using a pool of threads. Finished icons are sent back to
+the windows through Qt signals.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import threading
+
+####python third party
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, QTimer, Signal
+from PySide6.QtWidgets import QListWidgetItem
+
+####local imports
+from . import image_qt_display
+
+###Time between two checks that the workers are done, before the loader
+###is deleted [ms]
+RELEASE_INTERVAL = 50
+
+
+class ThumbnailSignals(QObject):
+    '''
+    Signals emitted by the thumbnail workers.
+    QRunnable is not a QObject so the signals must live here.
+    '''
+    loaded = Signal(int, str, object, object)
+    failed = Signal(int, str, str)
+
+
+class ThumbnailWorker(QRunnable):
+    '''
+    This class decodes and downsamples one image
+    It runs in a thread of the pool
+    '''
+    def __init__(self, index, nameandpath, downgrade_factor, cancel_event, signals,
+                 cache=None, image_cache=None):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        index           :   int
+                            position of the image in the list to load
+
+        nameandpath     :   str
+                            image with its path
+
+        downgrade_factor:   int
+                            downgrade factor to apply to the original image
+
+        cancel_event    :   threading.Event
+                            set when the loading is cancelled
+
+        signals         :   ThumbnailSignals
+                            signals shared by all the workers of a loader
+
+        cache           :   ThumbnailCache or None
+                            on-disk thumbnail cache
+
+        image_cache     :   ImageCache or None
+                            cache of the decoded images
+        '''
+        super().__init__()
+        self.index = index
+        self.nameandpath = nameandpath
+        self.downgrade_factor = downgrade_factor
+        self.cancel_event = cancel_event
+        self.signals = signals
+        self.cache = cache
+        self.image_cache = image_cache
+
+    def run(self):
+        '''
+        Create the thumbnail (this is executed in the thread pool)
+        '''
+        ##If the loading was cancelled we do not even open the file
+        if self.cancel_event.is_set():
+            return
+
+        try:
+            data, image = image_qt_display.make_thumbnail_from_image(self.nameandpath,
+                                                                     self.downgrade_factor,
+                                                                     self.cache,
+                                                                     self.image_cache)
+        except Exception as error: # pylint: disable=broad-except
+            self.signals.failed.emit(self.index, self.nameandpath, str(error))
+            return
+
+        if not self.cancel_event.is_set():
+            self.signals.loaded.emit(self.index, self.nameandpath, data, image)
+
+
+class ThumbnailLoader(QObject):
+    '''
+    This class loads a list of images in parallel and streams the
+    QListWidgetItem (with their icon) back, in the order of the list.
+
+    Signals
+    -------
+    item_ready  :   (str, QListWidgetItem) name of the image and the item to display
+    failed      :   (str, str) name of the image and error message
+    progress    :   (int, int) number of images processed and total number of images
+    finished    :   (int, bool) number of images displayed and if the loading was cancelled
+    '''
+    item_ready = Signal(str, object)
+    failed = Signal(str, str)
+    progress = Signal(int, int)
+    finished = Signal(int, bool)
+
+    def __init__(self, images_without_path, images_with_path, downgrade_factor,
+                 cache=None, image_cache=None, parent=None):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        images_without_path :   list
+                                names of the images (will go below the icons)
+
+        images_with_path    :   list
+                                images with their path
+
+        downgrade_factor    :   int
+                                downgrade factor to apply to the original images
+
+        cache               :   ThumbnailCache or None
+                                on-disk thumbnail cache (see utils/thumbnail_cache)
+
+        image_cache         :   ImageCache or None
+                                cache of the decoded images (see utils/image_cache)
+        '''
+        super().__init__(parent)
+        self.names = list(images_without_path)
+        self.paths = list(images_with_path)
+        self.downgrade_factor = downgrade_factor
+        self.cache = cache
+        self.image_cache = image_cache
+
+        ###Our own pool, so cancelling does not touch other background tasks
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max(1, QThread.idealThreadCount()))
+
+        self.cancel_event = threading.Event()
+        self.running = False
+
+        ###Signals are shared by all the workers: they live as long as the loader
+        ###so that no queued result is lost when a worker is deleted by the pool
+        self.signals = ThumbnailSignals()
+        self.signals.loaded.connect(self.on_loaded)
+        self.signals.failed.connect(self.on_failed)
+
+        ##Results that arrived before the previous ones (we keep the order)
+        self.pending = {}
+        self.next_index = 0
+        self.ndone = 0
+        self.ndisplayed = 0
+
+    def start(self):
+        '''
+        Queue all the images in the thread pool
+        '''
+        self.running = True
+        if not self.paths:
+            self.stop(False)
+            return
+
+        for index, nameandpath in enumerate(self.paths):
+            worker = ThumbnailWorker(index, nameandpath, self.downgrade_factor,
+                                     self.cancel_event, self.signals, self.cache,
+                                     self.image_cache)
+            self.pool.start(worker)
+
+    def cancel(self):
+        '''
+        Cancel the loading. Images not yet started are removed from
+        the pool, the ones being processed are ignored.
+        '''
+        if self.running:
+            self.cancel_event.set()
+            self.pool.clear()
+            self.stop(True)
+
+    def release(self):
+        '''
+        Delete the loader once all its workers are done (use it instead
+        of deleteLater). Workers still decoding an image would otherwise
+        block the GUI thread in the destructor of the pool, or emit on
+        deleted signals.
+        '''
+        if self.pool.activeThreadCount() == 0:
+            self.deleteLater()
+        else:
+            QTimer.singleShot(RELEASE_INTERVAL, self.release)
+
+    def stop(self, cancelled):
+        '''
+        Mark the loading as done and tell the window
+
+        Parameters
+        ----------
+        cancelled   :   bool
+                        if the loading was cancelled
+        '''
+        self.running = False
+        self.finished.emit(self.ndisplayed, cancelled)
+
+    def on_loaded(self, index, _nameandpath, data, image):
+        '''
+        A thumbnail is ready (executed in the GUI thread)
+
+        Parameters
+        ----------
+        index       :   int
+                        position of the image in the list
+        _nameandpath:   str
+                        image with its path
+        data        :   bytes
+                        thumbnail to be turned into an Icon
+        image       :   PIL.Image
+                        thumbnail
+        '''
+        if not self.running:
+            return
+        self.pending[index] = (data, image)
+        self.ndone += 1
+        self.flush()
+
+    def on_failed(self, index, _nameandpath, error):
+        '''
+        A thumbnail could not be created (executed in the GUI thread)
+
+        Parameters
+        ----------
+        index       :   int
+                        position of the image in the list
+        _nameandpath:   str
+                        image with its path
+        error       :   str
+                        error message
+        '''
+        if not self.running:
+            return
+        self.pending[index] = None
+        self.ndone += 1
+        self.failed.emit(self.names[index], error)
+        self.flush()
+
+    def flush(self):
+        '''
+        Send all the items that are ready, in the order of the list
+        '''
+        while self.next_index in self.pending:
+            result = self.pending.pop(self.next_index)
+            if result is not None:
+                data, image = result
+                ##Items must be created in the GUI thread
+                newitem = QListWidgetItem(self.names[self.next_index])
+                item_with_icon = image_qt_display.create_icon(data, image, newitem)
+                self.ndisplayed += 1
+                self.item_ready.emit(self.names[self.next_index], item_with_icon)
+            self.next_index += 1
+
+        self.progress.emit(self.ndone, len(self.paths))
+
+        if self.next_index == len(self.paths):
+            self.stop(False)
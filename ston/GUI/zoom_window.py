@@ -26,8 +26,11 @@ import numpy
 ####Local imports
 from . import plots
 from . import slider
+from . import closeup
+from . import preview_renderer
 from . import analysis_window
 from ..utils import open_save_files
+from ..utils import image_cache
 from ..processing import enhancers
 
 class DetailWindow(QWidget):
@@ -96,7 +99,11 @@ class DetailWindow(QWidget):
         self.plot_zoom.setFixedWidth(250)
         self.plot_zoom.setFixedHeight(250)
         grid.addWidget(self.plot_zoom, row, 0, 1, 1)
+        self.closeup = closeup.CloseUp(self.plot_zoom, self.zoom_fig, self.zoom_axs)
         row += 1
+
+        ##previews rendered in the background while a slider is moved
+        self.preview_renderer = preview_renderer.PreviewRenderer(self)
         self.setMouseTracking(True)
 
         ##Notepad
@@ -139,6 +146,12 @@ class DetailWindow(QWidget):
         self.slider_contrast.sliderReleased.connect(partial(self.slider_change, 'con'))
         self.slider_brightness.sliderReleased.connect(partial(self.slider_change, 'br'))
         self.slider_sharpness.sliderReleased.connect(partial(self.slider_change, 'sh'))
+        self.slider_color.valueChanged.connect(partial(self.slider_moved, 'color'))
+        self.slider_contrast.valueChanged.connect(partial(self.slider_moved, 'contrast'))
+        self.slider_brightness.valueChanged.connect(partial(self.slider_moved, 'brightness'))
+        self.slider_sharpness.valueChanged.connect(partial(self.slider_moved, 'sharpness'))
+        self.preview_renderer.rendered.connect(self.show_preview)
+        self.preview_renderer.rendered_full.connect(self.show_full_resolution)
         self.button_reset_enhancers.clicked.connect(partial(self.reset_sliders, True))
         self.button_save_notes.clicked.connect(self.save_notes)
         self.button_analysis.clicked.connect(self.start_analysis_tool)
@@ -163,16 +176,17 @@ class DetailWindow(QWidget):
         #update the file attribute
         self.file = file
 
-        ##open image
-        image = Image.open(file)
+        ##decoded image (from memory if it was already opened)
+        image_data = image_cache.load_image_data(file, self.conf.get('image_cache'))
 
         ##clear the header
         self.header.clear()
         ##get the extnsion of the file
         _, extension = os.path.splitext(file)
-        ###get the header
+        ###get the header (only the header is read from the file)
         if extension == '.tif':
-            header = {TAGS[key] : image.tag[key] for key in image.tag_v2}
+            with Image.open(file) as image:
+                header = {TAGS[key] : image.tag[key] for key in image.tag_v2}
             for i in header:
                 text = f"{i[:17]:<20} \t{str(header[i]).replace('(','').replace(')','')}"
                 self.header.appendPlainText(text)
@@ -187,9 +201,15 @@ class DetailWindow(QWidget):
         self.axs.axis('off')
 
         ##display it
-        self.data = numpy.array(image)
-        ondisplay = self.axs.imshow(self.data)
-        self.data_for_analysis = ondisplay.get_array()
+        self.data = image_data
+        self.ondisplay = self.axs.imshow(self.data)
+        self.data_for_analysis = self.ondisplay.get_array()
+        self.closeup.set_image(self.data, self.conf['Zoom_window']['closeup_window_size'])
+
+        ##the enhancers work on the image kept in memory
+        image = Image.fromarray(image_data)
+        self.pipeline = enhancers.EnhancementPipeline(image)
+        self.preview_renderer.set_image(image)
 
         ##redraw
         self.fig.tight_layout()
@@ -241,52 +261,42 @@ class DetailWindow(QWidget):
 
     def update_zoomin_display(self):
         '''
-        Update the zoom-in 2D display of the image in the source_picker window
+        Update the zoom-in 2D display of the image in the source_picker window.
+        The close-up is drawn at the next display frame (the cursor positions
+        received in between are skipped)
 
         Returns
         -------
 
         '''
-        ###remove the previous image
-        self.zoom_axs.cla()
-
-        #Get image properties
-        self.maxx = self.data.shape[0]
-        self.maxy = self.data.shape[1]
-        self.zoom_axs.imshow(self.data, rasterized=True, origin='lower')
-
-        ###update the size of the image based on the configuration
-        self.winsize = self.conf['Zoom_window']['closeup_window_size']
-
-        ##Determine the x and y limits of the zommed in image
-        xmin, xmax = self.xcursorloc - 0.5 * self.winsize, self.xcursorloc + 0.5 * self.winsize
-        ymin, ymax = self.ycursorloc - 0.5 * self.winsize, self.ycursorloc + 0.5 * self.winsize
-
-        #Make sure the zoomed-in display window shows a
-        #full image in the corner, and not blank space
-        if xmin < 0:
-            xmin = 0
-            xmax = self.winsize
-        elif xmax > self.data.shape[1]:
-            xmax = self.data.shape[1]
-            xmin = xmax - self.winsize
-        if ymin < 0:
-            ymin = 0
-            ymax = self.winsize
-        elif ymax > self.data.shape[0]:
-            ymax = self.data.shape[0]
-            ymin = ymax - self.winsize
-
-        ##And update the image
-        self.zoom_axs.set_xlim(xmin, xmax)
-        self.zoom_axs.set_ylim(ymax, ymin)
-        self.zoom_axs.axis('off')
-        self.zoom_fig.canvas.draw()
+        self.closeup.move_to(self.xcursorloc, self.ycursorloc)
+
+    def slider_moved(self, enhancer, value):
+        '''
+        This method asks for a preview while a slider is dragged. The
+        preview is rendered in the background and displayed when it is
+        ready (see show_preview); the final image is made on release.
+
+        Parameters
+        ----------
+        enhancer    :   str
+                        name of the enhancer of the slider
+        value       :   int
+                        value of the slider
+        '''
+        ##values set by the program (e.g. reset) are not previewed
+        slider_widget = getattr(self, f'slider_{enhancer}')
+        if not slider_widget.isSliderDown():
+            return
+
+        factors = self.enhancer_factors()
+        factors[enhancer] = value
+        self.preview_renderer.request(factors, self.screen_size())
 
     def slider_change(self, slider_name):
         '''
         This method process the enhancer valuesand process
-        the images
+        the images (full quality, when the slider is released)
 
         Parameters
         ----------
@@ -310,58 +320,96 @@ class DetailWindow(QWidget):
         elif slider_name == 'sh':
             self.sharpness = True
 
+        ##the live previews are not needed anymore
+        self.preview_renderer.cancel()
+
         #######################
         ###Apply the changes###
         #######################
-
-        ##image opening
-        im = Image.open(self.file)
+        factors = self.enhancer_factors()
         txt = '' #to be displayed
+        for name, value in factors.items():
+            txt += f'{name.capitalize()} Enhancer: {int(value/10)}\n'
 
-        ##Applied color change
-        if self.color is True:
-            color_im = enhancers.color(im, self.slider_color.value())
-            txt += f'Color Enhancer: {int(self.slider_color.value()/10)}\n'
-        else:
-            color_im = im
+        ##Add text
+        self.notepad.appendPlainText(txt)
 
-        ##Apply contrast
-        if self.contrast is True:
-            contrast_im = enhancers.contrast(color_im, self.slider_contrast.value())
-            txt += f'Contrast Enhancer: {int(self.slider_contrast.value()/10)}\n'
-        else:
-            contrast_im = color_im
+        ###update the image: enhanced at the resolution of the screen first
+        ###(the coordinates stay the ones of the full image), then at full
+        ###resolution in the background (see show_full_resolution)
+        self.show_preview(self.pipeline.render(factors, self.screen_size()))
+        self.preview_renderer.request_full(factors)
 
-        ##Apply brightness
-        if self.brightness is True:
-            brightness_im = enhancers.brightness(contrast_im, self.slider_brightness.value())
-            txt += f'Brightness Enhancer: {int(self.slider_brightness.value()/10)}\n'
-        else:
-            brightness_im = contrast_im
+        ##for analysis (until the full resolution image is ready)
+        self.data_for_analysis = None
 
-        ##Apply sharpness
-        if self.sharpness is True:
-            sharpness_im = enhancers.sharpness(brightness_im, self.slider_sharpness.value())
-            txt += f'Sharpness Enhancer: {int(self.slider_sharpness.value()/10)}\n'
-        else:
-            sharpness_im = brightness_im
+    def enhancer_factors(self):
+        '''
+        This method gives the values of the sliders of the enhancers
+        that were used
 
-        ##Add text
-        self.notepad.appendPlainText(txt)
+        Return
+        ------
+        factors :   dict
+                    with key=enhancer name, value=value of the slider
+        '''
+        factors = {}
+        for name, used, slider_widget in [('color', self.color, self.slider_color),
+                                          ('contrast', self.contrast, self.slider_contrast),
+                                          ('brightness', self.brightness,
+                                           self.slider_brightness),
+                                          ('sharpness', self.sharpness, self.slider_sharpness)]:
+            if used is True:
+                factors[name] = slider_widget.value()
+
+        return factors
+
+    def screen_size(self):
+        '''
+        This method gives the size of the plot on the screen
 
-        ###update the image
-        self.axs.imshow(sharpness_im)
+        Return
+        ------
+        size    :   tuple
+                    (width, height) in pixels of the screen
+        '''
+        ratio = self.plot.devicePixelRatioF()
+        return (max(1, int(self.plot.width() * ratio)), max(1, int(self.plot.height() * ratio)))
 
-        ###Adjust the closeup window (bottom left)
-        if self.conf['Zoom_window']['closeup_window'] != 'original':
-            self.data = numpy.array(sharpness_im)
+    def show_preview(self, preview):
+        '''
+        This method displays an enhanced image (possibly downscaled) in place
+        of the image on display, with the coordinates of the full image
 
-        ##for analysis
-        self.data_for_analysis = numpy.array(sharpness_im)
+        Parameters
+        ----------
+        preview :   PIL Image
+                    image to display
+        '''
+        height, width = self.data.shape[:2]
+        self.ondisplay.set_data(numpy.asarray(preview))
+        self.ondisplay.set_extent((-0.5, width - 0.5, height - 0.5, -0.5))
+        self.plot.draw_idle()
 
-        ##redraw
-        self.fig.tight_layout()
-        self.plot.draw()
+    def show_full_resolution(self, image):
+        '''
+        This method displays the enhanced image at full resolution (so
+        zooming shows every pixel), and keeps it for the close-up and
+        the analysis tool
+
+        Parameters
+        ----------
+        image   :   PIL Image
+                    enhanced image at full resolution
+        '''
+        enhanced = numpy.array(image)
+        self.show_preview(enhanced)
+        self.data_for_analysis = enhanced
+
+        ###Adjust the closeup window (bottom left)
+        if self.conf['Zoom_window']['closeup_window'] != 'original':
+            self.data = enhanced
+            self.closeup.set_image(self.data, self.conf['Zoom_window']['closeup_window_size'])
 
     def reset_sliders(self, reload=True):
         '''
@@ -425,6 +473,12 @@ class DetailWindow(QWidget):
         ------
         None
         '''
+        ##the enhancers are applied to the full image now (if the full
+        ##resolution image is not ready yet)
+        if self.data_for_analysis is None:
+            self.preview_renderer.cancel()
+            self.show_full_resolution(self.pipeline.render(self.enhancer_factors()))
+
         ##Create analysis window with a dynamic name (we can open multiple ones)
         setattr(self, f'Analysis_window_n{self.n_analysis}',
                 analysis_window.AnalysisWindow(self.conf, self.data_for_analysis))
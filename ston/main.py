@@ -23,6 +23,7 @@ from PySide6.QtWidgets import QApplication, QMessageBox
 ####Local imports
 from .utils import cli, conf
 from .GUI import main_window
+from .processing import batch_segmentation
 from .tests import general
 
 def main():
@@ -37,9 +38,9 @@ def main():
 
     if args['tests']:
         tests = input('What test do you want to run? \n'+\
-                      '[utils/processing/segmentation, just press enter for all]: ')
+                      '[utils/processing/segmentation/gui, just press enter for all]: ')
         if tests:
-            if tests not in ['utils', 'processing', 'segmentation']:
+            if tests not in ['utils', 'processing', 'segmentation', 'gui']:
                 print('Tests requested are not recognized, try again...exit..')
             else:
                 general.run_tests(tests)
@@ -70,11 +71,28 @@ def main():
             configuration = conf.test_conf()
         else:
             ##in that case we extract the configuration from the file
-            configuration, msg = conf.load_conf(args['config'])
+            try:
+                configuration, msg = conf.load_conf(args['config'])
+            except ValueError as error:
+                print(f'Invalid configuration file {args["config"]}: {error}')
+                sys.exit()
             if msg == 'no file':
                 print(f'Configuration file does not exist. {args["config"]}')
                 sys.exit()
 
+        if args['batchsegment']:
+            ##No GUI: region identification on all the images
+            images = batch_segmentation.list_images(configuration, args['images'])
+            summary, failed = batch_segmentation.batch_segment(images, configuration,
+                                                               args['batchsegment'],
+                                                               args['processes'],
+                                                               args['resume'],
+                                                               args['tilesize'])
+            print(f'Summary saved in {summary}')
+            if failed:
+                print(f'{len(failed)} images failed (run again with --resume to retry)')
+            sys.exit()
+
         ##create the app
         app = QApplication(sys.argv)
         ex = main_window.GUI(configuration)
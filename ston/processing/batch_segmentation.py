@@ -0,0 +1,296 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It runs the region identification on many images, without the GUI.
+Each image is processed in a pool of processes. For each image the
+catalogue of regions is saved in a CSV file, and one line is added to
+a summary file. The summary is used to resume an interrupted run.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import os
+import csv
+import glob
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+##Third party
+import numpy
+from PIL import Image
+import tifffile
+
+##local imports
+from . import segmentation_regions, tiled_segmentation
+from ..utils import explore_files, open_save_files
+
+###Name of the summary file (in the output directory)
+SUMMARY_FILE = 'summary.csv'
+SUMMARY_COLUMNS = ['image', 'catalogue', 'n_regions', 'black_ratio', 'white_ratio']
+
+
+def list_images(config, pattern=None):
+    '''
+    This function lists the images to process
+
+    Parameters
+    ----------
+    config  :   dict
+                configuration of STON
+    pattern :   str or None
+                glob pattern (recursive, '**' allowed). If None, all the
+                images of the project are used
+
+    Return
+    ------
+    images  :   list
+                of images with their path, sorted
+    '''
+    if pattern:
+        images = [i for i in glob.glob(pattern, recursive=True) if os.path.isfile(i)]
+    else:
+        files_dict = explore_files.get_dir_and_files(config['Project_info']['directory'],
+                                                     config['Project_info']['extensions'])
+        images = [os.path.join(directory, file)
+                  for directory, files in files_dict.items() for file in files]
+
+    return sorted(images)
+
+
+def catalogue_name(image, root, output_directory):
+    '''
+    This function gives the name of the catalogue of an image.
+    The directory structure of the project is kept in the output directory
+    so images with the same name in different directories do not collide.
+
+    Parameters
+    ----------
+    image               :   str
+                            image with its path
+    root                :   str
+                            common directory of the images
+    output_directory    :   str
+                            where the results are saved
+
+    Return
+    ------
+    catalogue           :   str
+                            path/to/the/catalogue.csv
+    '''
+    relative = os.path.relpath(image, root)
+    return os.path.join(output_directory, os.path.splitext(relative)[0] + '.csv')
+
+
+def load_image(image):
+    '''
+    This function opens an image the way the zoom window does,
+    (colour modes that find_regions does not know are converted to RGB)
+
+    Parameters
+    ----------
+    image   :   str
+                image with its path
+
+    Return
+    ------
+    data    :   numpy array
+                data of the image
+    '''
+    with Image.open(image) as im:
+        if im.mode not in ['L', 'RGB', 'I;16', 'I', 'F']:
+            im = im.convert('RGB')
+        return numpy.array(im)
+
+
+def open_image_memmap(name_and_path):
+    '''
+    This function opens an image without loading it in memory when possible:
+    uncompressed TIFF files and numpy .npy files are memory-mapped. Other
+    files are loaded in memory.
+
+    Parameters
+    ----------
+    name_and_path   :   str
+                        image with its path
+
+    Return
+    ------
+    data            :   numpy array (or memmap)
+                        data of the image
+    '''
+    extension = os.path.splitext(name_and_path)[1].lower()
+    if extension == '.npy':
+        return numpy.load(name_and_path, mmap_mode='r')
+
+    if extension in ['.tif', '.tiff']:
+        try:
+            return tifffile.memmap(name_and_path, mode='r')
+        except ValueError:
+            ##compressed or tiled TIFF: can not be memory-mapped
+            pass
+
+    return load_image(name_and_path)
+
+
+def write_catalogue(catalogue, results, pix_to_mm):
+    '''
+    This function writes the catalogue of regions of an image.
+    The file is first written under a temporary name and then renamed,
+    so a catalogue on disk is always complete.
+
+    Parameters
+    ----------
+    catalogue   :   str
+                    path/to/the/catalogue.csv
+    results     :   dict
+                    results of find_regions
+    pix_to_mm   :   float
+                    size of a pixel in mm
+    '''
+    os.makedirs(os.path.dirname(catalogue), exist_ok=True)
+
+    tmpfile = catalogue + '.tmp'
+    open_save_files.save_catalogue_text(tmpfile, results, pix_to_mm * pix_to_mm)
+    os.replace(tmpfile, catalogue)
+
+
+def segment_image(image, catalogue, config, tile_size=0):
+    '''
+    This function runs the region identification on one image and
+    saves its catalogue. It runs in the worker processes.
+
+    Parameters
+    ----------
+    image       :   str
+                    image with its path
+    catalogue   :   str
+                    path/to/the/catalogue.csv
+    config      :   dict
+                    configuration of STON
+    tile_size   :   int
+                    if > 0, the image is segmented by tiles of that size
+                    (memory-mapped when possible, see tiled_segmentation)
+
+    Return
+    ------
+    row         :   dict
+                    line of the summary file
+    '''
+    if tile_size > 0:
+        _, results = tiled_segmentation.find_regions_tiled(open_image_memmap(image), config,
+                                                           tile_size)
+    else:
+        _, results = segmentation_regions.find_regions(load_image(image), config)
+    write_catalogue(catalogue, results, config['Analysis']['pix_to_mm'])
+
+    return {'image': image, 'catalogue': catalogue, 'n_regions': len(results['area']),
+            'black_ratio': results['black_ratio'], 'white_ratio': results['white_ratio']}
+
+
+def read_summary(summary):
+    '''
+    This function reads the summary of a previous run. Lines that are
+    incomplete (run interrupted while writing) or whose catalogue is
+    missing are ignored.
+
+    Parameters
+    ----------
+    summary :   str
+                path/to/summary.csv
+
+    Return
+    ------
+    rows    :   dict
+                with key=image
+                     value=line of the summary
+    '''
+    rows = {}
+    try:
+        with open(summary, 'r', newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                if None in row.values() or None in row:
+                    continue
+                if os.path.isfile(row['catalogue']):
+                    rows[row['image']] = row
+    except OSError:
+        pass
+
+    return rows
+
+
+def batch_segment(images, config, output_directory, n_processes=0, resume=False,
+                  tile_size=0, report=print):
+    '''
+    This function runs the region identification on a list of images
+
+    Parameters
+    ----------
+    images              :   list
+                            of images with their path
+    config              :   dict
+                            configuration of STON
+    output_directory    :   str
+                            where the catalogues and the summary are saved
+    n_processes         :   int
+                            number of processes (0 = number of CPUs)
+    resume              :   bool
+                            if True, the images already in the summary are skipped
+    tile_size           :   int
+                            if > 0, images are segmented by tiles of that size
+    report              :   callable
+                            called with a message for each image
+
+    Return
+    ------
+    summary             :   str
+                            path/to/summary.csv
+    failed              :   list
+                            of (image, error message)
+    '''
+    os.makedirs(output_directory, exist_ok=True)
+    summary = os.path.join(output_directory, SUMMARY_FILE)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(i)) for i in images]) \
+                if images else output_directory
+
+    ###Images already done
+    done = read_summary(summary) if resume else {}
+    todo = [i for i in images if i not in done]
+    report(f'{len(images)} images, {len(images) - len(todo)} already done')
+
+    ###The summary is written again with the valid lines, then
+    ###a line is added (and flushed) each time an image is done
+    failed = []
+    with open(summary, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(done.values())
+        csvfile.flush()
+
+        if n_processes <= 0:
+            n_processes = os.cpu_count() or 1
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max(1, min(n_processes, len(todo))),
+                                 mp_context=context) as pool:
+            futures = {pool.submit(segment_image, image,
+                                   catalogue_name(os.path.abspath(image), root,
+                                                  output_directory),
+                                   config, tile_size): image for image in todo}
+
+            for n, future in enumerate(as_completed(futures)):
+                image = futures[future]
+                try:
+                    row = future.result()
+                except Exception as error: #pylint: disable=broad-exception-caught
+                    ##one bad image must not stop an overnight run
+                    failed.append((image, str(error)))
+                    report(f'[{n+1}/{len(todo)}] {image}: failed ({error})')
+                    continue
+
+                writer.writerow(row)
+                csvfile.flush()
+                report(f'[{n+1}/{len(todo)}] {image}: {row["n_regions"]} regions')
+
+    return summary, failed
@@ -11,13 +11,22 @@ Year: 2025-
 
 #Standard Library
 
-
 #Third party
-from PIL import ImageEnhance
-from skimage import filters
+import numpy
+from PIL import Image, ImageEnhance
 
 
 #Local import
+from . import gaussian_filtering
+
+###Enhancers of the pipeline, in the order they are applied
+STAGES = ['color', 'contrast', 'brightness', 'sharpness']
+
+###Point enhancers, applied together by fused_point_enhancers
+POINT_STAGES = ['color', 'contrast', 'brightness']
+
+###Image modes supported by fused_point_enhancers
+FUSED_MODES = ['RGB', 'L']
 
 
 def color(image_data, factor):
@@ -134,9 +143,10 @@ def brightness(image_data, factor):
     return modified_data
 
 
-def gaussian_filter(image_data, sigma):
+def gaussian_filter(image_data, sigma, cancel_event=None):
     '''
     This function applies an image filter
+    (see gaussian_filtering.gaussian_filter)
 
     Parameter
     ---------
@@ -145,13 +155,310 @@ def gaussian_filter(image_data, sigma):
 
     sigma       :   float
                     sigma of the gaussian filter
+
+    cancel_event:   threading.Event or None
+                    if set, the filtering stops
     
     Return
     ------
     filtered    :   numpy array
                     image with gaussian filter applied
+                    (same type as image_data for integer images)
 
     '''
-    filtered = filters.gaussian(image_data, sigma=sigma)
+    filtered = gaussian_filtering.gaussian_filter(image_data, sigma,
+                                                  cancel_event=cancel_event)
 
     return filtered
+
+
+def slider_factor(value):
+    '''
+    This function converts the value of a slider to the factor of an
+    enhancer (same as the enhancer functions above)
+
+    Parameters
+    ----------
+    value   :   float
+                value of the slider (0 to 500)
+
+    Return
+    ------
+    factor  :   numpy float32 or None
+                factor of the enhancer, None if the enhancer is not applied
+    '''
+    if 0 <= value <= 500:
+        return numpy.float32(value/100)
+
+    return None
+
+
+def point_lut(contrast_value, brightness_value, mean):
+    '''
+    This function computes the lookup table of the contrast followed by the
+    brightness enhancers. The computation is the one of PIL (float32, values
+    truncated and clipped at each step), so the result is the same.
+
+    Parameters
+    ----------
+    contrast_value      :   float or None
+                            value of the contrast slider (None: not applied)
+    brightness_value    :   float or None
+                            value of the brightness slider (None: not applied)
+    mean                :   int
+                            mean of the grayscale image (contrast)
+
+    Return
+    ------
+    lut                 :   numpy array
+                            new value of each of the 256 values (uint8)
+    '''
+    lut = numpy.arange(256, dtype=numpy.uint8)
+
+    factor = slider_factor(contrast_value) if contrast_value is not None else None
+    if factor is not None:
+        blend = numpy.float32(mean) + factor * (lut.astype(numpy.float32) - numpy.float32(mean))
+        lut = numpy.clip(blend, 0, 255).astype(numpy.uint8)
+
+    factor = slider_factor(brightness_value) if brightness_value is not None else None
+    if factor is not None:
+        lut = numpy.clip(factor * lut.astype(numpy.float32), 0, 255).astype(numpy.uint8)
+
+    return lut
+
+
+def gray_mean(image):
+    '''
+    This function computes the mean of the grayscale image, rounded
+    as the contrast enhancer of PIL does
+
+    Parameters
+    ----------
+    image   :   PIL Image
+                RGB or grayscale image
+
+    Return
+    ------
+    mean    :   int
+                rounded mean of the grayscale image
+    '''
+    histogram = numpy.asarray(image.convert('L').histogram(), dtype=numpy.int64)
+    total = int(numpy.dot(histogram, numpy.arange(256)))
+
+    return int(total / max(1, int(histogram.sum())) + 0.5)
+
+
+def fused_point_enhancers(image, factors):
+    '''
+    This function applies the color, contrast and brightness enhancers
+    without the intermediate images of contrast and brightness: the color
+    enhancer is one blend with the grayscale image, contrast and brightness
+    are one lookup table applied in a single pass.
+    The output is the same as color, contrast and brightness applied one
+    after the other.
+
+    Parameters
+    ----------
+    image       :   PIL Image
+                    RGB or grayscale ('L') image
+    factors     :   dict
+                    with key=enhancer name, value=value of the slider
+                    enhancers that are not in the dictionary are not applied
+
+    Return
+    ------
+    enhanced    :   PIL Image
+                    enhanced image
+    '''
+    ##a grayscale image has no colour to change
+    if image.mode == 'RGB' and slider_factor(factors.get('color', -1)) is not None:
+        image = color(image, factors['color'])
+
+    contrast_value = factors.get('contrast')
+    brightness_value = factors.get('brightness')
+    mean = 0
+    if contrast_value is not None and slider_factor(contrast_value) is not None:
+        mean = gray_mean(image)
+
+    lut = point_lut(contrast_value, brightness_value, mean)
+    if numpy.array_equal(lut, numpy.arange(256)):
+        return image
+
+    ##same table for each band
+    return image.point(lut.tolist() * len(image.getbands()))
+
+
+class EnhancementPipeline:
+    '''
+    This class applies the enhancers to an image kept in memory.
+    The output of each step is kept, so when only the last enhancers
+    change, the first ones are not applied again. The enhancers can be
+    applied to a downscaled copy of the image (preview, e.g. at the
+    resolution of the screen) or to the full image.
+    The point enhancers (color, contrast, brightness) are applied as one
+    step (see fused_point_enhancers) for RGB and grayscale images.
+    '''
+    def __init__(self, image):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        image   :   PIL Image
+                    image to enhance (decoded once here)
+        '''
+        image.load()
+        self.source = image
+
+        ###downscaled copy of the image, with its maximum size
+        self.preview_size = None
+        self.preview = None
+
+        ###output of each step: {step index: (factors, image)}
+        self.stages = {}
+
+        ###last full resolution output: (factors, image)
+        self.full = None
+
+    def downscaled(self, size):
+        '''
+        This method gives the image reduced to fit in a given size
+        (the aspect ratio is kept, the image is never enlarged)
+
+        Parameters
+        ----------
+        size    :   tuple
+                    (width, height) maximum size
+
+        Return
+        ------
+        preview :   PIL Image
+                    downscaled image
+        '''
+        if size != self.preview_size:
+            self.preview = self.source.copy()
+            self.preview.thumbnail(size, Image.Resampling.BILINEAR)
+            self.preview_size = size
+            self.stages = {}
+
+        return self.preview
+
+    def render(self, factors, size=None):
+        '''
+        This method applies the enhancers
+
+        Parameters
+        ----------
+        factors :   dict
+                    with key=enhancer name (see STAGES)
+                         value=value of the slider
+                    enhancers that are not in the dictionary are not applied
+        size    :   tuple or None
+                    (width, height) maximum size of the output (preview).
+                    None: the full image is used
+
+        Return
+        ------
+        image   :   PIL Image
+                    enhanced image
+        '''
+        key = tuple(factors.get(stage) for stage in STAGES)
+
+        ###full resolution: only the last output is kept (big images)
+        if size is None:
+            if self.full is None or self.full[0] != key:
+                self.full = (key, apply_enhancers(self.source, factors))
+            return self.full[1]
+
+        ###preview: start from the last step that did not change
+        image = self.downscaled(size)
+        end = 0
+        for index, step in enumerate(enhancer_steps(image)):
+            end += len(step)
+            if all(key[STAGES.index(stage)] is None for stage in step):
+                continue
+            cached = self.stages.get(index)
+            if cached is not None and cached[0] == key[:end]:
+                image = cached[1]
+                continue
+
+            image = apply_step(image, step, factors)
+            self.stages[index] = (key[:end], image)
+
+        return image
+
+
+def enhancer_steps(image):
+    '''
+    This function gives the steps used to enhance an image
+
+    Parameters
+    ----------
+    image   :   PIL Image
+                image to enhance
+
+    Return
+    ------
+    steps   :   list
+                of lists of enhancer names, in the order of STAGES
+    '''
+    if image.mode in FUSED_MODES:
+        return [POINT_STAGES, ['sharpness']]
+
+    return [[stage] for stage in STAGES]
+
+
+def apply_step(image, step, factors):
+    '''
+    This function applies one step of the enhancers
+
+    Parameters
+    ----------
+    image   :   PIL Image
+                image to enhance
+    step    :   list
+                names of the enhancers of the step
+    factors :   dict
+                with key=enhancer name, value=value of the slider
+
+    Return
+    ------
+    image   :   PIL Image
+                enhanced image
+    '''
+    if step == POINT_STAGES:
+        return fused_point_enhancers(image, factors)
+
+    for stage in step:
+        if factors.get(stage) is not None:
+            image = ENHANCERS[stage](image, factors[stage])
+
+    return image
+
+
+def apply_enhancers(image, factors):
+    '''
+    This function applies the enhancers to an image, in the order of STAGES
+
+    Parameters
+    ----------
+    image   :   PIL Image
+                image to enhance
+    factors :   dict
+                with key=enhancer name, value=value of the slider
+
+    Return
+    ------
+    image   :   PIL Image
+                enhanced image
+    '''
+    for step in enhancer_steps(image):
+        if any(factors.get(stage) is not None for stage in step):
+            image = apply_step(image, step, factors)
+
+    return image
+
+
+###Function of each enhancer
+ENHANCERS = {'color': color, 'contrast': contrast, 'brightness': brightness,
+             'sharpness': sharpness}
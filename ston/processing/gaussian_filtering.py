@@ -0,0 +1,191 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the Gaussian filter of the analysis window, for images that
+can be very big (hundreds of millions of pixels).
+
+The filter is separable: one 1D pass along the rows and one along the
+columns (the colour channels are not mixed). The image is cut in bands of
+rows, each band is read with the rows needed around it (halo, the radius
+of the kernel) so the bands are filtered independently, possibly in
+several threads, and give the same result as the whole image. Only the
+bands are converted to float32; the output has the type of the image
+(uint8 images stay uint8) or is float32.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+from concurrent.futures import ThreadPoolExecutor
+
+##Third party
+import numpy
+from scipy import ndimage
+
+##local imports
+from .image_processing import number_of_workers
+
+###Size of the float32 band filtered at once [bytes]
+BAND_BYTES = 16 * 1024 * 1024
+
+###The kernel is cut at this number of sigma (same as skimage/scipy)
+TRUNCATE = 4.0
+
+
+class FilterCancelled(Exception):
+    '''
+    Raised when the filtering is cancelled
+    '''
+
+
+def kernel_radius(sigma, truncate=TRUNCATE):
+    '''
+    This function gives the radius of the Gaussian kernel
+    (same as scipy.ndimage.gaussian_filter1d)
+
+    Parameters
+    ----------
+    sigma       :   float
+                    sigma of the gaussian filter [pixels]
+    truncate    :   float
+                    the kernel is cut at this number of sigma
+
+    Return
+    ------
+    radius      :   int
+                    radius of the kernel [pixels]
+    '''
+    return int(truncate * float(sigma) + 0.5)
+
+
+def band_rows(shape, sigma, n_bands=1):
+    '''
+    This function cuts the rows of an image in bands
+
+    Parameters
+    ----------
+    shape   :   tuple
+                shape of the image
+    sigma   :   float
+                sigma of the gaussian filter (the bands are not
+                thinner than the halo)
+    n_bands :   int
+                minimum number of bands (e.g. one per thread)
+
+    Return
+    ------
+    bands   :   list
+                of (first row, last row + 1)
+    '''
+    row_bytes = 4 * int(numpy.prod(shape[1:], dtype=numpy.int64))
+    rows = max(1, BAND_BYTES // max(1, row_bytes), 2 * kernel_radius(sigma))
+    rows = min(rows, -(-shape[0] // max(1, n_bands)))
+
+    return [(start, min(start + rows, shape[0])) for start in range(0, shape[0], rows)]
+
+
+def filter_band(image_data, band, sigma, output, scale, truncate=TRUNCATE):
+    '''
+    This function filters one band of rows and writes it in the output
+
+    Parameters
+    ----------
+    image_data  :   numpy array
+                    full image (grayscale or colour, channels last)
+    band        :   tuple
+                    (first row, last row + 1) of the band
+    sigma       :   float
+                    sigma of the gaussian filter [pixels]
+    output      :   numpy array
+                    filtered image (same shape as image_data)
+    scale       :   float
+                    the filtered values are multiplied by scale
+    truncate    :   float
+                    the kernel is cut at this number of sigma
+    '''
+    start, end = band
+    radius = kernel_radius(sigma, truncate)
+    halo_start, halo_end = max(0, start - radius), min(image_data.shape[0], end + radius)
+
+    ##the band and its halo only are converted to float32
+    values = image_data[halo_start:halo_end].astype(numpy.float32)
+    for axis in (0, 1):
+        ndimage.gaussian_filter1d(values, sigma, axis=axis, output=values,
+                                  mode='nearest', truncate=truncate)
+    values = values[start - halo_start:end - halo_start]
+
+    if scale != 1:
+        values *= numpy.float32(scale)
+
+    if numpy.issubdtype(output.dtype, numpy.integer):
+        limits = numpy.iinfo(output.dtype)
+        numpy.rint(values, out=values)
+        numpy.clip(values, limits.min, limits.max, out=values)
+    output[start:end] = values
+
+
+def gaussian_filter(image_data, sigma, preserve_dtype=True, n_threads=0,
+                    cancel_event=None, truncate=TRUNCATE):
+    '''
+    This function applies a gaussian filter to the rows and columns of an
+    image (the colour channels are filtered separately)
+
+    Parameters
+    ----------
+    image_data      :   numpy array
+                        data of the image (grayscale, or colour with
+                        the channels last)
+    sigma           :   float
+                        sigma of the gaussian filter [pixels]
+    preserve_dtype  :   bool
+                        if True, integer images keep their type (values
+                        rounded). If False, the output is float32, between
+                        0 and 1 for integer images (as skimage does)
+    n_threads       :   int
+                        number of threads (0 = number of CPUs)
+    cancel_event    :   threading.Event or None
+                        if set, the filtering stops (FilterCancelled)
+    truncate        :   float
+                        the kernel is cut at this number of sigma
+
+    Return
+    ------
+    filtered        :   numpy array
+                        filtered image
+    '''
+    image_data = numpy.asarray(image_data)
+    integer = numpy.issubdtype(image_data.dtype, numpy.integer)
+
+    ##output type, and scale of the values (integer images to [0, 1])
+    scale = 1
+    if integer and preserve_dtype:
+        dtype = image_data.dtype
+    elif integer:
+        dtype = numpy.float32
+        scale = 1 / numpy.iinfo(image_data.dtype).max
+    else:
+        dtype = numpy.float32
+
+    if sigma <= 0:
+        return (image_data * scale).astype(dtype) if scale != 1 else \
+                image_data.astype(dtype, copy=True)
+
+    filtered = numpy.empty(image_data.shape, dtype=dtype)
+    n_workers = number_of_workers(n_threads)
+    bands = band_rows(image_data.shape, sigma, n_workers)
+
+    def run(band):
+        if cancel_event is not None and cancel_event.is_set():
+            raise FilterCancelled('The gaussian filter was cancelled')
+        filter_band(image_data, band, sigma, filtered, scale, truncate)
+
+    if n_workers > 1 and len(bands) > 1:
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            for _ in pool.map(run, bands):
+                pass
+    else:
+        for band in bands:
+            run(band)
+
+    return filtered
@@ -9,13 +9,79 @@ Year: 2024-2025
 """
 ###standard library
 import os
+import math
+import functools
+import collections
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 ###Third party library
 from matplotlib import font_manager
 import numpy
 from PIL import Image, ImageDraw, ImageFont
+import tifffile
 
-def make_mashup(config, imageswithpath):
+###gap between the images of the meta image [pixels]
+META_GAP = 10
+
+###Pools of processes {number of processes: pool}. They are kept between
+###calls (e.g. one meta image after the other): starting processes is slow
+PROCESS_POOLS = {}
+PROCESS_POOLS_LOCK = threading.Lock()
+
+def open_image_reduced(name_and_path, downgrade_factor):
+    '''
+    This function opens an image at the cheapest resolution that is still
+    at least the size of the original image divided by the downgrade factor.
+    - JPEG: Pillow draft mode (the decoder scales by 1/2, 1/4 or 1/8)
+    - TIFF with several pages: the smallest page with the same aspect ratio
+      (reduced-resolution levels of pyramidal TIFF files)
+    - other formats: the image is opened as it is
+
+    Parameters
+    ----------
+    name_and_path       :   str
+                            name of the image with its path
+    downgrade_factor    :   float
+                            downgrade factor that will be applied to the image
+
+    Return
+    ------
+    image               :   PIL.Image
+                            opened image (not decoded yet)
+    full_size           :   tuple
+                            (width, height) of the original image
+    '''
+    image = Image.open(name_and_path)
+    full_size = image.size
+
+    ##requested size
+    width = full_size[0] / downgrade_factor
+    height = full_size[1] / downgrade_factor
+
+    if image.format == 'JPEG':
+        ##draft keeps a size bigger or equal to the one requested
+        image.draft(None, (int(width), int(height)))
+
+    elif image.format == 'TIFF' and getattr(image, 'n_frames', 1) > 1:
+        aspect = full_size[0] / full_size[1]
+        best_frame, best_area = 0, full_size[0] * full_size[1]
+        for frame in range(1, image.n_frames):
+            image.seek(frame)
+            frame_width, frame_height = image.size
+            ##the page must be another level of the same image
+            if abs(frame_width / frame_height - aspect) > 0.01 * aspect:
+                continue
+            if frame_width >= width and frame_height >= height and \
+               frame_width * frame_height < best_area:
+                best_frame, best_area = frame, frame_width * frame_height
+        image.seek(best_frame)
+
+    return image, full_size
+
+def make_mashup(config, imageswithpath, n_processes=0):
     '''
     This function creates a mashup from different images
 
@@ -27,6 +93,10 @@ def make_mashup(config, imageswithpath):
     imageswithpath:   list
                     of files with path
 
+    n_processes :   int
+                    number of threads decoding the images (0 = number of CPUs,
+                    N_processes in [Meta_image_options])
+
     Return
     ------
     mashupimage     str
@@ -42,10 +112,10 @@ def make_mashup(config, imageswithpath):
     ##sort the dictionary
     sorted_images_by_order = sorted(fullpath_images, key=fullpath_images.get)
 
-    ##load the images
-    images = []
-    for image in sorted_images_by_order:
-        images.append(Image.open(image))
+    ##load the images (decoded in parallel, the decoders release the GIL)
+    n_workers = min(number_of_workers(n_processes), max(1, len(sorted_images_by_order)))
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        images = list(pool.map(load_image, sorted_images_by_order))
 
     ##get the sizes
     all_width = []
@@ -73,6 +143,293 @@ def make_mashup(config, imageswithpath):
 
     return config['name']
 
+def thumbnail_size(size, box):
+    '''
+    This function computes the size of an image after PIL.Image.thumbnail,
+    without decoding the image (same computation as in Pillow)
+
+    Parameters
+    ----------
+    size    :   tuple
+                (width, height) of the image
+    box     :   tuple
+                (width, height) given to thumbnail
+
+    Return
+    ------
+    final_size  :   tuple
+                    (width, height) of the thumbnail
+    '''
+    width, height = size
+    x, y = math.floor(box[0]), math.floor(box[1])
+    if x >= width and y >= height:
+        return size
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+
+    return x, y
+
+
+def meta_image_layout(image_list, conf):
+    '''
+    This function computes the layout of the meta image from the headers
+    of the images only (they are not decoded)
+
+    Parameters
+    ----------
+    image_list  list
+                with paths to images
+
+    conf        dictionary
+                main configuration of ston
+
+    Return
+    ------
+    rows        list
+                one list per line of the meta image, with (image, size of the thumbnail)
+    line_heights list
+                height of each line (with the gap)
+    final_size  tuple
+                (width, height) of the meta image
+    '''
+    factor = conf['Meta_image_options']['downgrade_factor']
+    ncol = conf['Meta_image_options']['ncol_meta_image']
+
+    ###Read the sizes and cut the list in lines
+    rows = []
+    for n, image in enumerate(image_list):
+        with Image.open(image) as im:
+            size = thumbnail_size(im.size, (im.width/factor, im.height/factor))
+
+        if n % ncol == 0:
+            rows.append([])
+        rows[-1].append((image, size))
+
+    ###the width of the final image if the max width between each line
+    ###and the height of the final image is the sum of each maximum height
+    ###of each line (between each image we add a gap)
+    line_widths = [sum(size[0] + META_GAP for _, size in row) for row in rows]
+    line_heights = [max(size[1] + META_GAP for _, size in row) for row in rows]
+
+    return rows, line_heights, (max(line_widths), sum(line_heights))
+
+
+@functools.lru_cache(maxsize=None)
+def load_meta_font(fontsize):
+    '''
+    This function finds an available font and loads it.
+    It is cached: the font is loaded only once per process.
+
+    Parameters
+    ----------
+    fontsize    :   int
+                    size of the font
+
+    Return
+    ------
+    pilfont     :   PIL.ImageFont
+                    font to write on the images
+    '''
+    font = font_manager.FontProperties(family='sans-serif', weight='bold')
+    return ImageFont.truetype(font_manager.findfont(font), fontsize)
+
+
+def make_meta_tile(image, options):
+    '''
+    This function creates one of the images of the meta image:
+    downgraded, and with its name on top if requested.
+    It runs in the worker processes.
+
+    Parameters
+    ----------
+    image       str
+                path to the image
+
+    options     dictionary
+                meta image options (Meta_image_options section of the configuration)
+
+    Return
+    ------
+    im          PIL.Image
+                image to paste in the meta image
+    '''
+    ##open the image
+    im = Image.open(image)
+
+    ##We downgrade the quality to avoid a heavy final image
+    im.thumbnail((im.width/options['downgrade_factor'],
+                  im.height/options['downgrade_factor']))
+
+    if options['name_on_images'] is True:
+        ##Add the image name to the image
+        draw = ImageDraw.Draw(im)
+        draw.text((0,0), os.path.basename(image),
+                  most_contrasted_color(compute_avg_color(numpy.array(im))),
+                  font=load_meta_font(options['meta_txt_fontsize']))
+
+    return im
+
+
+def load_image(image):
+    '''
+    This function opens and decodes an image
+
+    Parameters
+    ----------
+    image   :   str
+                path to the image
+
+    Return
+    ------
+    im      :   PIL.Image
+                decoded image
+    '''
+    im = Image.open(image)
+    im.load()
+    return im
+
+
+def number_of_workers(n_processes):
+    '''
+    This function gives the number of workers to use
+
+    Parameters
+    ----------
+    n_processes :   int
+                    requested number of workers (0 = number of CPUs)
+
+    Return
+    ------
+    n_workers   :   int
+                    number of workers
+    '''
+    if n_processes > 0:
+        return n_processes
+
+    return os.cpu_count() or 1
+
+
+def process_pool(n_workers):
+    '''
+    This function gives the pool of processes with n_workers processes.
+    It is created at the first call and then reused.
+
+    Parameters
+    ----------
+    n_workers   :   int
+                    number of processes
+
+    Return
+    ------
+    pool        :   ProcessPoolExecutor
+                    pool of processes
+    '''
+    with PROCESS_POOLS_LOCK:
+        pool = PROCESS_POOLS.get(n_workers)
+        if pool is None:
+            ###spawn: forking a process that runs Qt threads is not safe
+            ###(the processes are started when they are needed)
+            pool = ProcessPoolExecutor(max_workers=n_workers,
+                                       mp_context=multiprocessing.get_context('spawn'))
+            PROCESS_POOLS[n_workers] = pool
+
+    return pool
+
+
+def map_in_order(function, items, n_workers):
+    '''
+    This generator applies a function to each item in a pool of processes
+    and yields the results in the order of the items. At most 2 x n_workers
+    items are processed (or waiting) at the same time, to bound the memory.
+
+    Parameters
+    ----------
+    function    :   callable
+                    function to apply (must be picklable)
+    items       :   list
+                    of arguments
+    n_workers   :   int
+                    number of processes (1: everything runs in this process)
+
+    Yield
+    -----
+    result      :   result of function(item), in the order of items
+    '''
+    if n_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield function(item)
+        return
+
+    ##the pool is shared with the next calls (see process_pool)
+    pool = process_pool(n_workers)
+    futures = collections.deque()
+    try:
+        for item in items:
+            if len(futures) == 2 * n_workers:
+                yield futures.popleft().result()
+            futures.append(pool.submit(function, item))
+
+        while futures:
+            yield futures.popleft().result()
+
+    except BrokenProcessPool:
+        ##a process died: the next call starts a new pool
+        with PROCESS_POOLS_LOCK:
+            if PROCESS_POOLS.get(n_workers) is pool:
+                del PROCESS_POOLS[n_workers]
+        raise
+
+    finally:
+        ##results not used (error, or the caller stopped early)
+        for future in futures:
+            future.cancel()
+
+
+def render_meta_lines(rows, line_heights, width, conf):
+    '''
+    This generator renders the meta image line by line. The images are
+    decoded and downgraded in parallel (in a pool of processes), and only
+    a few lines of images are in memory at a time.
+
+    Parameters
+    ----------
+    rows            list
+                    from meta_image_layout
+    line_heights    list
+                    from meta_image_layout
+    width           int
+                    width of the meta image
+    conf            dictionary
+                    main configuration of ston
+
+    Yield
+    -----
+    line            PIL.Image
+                    RGBA image of one line of the meta image
+    '''
+    options = conf['Meta_image_options']
+    images = [image for row in rows for image, _ in row]
+    tiles = map_in_order(functools.partial(make_meta_tile, options=options), images,
+                         number_of_workers(options.get('n_processes', 0)))
+
+    for row, height in zip(rows, line_heights):
+        line = Image.new("RGBA", (width, height))
+
+        width_offset = 0
+        for _, size in row:
+            line.paste(next(tiles), (width_offset, 0))
+            width_offset += size[0] + META_GAP
+
+        yield line
+
+
 def create_meta_image(image_list, final_image_name, conf):
     '''
     This function creates a meta image with all the images
@@ -81,6 +438,11 @@ def create_meta_image(image_list, final_image_name, conf):
     The final image is made of N column (given in the configuration)
     and the number of lines depends on the number of images
 
+    The layout is computed from the image headers and the image is rendered
+    line by line. For TIFF files, the lines are written on disk as they
+    are rendered (BigTIFF if needed), so the memory used does not depend on
+    the number of images. Other formats need the full image before saving.
+
     Parameters
     ----------
     image_list	list
@@ -92,98 +454,35 @@ def create_meta_image(image_list, final_image_name, conf):
     conf        dictionary
                 main configuration of ston
     '''
-    ###In a single loop compute the number of lines and
-    ###the height and width of each row
-    colindiv = 0
-    line = 0
-    layout = {}
-    for n,image in enumerate(image_list):
-        del n ##we don't need it
-
-        #update the dictionaries if we are on a newline
-        if f'{line}' not in layout:
-            layout[f'{line}'] = {}
-
-        ##open the image
-        im = Image.open(image)
-
-        ##We downgrade the quality to avoid a heavy final image
-        im.thumbnail((im.width/conf['Meta_image_options']['downgrade_factor'],
-                      im.height/conf['Meta_image_options']['downgrade_factor']))
-
-        if conf['Meta_image_options']['name_on_images'] is True:
-            ###Find an available font and create the final font
-            font = font_manager.FontProperties(family='sans-serif', weight='bold')
-            pilfont = ImageFont.truetype(font_manager.findfont(font),
-                                         conf['Meta_image_options']['meta_txt_fontsize'])
-
-            ##Add the image name to the image
-            draw = ImageDraw.Draw(im)
-            draw.text((0,0), os.path.basename(image),
-                      most_contrasted_color(compute_avg_color(numpy.array(im))),
-                      font=pilfont)
-
-
-        ##Fill up the dictionries
-        layout[f'{line}'][f'{colindiv}'] = {'data': im}
-
-        ###if we are at the last column we need to change line
-        ###and reinitialise the column counter
-        if colindiv >= conf['Meta_image_options']['ncol_meta_image'] - 1:
-            colindiv = 0
-            line += 1
-        else:
-            ##Go to next column
-            colindiv += 1
-
-    ###create the final width and height of each line
-    ###between each image we add a space of 10 pix gap
-    gap = 10
-    all_line_sum_width = [] ##we will keep the width of each full line
-    all_line_max_height = [] ##and the max height of each full line
-
-    for line in layout:
-        line_width = [] ##gather all widths of each image
-        line_height = [] ##gather all height of each image
-
-        for column in layout[line]:
-            line_width.append(layout[line][column]['data'].width + gap)
-            line_height.append(layout[line][column]['data'].height + gap)
-
-        all_line_sum_width.append(sum(line_width)) ##keep the sum of the widths
-        all_line_max_height.append(max(line_height)) ##and the max height on that line
-
-    ##the width of the final image if the max width between each line
-    ##and the height of the final image is the sum of each maximum height
-    ##of each line
-    final_image_width = max(all_line_sum_width)
-    final_image_height = sum(all_line_max_height)
-
-    ###prepare the final image
-    final_image = Image.new("RGBA", (final_image_width, final_image_height) )
-
-    ##create the final image
-    width_offset = 0
-    height_offset = 0
-    l = 0 ###keep track of line
-    for line in layout:
-        for column in layout[line]:
-            #Extract data
-            data = layout[line][column]['data']
-
-            ##add the individual image to the final image
-            final_image.paste(data, (width_offset, height_offset))
-
-            ##update the offset
-            width_offset += data.width + gap
-
-        ##when done with a line, reinitialise width and update height offset
-        width_offset = 0
-        height_offset += all_line_max_height[l]
-        l += 1
+    ###Layout from the headers
+    rows, line_heights, (final_image_width, final_image_height) = \
+            meta_image_layout(image_list, conf)
+
+    lines = render_meta_lines(rows, line_heights, final_image_width, conf)
+
+    if os.path.splitext(final_image_name)[1].lower() in ['.tif', '.tiff']:
+        ###one strip per line of pixels
+        def strips():
+            for line in lines:
+                for pixels in numpy.asarray(line):
+                    yield pixels[numpy.newaxis]
+
+        shape = (final_image_height, final_image_width, 4)
+        tifffile.imwrite(final_image_name, data=strips(), shape=shape, dtype='uint8',
+                         photometric='rgb', extrasamples=['unassalpha'], rowsperstrip=1,
+                         bigtiff=numpy.prod(shape) > 2**31)
+
+    else:
+        ###prepare the final image
+        final_image = Image.new("RGBA", (final_image_width, final_image_height))
+
+        height_offset = 0
+        for line in lines:
+            final_image.paste(line, (0, height_offset))
+            height_offset += line.height
 
-    ##save it on disc
-    final_image.save(final_image_name)
+        ##save it on disc
+        final_image.save(final_image_name)
 
 
 def compute_avg_color(data):
@@ -0,0 +1,134 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains a spatial index of the regions found by the region
+identification, to find the region under a given pixel (e.g. a click
+on the image) without looking at all the regions.
+
+The image is cut in square cells (grid buckets). Each region is listed in
+all the cells its bounding box covers, so a query only looks at the
+regions of one cell. The few very large regions (covering many cells)
+are kept in a separate list that is always checked.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+
+##Third party
+import numpy
+
+##local imports
+
+###A region covering more cells than this is kept in the list of large regions
+MAX_CELLS_PER_REGION = 64
+
+
+class RegionIndex:
+    '''
+    This class finds the regions that contain a given pixel
+    '''
+    def __init__(self, bbox, cell_size=None):
+        '''
+        Class constructor: builds the grid
+
+        Parameters
+        ----------
+        bbox        :   numpy array
+                        (N, 4) bounding boxes of the regions
+                        (min_row, min_col, max_row, max_col), max excluded
+        cell_size   :   int or None
+                        size of the cells [pixels]. If None, twice the
+                        median size of the bounding boxes
+        '''
+        self.bbox = numpy.asarray(bbox, dtype=numpy.int64).reshape(-1, 4)
+        min_row, min_col, max_row, max_col = self.bbox.T
+
+        if cell_size is None:
+            sizes = numpy.maximum(max_row - min_row, max_col - min_col)
+            cell_size = 2 * numpy.median(sizes) if len(sizes) else 1
+        self.cell_size = max(1, int(cell_size))
+
+        ##cells covered by each bounding box
+        row0, col0 = min_row // self.cell_size, min_col // self.cell_size
+        row1 = (numpy.maximum(max_row, min_row + 1) - 1) // self.cell_size
+        col1 = (numpy.maximum(max_col, min_col + 1) - 1) // self.cell_size
+        self.ncols = int(col1.max()) + 1 if len(col1) else 1
+        nrows = int(row1.max()) + 1 if len(row1) else 1
+
+        width = col1 - col0 + 1
+        ncells = (row1 - row0 + 1) * width
+        large = ncells > MAX_CELLS_PER_REGION
+        self.large = numpy.flatnonzero(large)
+
+        ##one entry per (region, cell): regions are repeated over their cells
+        small = numpy.flatnonzero(~large)
+        repeat = ncells[small]
+        regions = numpy.repeat(small, repeat)
+        position = numpy.arange(len(regions)) - numpy.repeat(numpy.cumsum(repeat) - repeat,
+                                                             repeat)
+        cells = (row0[regions] + position // width[regions]) * self.ncols + \
+                 col0[regions] + position % width[regions]
+
+        ##regions sorted by cell, and where each cell starts
+        order = numpy.argsort(cells, kind='stable')
+        self.regions = regions[order]
+        self.starts = numpy.concatenate([[0], numpy.cumsum(numpy.bincount(cells,
+                                                minlength=nrows * self.ncols))])
+
+    def candidates(self, row, col):
+        '''
+        This method lists the regions whose bounding box contains a pixel
+
+        Parameters
+        ----------
+        row     :   int
+                    row of the pixel
+        col     :   int
+                    column of the pixel
+
+        Return
+        ------
+        regions :   numpy array
+                    indices of the regions (in the order of bbox)
+        '''
+        row, col = int(row), int(col)
+        regions = self.large
+        cell_row, cell_col = row // self.cell_size, col // self.cell_size
+        if 0 <= cell_row and 0 <= cell_col < self.ncols:
+            cell = cell_row * self.ncols + cell_col
+            if cell + 1 < len(self.starts):
+                regions = numpy.concatenate([self.regions[self.starts[cell]:
+                                                          self.starts[cell + 1]], regions])
+
+        min_row, min_col, max_row, max_col = self.bbox[regions].T
+        inside = (min_row <= row) & (row < max_row) & (min_col <= col) & (col < max_col)
+
+        return regions[inside]
+
+    def find(self, row, col):
+        '''
+        This method finds the region under a pixel: the region with the
+        smallest bounding box containing the pixel
+
+        Parameters
+        ----------
+        row     :   int
+                    row of the pixel
+        col     :   int
+                    column of the pixel
+
+        Return
+        ------
+        region  :   int
+                    index of the region (in the order of bbox), -1 if none
+        '''
+        regions = self.candidates(row, col)
+        if len(regions) == 0:
+            return -1
+
+        box = self.bbox[regions]
+        box_area = (box[:, 2] - box[:, 0]) * (box[:, 3] - box[:, 1])
+
+        return int(regions[numpy.argmin(box_area)])
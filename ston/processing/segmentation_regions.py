@@ -8,10 +8,11 @@ Year: 2025-
 """
 
 #Standard Library
-
+import tracemalloc
 
 #Third party
 import numpy
+from scipy import ndimage
 from skimage import measure, color
 
 
@@ -38,59 +39,336 @@ def find_regions(image_data, conf):
     result      :   dict
                     with results
     '''
+    low_memory = conf['Analysis'].get('low_memory', False)
+    grayscale = conf['Analysis'].get('grayscale', 'float')
+    if low_memory:
+        ##Follow the memory used (numpy arrays are traced)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+
     #Convert to grayscale
-    if len(image_data.shape) == 3:
-        image_data = color.rgb2gray(image_data)
+    image_data = to_grayscale(image_data, low_memory, grayscale)
+
+    ##number of pixel in the image (to compute ratios after)
+    npix = numpy.shape(image_data)[0] * numpy.shape(image_data)[1]
 
     ##To find region we need to create a binary_image
     ##we set the threshold at image image
-    binary_image = image_data > numpy.mean(image_data)
+    binary_image = image_data > mean_threshold(image_data)
+
+    ##count the number of white pixels (all the others are black)
+    nwhite = numpy.count_nonzero(binary_image)
 
     ##Label connected regions
-    labeled_image = measure.label(binary_image)
+    if low_memory:
+        del image_data
+        labeled_image = label_low_memory(binary_image)
+    else:
+        labeled_image = measure.label(binary_image)
+    del binary_image
 
     ##Measure properties of labeled regions
-    properties = measure.regionprops(labeled_image)
-
-    ##keep only the properties we want
-    scatter_x = []
-    scatter_y = []
-    region_area = []
-    region_bbox = []
-
-    for region in properties:
-        if region.area >= conf['Analysis']['minimum_size']:
-            x, y = region.centroid
-            scatter_x.append(x)
-            scatter_y.append(y)
-            region_area.append(region.area)
-            region_bbox.append(region.bbox)
+    ##(all the regions at once, then keep the ones we want)
+    region_area, scatter_x, scatter_y, region_bbox = measure_regions(labeled_image)
+    results = sort_regions(region_area, scatter_x, scatter_y, region_bbox,
+                           conf['Analysis']['minimum_size'])
 
-    ##Sort everything from biggest region to smallest
-    #First, transfor to numpy array
-    region_area = numpy.array(region_area)
-    scatter_x = numpy.array(scatter_x)
-    scatter_y = numpy.array(scatter_y)
-    region_bbox = numpy.array(region_bbox)
+    numpy.minimum(labeled_image, 1, out=labeled_image)
+
+    ##result
+    ##get some data: ratio of white and black pixels
+    results['black_ratio'] = round((npix - nwhite)/npix, 2)
+    results['white_ratio'] = round(nwhite/npix, 2)
+
+    if low_memory:
+        ##peak memory [MB] used by the segmentation
+        results['peak_memory'] = tracemalloc.get_traced_memory()[1] / 1024**2
+        if not tracing:
+            tracemalloc.stop()
+
+    return labeled_image, results
+
+
+def to_grayscale(image_data, low_memory=False, grayscale='float'):
+    '''
+    This function converts colour images to grayscale
+    (grayscale images are returned as they are)
+
+    Parameters
+    ----------
+    image_data  :   numpy array
+                    data of the image
+    low_memory  :   bool
+                    if True, the grayscale image is in float32
+    grayscale   :   str
+                    'integer': 8 bits colour images are converted with
+                    integer arithmetic (see grayscale_uint8).
+                    'float': skimage.color.rgb2gray
+
+    return
+    ------
+    gray        :   numpy array
+                    grayscale image
+    '''
+    if len(image_data.shape) != 3:
+        return image_data
+
+    if grayscale == 'integer' and image_data.dtype == numpy.uint8:
+        return grayscale_uint8(image_data)
+
+    if low_memory:
+        return grayscale_float32(image_data)
+
+    return color.rgb2gray(image_data)
+
+
+def sort_regions(region_area, scatter_x, scatter_y, region_bbox, minimum_size):
+    '''
+    This function keeps the regions bigger than the minimum size
+    and sorts them from the biggest to the smallest
 
-    #Then sort the area and the rest
+    Parameters
+    ----------
+    region_area     :   numpy array
+                        area of each region (in the order of the labels)
+    scatter_x       :   numpy array
+                        centroid (row) of each region
+    scatter_y       :   numpy array
+                        centroid (column) of each region
+    region_bbox     :   numpy array
+                        bounding box of each region
+    minimum_size    :   float
+                        minimum area of a region
+
+    return
+    ------
+    results         :   dict
+                        with x, y, area and bbox of the regions
+    '''
+    keep = region_area >= minimum_size
+    region_area = region_area[keep]
+    scatter_x = scatter_x[keep]
+    scatter_y = scatter_y[keep]
+    region_bbox = region_bbox[keep] if keep.any() else numpy.array([])
+
+    ##Sort everything from biggest region to smallest
     inds = region_area.argsort()[::-1]
-    sorted_x = scatter_x[inds]
-    sorted_y = scatter_y[inds]
-    sorted_bbox = region_bbox[inds]
-    sorted_area = region_area[inds]
 
-    results = {'x': sorted_x, 'y': sorted_y, 'area': sorted_area,
-               'bbox': sorted_bbox}
+    return {'x': scatter_x[inds], 'y': scatter_y[inds], 'area': region_area[inds],
+            'bbox': region_bbox[inds]}
 
-    labeled_image[labeled_image>0] = 1
 
-    ##result
-    ##number of pixel in the image (to compute ratios after)
-    npix = numpy.shape(image_data)[0] * numpy.shape(image_data)[1]
+def grayscale_float32(image_data):
+    '''
+    This function converts a colour image to grayscale in float32
+    (same weights as skimage.color.rgb2gray, without rescaling: only
+    the comparison to the mean is used)
+
+    Parameters
+    ----------
+    image_data  :   numpy array
+                    colour image (the alpha channel, if any, is ignored)
+
+    return
+    ------
+    gray        :   numpy array
+                    grayscale image (float32)
+    '''
+    gray = numpy.multiply(image_data[..., 0], numpy.float32(0.2125), dtype=numpy.float32)
+    channel = numpy.empty_like(gray)
+    for index, weight in [(1, 0.7154), (2, 0.0721)]:
+        numpy.multiply(image_data[..., index], numpy.float32(weight), out=channel)
+        gray += channel
 
-    ##get some data: count the number of white and black pixels
-    results['black_ratio'] = round(len(numpy.where(labeled_image == 0)[0])/npix, 2)
-    results['white_ratio'] = round(len(numpy.where(labeled_image == 1)[0])/npix, 2)
+    return gray
 
-    return labeled_image, results
+
+def grayscale_uint8(image_data):
+    '''
+    This function converts a 8 bits colour image to a 8 bits grayscale
+    image with fixed-point arithmetic: the weights of rgb2gray are
+    multiplied by 256 (54, 183, 19) and the sum (at most 255*256,
+    it holds in 16 bits) is divided by 256 with rounding.
+
+    Parameters
+    ----------
+    image_data  :   numpy array
+                    colour image, uint8 (the alpha channel, if any, is ignored)
+
+    return
+    ------
+    gray        :   numpy array
+                    grayscale image (uint8, 0-255)
+    '''
+    gray = numpy.multiply(image_data[..., 0], numpy.uint16(54), dtype=numpy.uint16)
+    channel = numpy.empty_like(gray)
+    for index, weight in [(1, 183), (2, 19)]:
+        numpy.multiply(image_data[..., index], numpy.uint16(weight), out=channel)
+        gray += channel
+
+    ##rounding (255*256 + 128 still holds in 16 bits)
+    gray += numpy.uint16(128)
+    gray >>= 8
+
+    return gray.astype(numpy.uint8)
+
+
+def mean_threshold(gray):
+    '''
+    This function computes the threshold of the region identification:
+    the mean of the grayscale image. For integer images, the sum is done
+    with an integer accumulator and the threshold is the integer part of
+    the mean ('gray > mean' and 'gray > floor(mean)' are the same for
+    integer values).
+
+    Parameters
+    ----------
+    gray        :   numpy array
+                    grayscale image
+
+    return
+    ------
+    threshold   :   int or float
+                    threshold (regions are the pixels > threshold)
+    '''
+    if numpy.issubdtype(gray.dtype, numpy.integer):
+        total = int(numpy.sum(gray, dtype=numpy.int64))
+        return total // gray.size
+
+    return numpy.mean(gray, dtype=numpy.float64)
+
+
+def label_low_memory(binary_image):
+    '''
+    This function labels the connected regions (8-connectivity, same
+    labels as skimage.measure.label) with the smallest integer type
+    that can hold the labels: uint16 if possible, int32 otherwise.
+
+    Parameters
+    ----------
+    binary_image    :   numpy array
+                        binary image
+
+    return
+    ------
+    labeled_image   :   numpy array
+                        labeled image
+    '''
+    structure = numpy.ones((3, 3), dtype=bool)
+    try:
+        labeled_image, _ = ndimage.label(binary_image, structure, output=numpy.uint16)
+    except RuntimeError:
+        ##too many regions for 16 bits
+        labeled_image, _ = ndimage.label(binary_image, structure, output=numpy.int32)
+
+    return labeled_image
+
+
+def measure_regions(labeled_image, chunk_rows=None):
+    '''
+    This function measures the area, centroid and bounding box of all
+    the regions of a labeled image at once (same values as
+    skimage.measure.regionprops, in the order of the labels).
+    The sums are accumulated over blocks of lines to limit the memory used.
+
+    Parameters
+    ----------
+    labeled_image   :   numpy array
+                        labeled image (0 = background, labels 1...N)
+    chunk_rows      :   int or None
+                        number of lines in each block (default: about
+                        4 million pixels per block)
+
+    return
+    ------
+    area            :   numpy array
+                        number of pixels of each region
+    centroid_row    :   numpy array
+                        centroid (row) of each region
+    centroid_col    :   numpy array
+                        centroid (column) of each region
+    bbox            :   numpy array
+                        (min_row, min_col, max_row, max_col) of each region
+    '''
+    nlabels = int(labeled_image.max()) if labeled_image.size else 0
+    area, sum_row, sum_col = region_sums(labeled_image, nlabels, chunk_rows)
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        centroid_row = sum_row / area
+        centroid_col = sum_col / area
+
+    return area, centroid_row, centroid_col, region_bboxes(labeled_image, nlabels)
+
+
+def region_sums(labeled_image, nlabels, chunk_rows=None):
+    '''
+    This function computes, for each region, the number of pixels and the
+    sums of the row and column indices of its pixels (exact integer sums).
+    The sums are accumulated over blocks of lines to limit the memory used.
+
+    Parameters
+    ----------
+    labeled_image   :   numpy array
+                        labeled image (0 = background, labels 1...N)
+    nlabels         :   int
+                        number of labels N
+    chunk_rows      :   int or None
+                        number of lines in each block (default: about
+                        4 million pixels per block)
+
+    return
+    ------
+    area            :   numpy array
+                        number of pixels of each region
+    sum_row         :   numpy array
+                        sum of the row indices of each region
+    sum_col         :   numpy array
+                        sum of the column indices of each region
+    '''
+    height, width = labeled_image.shape[:2]
+    if chunk_rows is None:
+        chunk_rows = max(1, 2**22 // max(width, 1))
+
+    area = numpy.zeros(nlabels + 1)
+    sum_row = numpy.zeros(nlabels + 1)
+    sum_col = numpy.zeros(nlabels + 1)
+    columns = numpy.arange(width, dtype=numpy.float64)
+
+    for start in range(0, height, chunk_rows):
+        block = labeled_image[start:start+chunk_rows]
+        labels = block.ravel()
+        rows = numpy.repeat(numpy.arange(start, start + len(block), dtype=numpy.float64),
+                            width)
+        area += numpy.bincount(labels, minlength=nlabels + 1)
+        sum_row += numpy.bincount(labels, weights=rows, minlength=nlabels + 1)
+        sum_col += numpy.bincount(labels, weights=numpy.tile(columns, len(block)),
+                                  minlength=nlabels + 1)
+
+    ##remove the background
+    return area[1:], sum_row[1:], sum_col[1:]
+
+
+def region_bboxes(labeled_image, nlabels):
+    '''
+    This function gives the bounding box of each region
+
+    Parameters
+    ----------
+    labeled_image   :   numpy array
+                        labeled image (0 = background, labels 1...N)
+    nlabels         :   int
+                        number of labels N
+
+    return
+    ------
+    bbox            :   numpy array
+                        (min_row, min_col, max_row, max_col) of each region
+    '''
+    ##bounding boxes from the slices of each label
+    return numpy.array([(i[0].start, i[1].start, i[0].stop, i[1].stop)
+                        if i is not None else (0, 0, 0, 0)
+                        for i in ndimage.find_objects(labeled_image, nlabels)],
+                       dtype=numpy.int64).reshape(-1, 4)
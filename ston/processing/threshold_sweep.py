@@ -0,0 +1,324 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the threshold sweep: the regions found for every threshold
+of a grayscale (uint8) image, computed in a single pass.
+
+The pixels are added from the brightest level to the darkest one, and the
+connected components (8-connectivity) are merged with a union-find as
+their pixels are added. Each time a component changes (new pixels or
+merge) a node of the component tree is recorded with its level, its area
+and the level where it changes again (its 'end'). The regions of the
+binary image 'gray > t' are then the nodes with end <= t < level.
+
+The edges between neighbouring pixels are never stored for the whole
+image: at each level they are made from the pixels of that level, one
+direction at a time, and the pixels are indexed with int32 (unless the
+image has more than 2**31 pixels).
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+
+##Third party
+import numpy
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from skimage import color
+
+##local imports
+from .segmentation_regions import grayscale_uint8
+
+###Number of gray levels
+NLEVELS = 256
+
+###Directions of the neighbours (8-connectivity), (row, column).
+###The first four are the 'forward' ones: right, down, down-right, down-left
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1), (0, -1), (-1, 0), (-1, -1), (-1, 1)]
+
+
+class SweepCancelled(Exception):
+    '''
+    Raised when the threshold sweep is cancelled
+    '''
+
+
+def to_gray_uint8(image_data):
+    '''
+    This function converts an image to a uint8 grayscale image
+    (8 bits colour images: same conversion as find_regions with
+    grayscale = integer)
+
+    Parameters
+    ----------
+    image_data  :   numpy array
+                    data of the image (grayscale or colour)
+
+    Return
+    ------
+    gray        :   numpy array
+                    uint8 grayscale image
+    '''
+    image_data = numpy.asarray(image_data)
+    if len(image_data.shape) == 3 and image_data.dtype == numpy.uint8:
+        return grayscale_uint8(image_data)
+
+    if len(image_data.shape) == 3:
+        return numpy.round(color.rgb2gray(image_data) * 255).astype(numpy.uint8)
+
+    if image_data.dtype == numpy.uint8:
+        return image_data
+
+    ##other grayscale images are rescaled between 0 and 255
+    low, high = float(image_data.min()), float(image_data.max())
+    scale = 255 / (high - low) if high > low else 0
+    return numpy.round((image_data - low) * scale).astype(numpy.uint8)
+
+
+def index_type(npix):
+    '''
+    This function gives the smallest integer type for the pixel indices
+
+    Parameters
+    ----------
+    npix    :   int
+                number of pixels of the image
+
+    Return
+    ------
+    dtype   :   numpy dtype
+                int32, or int64 for very big images
+    '''
+    return numpy.int32 if npix < numpy.iinfo(numpy.int32).max else numpy.int64
+
+
+def neighbour_edges(flat, shape, new, level):
+    '''
+    This function lists the edges that appear at a level: the pairs of
+    neighbouring pixels (8-connectivity) made of a pixel of this level
+    and a pixel of this level or brighter, each pair once.
+    They are made one direction at a time.
+
+    Parameters
+    ----------
+    flat    :   numpy array
+                gray levels of the pixels (flat)
+    shape   :   tuple
+                shape of the image
+    new     :   numpy array
+                pixels of the level (flat index)
+    level   :   int
+                gray level
+
+    Return
+    ------
+    first   :   numpy array
+                first pixel of each pair (flat index)
+    second  :   numpy array
+                second pixel of each pair (flat index)
+    '''
+    height, width = shape
+    rows, cols = numpy.divmod(new, width)
+
+    first, second = [], []
+    for number, (drow, dcol) in enumerate(DIRECTIONS):
+        inside = (rows + drow >= 0) & (rows + drow < height) & \
+                 (cols + dcol >= 0) & (cols + dcol < width)
+        pixels = new[inside]
+        neighbours = pixels + (drow * width + dcol)
+
+        ##the pairs of two pixels of this level are given by the forward
+        ##directions only (otherwise they would be given twice)
+        values = flat[neighbours]
+        keep = values > level if number >= 4 else values >= level
+        first.append(pixels[keep])
+        second.append(neighbours[keep])
+
+    return numpy.concatenate(first), numpy.concatenate(second)
+
+
+class ThresholdSweep:
+    '''
+    This class computes the regions of an image for all the thresholds
+    '''
+    def __init__(self, image_data, cancel_event=None):
+        '''
+        Class constructor: builds the component tree
+
+        Parameters
+        ----------
+        image_data      :   numpy array
+                            data of the image (converted to uint8 grayscale)
+        cancel_event    :   threading.Event or None
+                            if set, the sweep stops (SweepCancelled)
+        '''
+        self.gray = to_gray_uint8(image_data)
+        flat = self.gray.ravel()
+        self.npix = flat.size
+
+        ###histogram, for the black and white ratios
+        self.histogram = numpy.bincount(flat, minlength=NLEVELS)
+
+        ###nodes of the component tree
+        self.level, self.end, self.area = self.build_tree(flat, cancel_event)
+
+    def build_tree(self, flat, cancel_event=None):
+        '''
+        This method adds the pixels level by level (brightest first)
+        and records the nodes of the component tree
+
+        Parameters
+        ----------
+        flat            :   numpy array
+                            gray levels of the pixels (flat)
+        cancel_event    :   threading.Event or None
+                            if set, the sweep stops (SweepCancelled)
+
+        Return
+        ------
+        level   :   numpy array
+                    level of each node
+        end     :   numpy array
+                    level where the node changes (-1 if it never does)
+        area    :   numpy array
+                    area of each node
+        '''
+        ##pixels sorted by level (an edge appears at the level of its
+        ##darkest pixel, see neighbour_edges)
+        dtype = index_type(self.npix)
+        pixels = numpy.argsort(flat, kind='stable').astype(dtype)
+        pixel_bounds = numpy.searchsorted(flat[pixels], numpy.arange(NLEVELS + 1))
+
+        parent = numpy.arange(self.npix, dtype=dtype)
+        area = numpy.zeros(self.npix, dtype=dtype)
+        last_node = numpy.full(self.npix, -1, dtype=dtype)
+
+        ##each node contains at least one pixel of its level:
+        ##there are at most npix nodes
+        nodes_level = numpy.zeros(self.npix, dtype=numpy.int16)
+        nodes_end = numpy.zeros(self.npix, dtype=numpy.int16)
+        nodes_area = numpy.zeros(self.npix, dtype=dtype)
+        nnodes = 0
+
+        def find(pixels_to_find):
+            ##roots of the pixels (and compression of their path)
+            roots = parent[pixels_to_find]
+            while True:
+                grandparent = parent[roots]
+                moving = grandparent != roots
+                if not moving.any():
+                    break
+                roots[moving] = grandparent[moving]
+            parent[pixels_to_find] = roots
+            return roots
+
+        for level in range(NLEVELS - 1, -1, -1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise SweepCancelled('The threshold sweep was cancelled')
+
+            new = pixels[pixel_bounds[level]:pixel_bounds[level + 1]]
+            if len(new) == 0:
+                continue
+            area[new] = 1
+
+            first, second = neighbour_edges(flat, self.gray.shape, new, level)
+            roots1 = find(first)
+            roots2 = find(second)
+
+            ##components touched at this level, merged with the edges
+            touched, index = numpy.unique(numpy.concatenate([roots1, roots2, new]),
+                                          return_inverse=True)
+            nedges = len(roots1)
+            graph = coo_matrix((numpy.ones(nedges, dtype=numpy.int8),
+                                (index[:nedges], index[nedges:2*nedges])),
+                               shape=(len(touched), len(touched)))
+            ncomponents, component = connected_components(graph, directed=False)
+
+            ##the representative of each component is its smallest root
+            representative = numpy.full(ncomponents, self.npix, dtype=numpy.int64)
+            numpy.minimum.at(representative, component, touched)
+            new_area = numpy.bincount(component, weights=area[touched],
+                                      minlength=ncomponents).astype(dtype)
+
+            ##the previous nodes of these components end here
+            previous = last_node[touched]
+            nodes_end[previous[previous >= 0]] = level
+
+            parent[touched] = representative[component]
+            area[representative] = new_area
+
+            ##new nodes
+            new_nodes = slice(nnodes, nnodes + ncomponents)
+            nodes_level[new_nodes] = level
+            nodes_end[new_nodes] = -1
+            nodes_area[new_nodes] = new_area
+            last_node[representative] = numpy.arange(nnodes, nnodes + ncomponents)
+            nnodes += ncomponents
+
+        return nodes_level[:nnodes], nodes_end[:nnodes], nodes_area[:nnodes]
+
+    def default_threshold(self):
+        '''
+        Threshold used by find_regions (mean of the image)
+
+        Return
+        ------
+        threshold   :   int
+                        threshold (regions are the pixels > threshold)
+        '''
+        return int(numpy.floor(numpy.mean(self.gray, dtype=numpy.float64)))
+
+    def counts(self, minimum_size=1):
+        '''
+        Number of regions for each threshold
+
+        Parameters
+        ----------
+        minimum_size    :   float
+                            minimum area of a region
+
+        Return
+        ------
+        counts          :   numpy array
+                            number of regions for each threshold 0...255
+        '''
+        keep = self.area >= minimum_size
+        difference = numpy.zeros(NLEVELS + 1, dtype=numpy.int64)
+        numpy.add.at(difference, numpy.maximum(self.end[keep], 0), 1)
+        numpy.add.at(difference, self.level[keep], -1)
+
+        return numpy.cumsum(difference)[:NLEVELS]
+
+    def white_ratios(self):
+        '''
+        Ratio of white pixels (> threshold) for each threshold
+
+        Return
+        ------
+        ratios  :   numpy array
+                    ratio of white pixels for each threshold 0...255
+        '''
+        return 1 - numpy.cumsum(self.histogram) / self.npix
+
+    def areas(self, threshold, minimum_size=1):
+        '''
+        Areas of the regions for a given threshold
+
+        Parameters
+        ----------
+        threshold       :   int
+                            threshold (regions are the pixels > threshold)
+        minimum_size    :   float
+                            minimum area of a region
+
+        Return
+        ------
+        areas           :   numpy array
+                            areas of the regions, from the biggest to the smallest
+        '''
+        alive = (self.end <= threshold) & (threshold < self.level) & \
+                (self.area >= minimum_size)
+
+        return numpy.sort(self.area[alive])[::-1]
@@ -0,0 +1,313 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the tiled version of the region identification, for images
+that are too big to be segmented in one piece (e.g. whole-slide scans).
+
+The image is read tile by tile (it can be a memory-mapped file, see
+batch_segmentation.open_image_memmap):
+    - a first pass computes the mean of the grayscale image (threshold),
+    - a second pass labels each tile independently (possibly in a pool of
+      processes) and measures its regions,
+    - the regions that cross the tile borders are merged with a union-find
+      on the labels found on each side of the borders (8-connectivity).
+The regions are then ordered by their first pixel, like the labels of the
+whole image, so the results are the same as the ones of find_regions.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import functools
+
+##Third party
+import numpy
+from scipy import ndimage
+
+##local imports
+from . import segmentation_regions
+from .image_processing import map_in_order, number_of_workers
+
+###Default size of the tiles [pixels]
+DEFAULT_TILE_SIZE = 2048
+
+
+def tile_slices(shape, tile_size):
+    '''
+    This function cuts an image in tiles
+
+    Parameters
+    ----------
+    shape       :   tuple
+                    shape of the image
+    tile_size   :   int
+                    size of the tiles
+
+    Return
+    ------
+    tiles       :   list
+                    one list of (row slice, column slice) per line of tiles
+    '''
+    return [[(slice(row, min(row + tile_size, shape[0])),
+              slice(col, min(col + tile_size, shape[1])))
+             for col in range(0, shape[1], tile_size)]
+            for row in range(0, shape[0], tile_size)]
+
+
+def tile_sum(tile, low_memory, grayscale='float'):
+    '''
+    This function computes the sum of the grayscale values of a tile.
+    Integer images are summed exactly, so the mean is the same as the
+    one of the whole image.
+
+    Parameters
+    ----------
+    tile        :   numpy array
+                    data of the tile
+    low_memory  :   bool
+                    grayscale in float32 (see segmentation_regions.find_regions)
+    grayscale   :   str
+                    conversion to grayscale (see segmentation_regions.to_grayscale)
+
+    Return
+    ------
+    total       :   int or float
+                    sum of the grayscale values
+    '''
+    gray = segmentation_regions.to_grayscale(numpy.asarray(tile), low_memory, grayscale)
+    if numpy.issubdtype(gray.dtype, numpy.integer):
+        return int(numpy.sum(gray, dtype=numpy.int64))
+
+    return float(numpy.sum(gray, dtype=numpy.float64))
+
+
+def segment_tile(task, threshold, low_memory, pack, grayscale='float'):
+    '''
+    This function labels one tile and measures its regions.
+    It runs in the worker processes.
+
+    Parameters
+    ----------
+    task        :   tuple
+                    (tile data, first row, first column, width of the image)
+    threshold   :   float
+                    mean of the grayscale image
+    low_memory  :   bool
+                    grayscale in float32
+    pack        :   bool
+                    if True the binary tile is returned (packed bits)
+    grayscale   :   str
+                    conversion to grayscale (see segmentation_regions.to_grayscale)
+
+    Return
+    ------
+    measures    :   dict
+                    measures of the regions of the tile (global coordinates)
+                    and labels along the borders of the tile
+    '''
+    tile, row0, col0, width = task
+    gray = segmentation_regions.to_grayscale(numpy.asarray(tile), low_memory, grayscale)
+    binary = gray > threshold
+    del gray
+
+    labels, nlabels = ndimage.label(binary, numpy.ones((3, 3), dtype=bool),
+                                    output=numpy.int32)
+    height, tile_width = labels.shape
+
+    area, sum_row, sum_col = segmentation_regions.region_sums(labels, nlabels)
+    bbox = segmentation_regions.region_bboxes(labels, nlabels) + [row0, col0, row0, col0]
+
+    ##first pixel of each region (labels are given in the scanning order)
+    _, first = numpy.unique(labels, return_index=True)
+    first = first[-nlabels:] if nlabels else first[:0]
+    first_pixel = (row0 + first // tile_width) * width + col0 + first % tile_width
+
+    return {'nlabels': nlabels, 'area': area,
+            'sum_row': sum_row + area * row0, 'sum_col': sum_col + area * col0,
+            'bbox': bbox, 'first_pixel': first_pixel.astype(numpy.int64),
+            'top': labels[0].copy(), 'bottom': labels[-1].copy(),
+            'left': labels[:, 0].copy(), 'right': labels[:, -1].copy(),
+            'nwhite': numpy.count_nonzero(binary), 'shape': (height, tile_width),
+            'binary': numpy.packbits(binary) if pack else None}
+
+
+def border_pairs(side1, side2):
+    '''
+    This function finds the pairs of labels that touch across a border
+    (8-connectivity: a pixel touches the 3 pixels facing it)
+
+    Parameters
+    ----------
+    side1   :   numpy array
+                labels along the border, on one side
+    side2   :   numpy array
+                labels along the border, on the other side
+
+    Return
+    ------
+    pairs   :   numpy array
+                (N, 2) pairs of labels (background excluded)
+    '''
+    pairs = []
+    for shift in [-1, 0, 1]:
+        first = side1[max(0, -shift):len(side1) - max(0, shift)]
+        second = side2[max(0, shift):len(side2) - max(0, -shift)]
+        touching = (first > 0) & (second > 0)
+        pairs.append(numpy.stack([first[touching], second[touching]], axis=1))
+
+    return numpy.concatenate(pairs)
+
+
+def union_find(nlabels, pairs):
+    '''
+    This function merges the labels given in pairs
+
+    Parameters
+    ----------
+    nlabels :   int
+                number of labels (labels are 1...nlabels)
+    pairs   :   numpy array
+                (N, 2) pairs of labels to merge
+
+    Return
+    ------
+    roots   :   numpy array
+                root label of each label (index 0 is the background)
+    '''
+    parent = numpy.arange(nlabels + 1)
+
+    def find(label):
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    ##a region that crosses a border gives many times the same pair
+    for label1, label2 in numpy.unique(pairs, axis=0):
+        root1, root2 = find(label1), find(label2)
+        if root1 != root2:
+            parent[max(root1, root2)] = min(root1, root2)
+
+    ##flatten the trees
+    while True:
+        grandparent = parent[parent]
+        if numpy.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def find_regions_tiled(image_data, conf, tile_size=DEFAULT_TILE_SIZE, n_processes=1,
+                       output=None):
+    '''
+    This function finds the connected regions of an image, tile by tile.
+    The results are the same as the ones of segmentation_regions.find_regions
+
+    Parameters
+    ----------
+    image_data  :   numpy array or memmap
+                    data of the image (only one tile at a time is read)
+    conf        :   dict
+                    configuration of STON
+    tile_size   :   int
+                    size of the tiles [pixels]
+    n_processes :   int
+                    number of processes (1 = no pool, 0 = number of CPUs)
+    output      :   numpy array or None
+                    if given, array (height, width) where the binary
+                    image (0/1) is written
+
+    return
+    ------
+    output      :   numpy array or None
+                    binary image (None if no output was given)
+    result      :   dict
+                    with results (same as find_regions)
+    '''
+    low_memory = conf['Analysis'].get('low_memory', False)
+    grayscale = conf['Analysis'].get('grayscale', 'float')
+    height, width = image_data.shape[:2]
+    tiles = tile_slices(image_data.shape, tile_size)
+    all_tiles = [tile for line in tiles for tile in line]
+    n_workers = number_of_workers(n_processes)
+
+    ###First pass: threshold
+    total = sum(map_in_order(functools.partial(tile_sum, low_memory=low_memory,
+                                               grayscale=grayscale),
+                             [image_data[rows, cols] for rows, cols in all_tiles],
+                             n_workers))
+    ##same threshold as segmentation_regions.mean_threshold
+    if isinstance(total, int):
+        threshold = total // (height * width)
+    else:
+        threshold = numpy.float64(total) / (height * width)
+
+    ###Second pass: regions of each tile
+    tasks = [(image_data[rows, cols], rows.start, cols.start, width)
+             for rows, cols in all_tiles]
+    worker = functools.partial(segment_tile, threshold=threshold, low_memory=low_memory,
+                               pack=output is not None, grayscale=grayscale)
+    measures = []
+    offset = 0
+    for (rows, cols), measure in zip(all_tiles, map_in_order(worker, tasks, n_workers)):
+        ##labels of the tile become global labels
+        for side in ['top', 'bottom', 'left', 'right']:
+            measure[side][measure[side] > 0] += offset
+        offset += measure['nlabels']
+
+        if output is not None:
+            output[rows, cols] = numpy.unpackbits(measure.pop('binary'),
+                                                  count=numpy.prod(measure['shape'])
+                                                  ).reshape(measure['shape'])
+        measures.append(measure)
+
+    ###Merge the regions that cross the borders
+    ntiles_col = len(tiles[0])
+    pairs = [numpy.zeros((0, 2), dtype=numpy.int32)]
+    for i, line in enumerate(tiles):
+        ##vertical borders
+        for j in range(len(line) - 1):
+            pairs.append(border_pairs(measures[i*ntiles_col + j]['right'],
+                                      measures[i*ntiles_col + j + 1]['left']))
+        ##horizontal border with the next line of tiles (full width)
+        if i < len(tiles) - 1:
+            bottom = numpy.concatenate([measures[i*ntiles_col + j]['bottom']
+                                        for j in range(ntiles_col)])
+            top = numpy.concatenate([measures[(i+1)*ntiles_col + j]['top']
+                                     for j in range(ntiles_col)])
+            pairs.append(border_pairs(bottom, top))
+
+    roots = union_find(offset, numpy.concatenate(pairs))[1:]
+    regions, index = numpy.unique(roots, return_inverse=True)
+
+    def merged(key):
+        return numpy.concatenate([measure[key] for measure in measures])
+
+    area = numpy.bincount(index, merged('area'), len(regions))
+    sum_row = numpy.bincount(index, merged('sum_row'), len(regions))
+    sum_col = numpy.bincount(index, merged('sum_col'), len(regions))
+
+    first_pixel = numpy.full(len(regions), numpy.iinfo(numpy.int64).max)
+    numpy.minimum.at(first_pixel, index, merged('first_pixel'))
+
+    ##bounding box: min of the starts, max of the ends
+    tiles_bbox = merged('bbox').reshape(-1, 4)
+    bbox = numpy.zeros((len(regions), 4), dtype=numpy.int64)
+    bbox[:, :2] = numpy.iinfo(numpy.int64).max
+    for column in range(4):
+        function = numpy.minimum if column < 2 else numpy.maximum
+        function.at(bbox[:, column], index, tiles_bbox[:, column])
+
+    ###Same order as the labels of the whole image
+    order = numpy.argsort(first_pixel)
+    area, sum_row, sum_col, bbox = area[order], sum_row[order], sum_col[order], bbox[order]
+
+    results = segmentation_regions.sort_regions(area, sum_row / area, sum_col / area, bbox,
+                                                conf['Analysis']['minimum_size'])
+
+    nwhite = sum(measure['nwhite'] for measure in measures)
+    results['black_ratio'] = round((height * width - nwhite)/(height * width), 2)
+    results['white_ratio'] = round(nwhite/(height * width), 2)
+
+    return output, results
+
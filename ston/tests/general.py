@@ -18,8 +18,23 @@ from . import test_utils_explore_files
 from . import test_utils_conf
 from . import test_utils_cli
 from . import test_open_save_files
+from . import test_utils_thumbnail_cache
+from . import test_utils_project_index
+from . import test_utils_region_cache
+from . import test_utils_image_cache
 from . import test_processing_image_processing
+from . import test_processing_enhancers
+from . import test_processing_gaussian_filtering
 from . import test_segmentation
+from . import test_processing_batch_segmentation
+from . import test_processing_tiled_segmentation
+from . import test_processing_threshold_sweep
+from . import test_processing_region_index
+from . import test_gui_main_window
+from . import test_gui_closeup
+from . import test_gui_filter_worker
+from . import test_gui_thumbnail_loader
+from . import test_gui_zoom_window
 
 def run_tests(tests='all'):
     '''
@@ -64,6 +79,26 @@ def run_tests(tests='all'):
         suite = unittest.TestLoader().loadTestsFromModule(test_open_save_files)
         unittest.TextTestRunner(verbosity=2).run(suite)
 
+        ####ston/utils/thumbnail_cache.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_utils_thumbnail_cache)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/utils/project_index.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_utils_project_index)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/utils/region_cache.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_utils_region_cache)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/utils/image_cache.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_utils_image_cache)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
 
     if tests in ['all', 'processing']:
         print('ok')
@@ -72,6 +107,16 @@ def run_tests(tests='all'):
         suite = unittest.TestLoader().loadTestsFromModule(test_processing_image_processing)
         unittest.TextTestRunner(verbosity=2).run(suite)
 
+        ####ston/processing/enhancers.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_processing_enhancers)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/processing/gaussian_filtering.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_processing_gaussian_filtering)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
     if tests in ['all', 'segmentation']:
         print('ok')
         ####ston/processing/segmentation_region.py
@@ -79,4 +124,51 @@ def run_tests(tests='all'):
         suite = unittest.TestLoader().loadTestsFromModule(test_segmentation)
         unittest.TextTestRunner(verbosity=2).run(suite)
 
+        ####ston/processing/batch_segmentation.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_processing_batch_segmentation)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/processing/tiled_segmentation.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_processing_tiled_segmentation)
+        unittest.TextTestRunner(verbosity=2).run(suite)
 
+        ####ston/processing/threshold_sweep.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_processing_threshold_sweep)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/processing/region_index.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_processing_region_index)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+    if tests in ['all', 'gui']:
+        print(50*'-')
+        print('We run the tests for the graphical interface (ston/GUI)')
+
+        ####ston/GUI/main_window.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_gui_main_window)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/GUI/closeup.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_gui_closeup)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/GUI/filter_worker.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_gui_filter_worker)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/GUI/thumbnail_loader.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_gui_thumbnail_loader)
+        unittest.TextTestRunner(verbosity=2).run(suite)
+
+        ####ston/GUI/zoom_window.py
+        print('\n')
+        suite = unittest.TestLoader().loadTestsFromModule(test_gui_zoom_window)
+        unittest.TextTestRunner(verbosity=2).run(suite)
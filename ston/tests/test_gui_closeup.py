@@ -0,0 +1,135 @@
+'''
+This file contains the tests for STON/ston/GUI/closeup.py
+(the close-up is drawn without display)
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import time
+import unittest
+
+###Third party library
+import numpy
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtWidgets import QApplication
+
+###local imports
+from ston.GUI import plots, closeup
+
+
+class TestCloseUp(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'CloseUp'
+    '''
+    def setUp(self):
+        '''
+        A close-up of the same size as in the detail window
+        '''
+        self.app = QApplication.instance() or QApplication([])
+        self.canvas, self.fig, self.axs, _ = plots.create_plot(toolbar=False, transparent=True)
+        self.canvas.setFixedWidth(250)
+        self.canvas.setFixedHeight(250)
+        self.canvas.show()
+        self.closeup = closeup.CloseUp(self.canvas, self.fig, self.axs)
+
+        ##a big colour image
+        rng = numpy.random.default_rng(0)
+        self.data = rng.integers(0, 256, size=(4000, 3000, 3), dtype=numpy.uint8)
+
+    def tearDown(self):
+        '''
+        Close the canvas
+        '''
+        self.canvas.close()
+        QApplication.processEvents()
+
+    def test_1_window_inside_image(self):
+        '''
+        The window around the cursor stays inside the image
+        '''
+        self.closeup.set_image(self.data, 50)
+        self.assertEqual(self.closeup.slice_window(0, 0).shape, (50, 50, 3))
+        self.assertEqual(self.closeup.slice_window(2999, 3999).shape, (50, 50, 3))
+        numpy.testing.assert_array_equal(self.closeup.slice_window(1000, 2000),
+                                         self.data[1975:2025, 975:1025])
+
+    def test_2_artist_reused_and_blitted(self):
+        '''
+        When the cursor moves, the image artist made by set_image is
+        reused (not recreated) and only its axes are blitted
+        '''
+        self.closeup.set_image(self.data, 50)
+        QApplication.processEvents()
+        image = self.closeup.image
+        self.assertIsNotNone(self.closeup.background)
+
+        calls = {'draw': 0, 'imshow': 0, 'blit': []}
+        draw, imshow, blit = self.canvas.draw, self.axs.imshow, self.canvas.blit
+
+        def count_draw(*args, **kwargs):
+            calls['draw'] += 1
+            return draw(*args, **kwargs)
+
+        def count_imshow(*args, **kwargs):
+            calls['imshow'] += 1
+            return imshow(*args, **kwargs)
+
+        def count_blit(bbox=None):
+            calls['blit'].append(bbox)
+            return blit(bbox)
+
+        self.canvas.draw, self.axs.imshow, self.canvas.blit = count_draw, count_imshow, count_blit
+        for position in range(10, 2900, 290):
+            self.closeup.move_to(position, position)
+            self.closeup.update()
+
+        self.assertIs(self.closeup.image, image)
+        self.assertIn(image, self.axs.get_images())
+        self.assertEqual(len(self.axs.get_images()), 1)
+        self.assertEqual(calls['draw'], 0)
+        self.assertEqual(calls['imshow'], 0)
+        self.assertEqual(len(calls['blit']), 10)
+        self.assertTrue(all(bbox is self.axs.bbox for bbox in calls['blit']))
+        numpy.testing.assert_array_equal(image.get_array(),
+                                         self.closeup.slice_window(2620, 2620))
+
+    def test_3_one_update_per_frame(self):
+        '''
+        A burst of cursor moves within one timer interval gives exactly one
+        redraw, at the last position
+        '''
+        self.closeup.set_image(self.data, 50)
+        QApplication.processEvents()
+
+        updates = []
+        update = self.closeup.update
+
+        def count_update():
+            updates.append(self.closeup.position)
+            update()
+
+        ##the timer calls the method given when it was connected
+        self.closeup.timer.timeout.disconnect()
+        self.closeup.timer.timeout.connect(count_update)
+
+        for position in range(10, 2900, 29):
+            self.closeup.move_to(position, position)
+        self.assertEqual(updates, [])
+
+        while self.closeup.timer.isActive():
+            time.sleep(0.01)
+            QApplication.processEvents()
+        QApplication.processEvents()
+
+        self.assertEqual(updates, [(2881, 2881)])
+        numpy.testing.assert_array_equal(self.closeup.image.get_array(),
+                                         self.closeup.slice_window(2881, 2881))
+
+
+if __name__ == "__main__":
+    unittest.main()
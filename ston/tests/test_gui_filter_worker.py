@@ -0,0 +1,61 @@
+'''
+This file contains the tests for STON/ston/GUI/filter_worker.py
+(the filter runs without display)
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import unittest
+
+###Third party library
+import numpy
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtWidgets import QApplication
+
+###local imports
+from ston.GUI import filter_worker
+from ston.tests.test_gui_main_window import wait_for
+
+
+class TestBackgroundFilter(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'BackgroundFilter'
+    '''
+    def setUp(self):
+        '''
+        A filter and the lists of what it emits
+        '''
+        self.app = QApplication.instance() or QApplication([])
+        self.gaussian = filter_worker.BackgroundFilter()
+        self.done, self.errors = [], []
+        self.gaussian.finished.connect(lambda filtered, _: self.done.append(filtered))
+        self.gaussian.failed.connect(self.errors.append)
+
+    def test_1_filtered(self):
+        '''
+        The filtered image is emitted
+        '''
+        self.gaussian.start(numpy.zeros((20, 30), dtype=numpy.uint8), 2)
+        wait_for(lambda: self.done or self.errors)
+        self.assertEqual(self.errors, [])
+        self.assertEqual(self.done[0].shape, (20, 30))
+        self.assertFalse(self.gaussian.running)
+
+    def test_2_any_error_reported(self):
+        '''
+        Any error (not only memory or value errors) is emitted as failed
+        '''
+        self.gaussian.start(numpy.zeros((20, 30), dtype=numpy.uint8), None)
+        wait_for(lambda: self.done or self.errors)
+        self.assertEqual(self.done, [])
+        self.assertEqual(len(self.errors), 1)
+        self.assertFalse(self.gaussian.running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+This file contains the tests for STON/ston/GUI/main_window.py
+(the window is created without display)
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+###Third party library
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtWidgets import QApplication
+
+###local imports
+from ston.utils import conf
+from ston.GUI import main_window
+
+###Some useful variables
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                              'test_data')
+
+
+def wait_for(condition, timeout=30):
+    '''
+    Process the Qt events until the condition is True (or the timeout)
+    '''
+    start = time.perf_counter()
+    while not condition() and time.perf_counter() - start < timeout:
+        time.sleep(0.05)
+        QApplication.processEvents()
+
+
+class TestMainWindow(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'GUI'
+    '''
+    def setUp(self):
+        '''
+        A project with two images and two configuration files
+        '''
+        self.app = QApplication.instance() or QApplication([])
+        self.directory = tempfile.mkdtemp()
+        images = os.path.join(self.directory, 'images')
+        os.makedirs(images)
+        for name in ['1-ker-ppl.jpg', '2-ker-ppl.jpg']:
+            shutil.copy(os.path.join(data_directory, 'cluster1_1sthalf', name), images)
+
+        with open(os.path.join(data_directory, 'test.conf'), encoding='utf-8') as conffile:
+            text = conffile.read().replace('Directory = to_be_changed',
+                                           f'Directory = {self.directory}')
+        self.conf_files = []
+        for n in range(2):
+            name = os.path.join(self.directory, f'conf{n}.conf')
+            with open(name, 'w', encoding='utf-8') as conffile:
+                conffile.write(text)
+            self.conf_files.append(name)
+
+        self.window = main_window.GUI(conf.load_conf(self.conf_files[0])[0])
+
+    def tearDown(self):
+        '''
+        Close the windows and remove the project
+        '''
+        self.window.close_project()
+        self.window.zoom_window.close()
+        self.window.close()
+        QApplication.processEvents()
+        shutil.rmtree(self.directory)
+
+    def test_1_reload_conf_and_load_images(self):
+        '''
+        After a new configuration is loaded, the images can be loaded
+        (and the caches of the new project exist)
+        '''
+        self.window.load_new_conf(self.conf_files[1])
+        for key in ['thumbnail_cache', 'region_cache', 'image_cache']:
+            self.assertIn(key, self.window.conf)
+        self.assertIsNotNone(self.window.conf['image_cache'])
+
+        ##select all the images of the tree and load them
+        for n in range(self.window.tree.topLevelItemCount()):
+            directory = self.window.tree.topLevelItem(n)
+            for m in range(directory.childCount()):
+                directory.child(m).setSelected(True)
+        self.window.loadimages()
+
+        wait_for(lambda: self.window.loader is None)
+        self.assertEqual(self.window.image_list.count(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
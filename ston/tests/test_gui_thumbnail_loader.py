@@ -0,0 +1,94 @@
+'''
+This file contains the tests for STON/ston/GUI/thumbnail_loader.py
+and for the loading of the cluster window (without display)
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import threading
+import time
+import unittest
+
+###Third party library
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtCore import QRunnable
+from PySide6.QtWidgets import QApplication
+from shiboken6 import Shiboken
+
+###local imports
+from ston.utils import conf
+from ston.GUI import thumbnail_loader, cluster_window
+from ston.tests.test_gui_main_window import wait_for, data_directory
+
+
+class Blocking(QRunnable):
+    '''
+    A worker that runs until it is released
+    '''
+    def __init__(self, event):
+        '''
+        Class constructor (event: threading.Event releasing the worker)
+        '''
+        super().__init__()
+        self.event = event
+
+    def run(self):
+        '''
+        Wait until the event is set
+        '''
+        self.event.wait(30)
+
+
+class TestThumbnailLoader(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'ThumbnailLoader'
+    '''
+    def setUp(self):
+        '''
+        Qt application
+        '''
+        self.app = QApplication.instance() or QApplication([])
+
+    def test_1_release_after_workers(self):
+        '''
+        The loader is deleted only when its workers are done
+        '''
+        loader = thumbnail_loader.ThumbnailLoader([], [], 10)
+        event = threading.Event()
+        loader.pool.start(Blocking(event))
+        wait_for(lambda: loader.pool.activeThreadCount() == 1)
+
+        loader.release()
+        start = time.perf_counter()
+        while time.perf_counter() - start < 0.3:
+            time.sleep(0.05)
+            QApplication.processEvents()
+        self.assertTrue(Shiboken.isValid(loader))
+
+        event.set()
+        wait_for(lambda: not Shiboken.isValid(loader))
+        self.assertFalse(Shiboken.isValid(loader))
+
+    def test_2_cluster_window_cancels(self):
+        '''
+        Closing the cluster window cancels its loading
+        '''
+        config = conf.load_conf(os.path.join(data_directory, 'test.conf'))[0]
+        config['project_index'] = None
+        names = ['1-ker-ppl.jpg', '2-ker-ppl.jpg']
+        paths = [os.path.join(data_directory, 'cluster1_1sthalf', i) for i in names]
+
+        window = cluster_window.ClusterWindow(config, paths, names, None)
+        window.close()
+        self.assertTrue(window.loader.cancel_event.is_set())
+        self.assertFalse(window.loader.running)
+        window.loader.pool.waitForDone()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+'''
+This file contains the tests for STON/ston/GUI/zoom_window.py
+(the window is created without display)
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import unittest
+
+###Third party library
+import numpy
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtWidgets import QApplication
+
+###local imports
+from ston.utils import conf
+from ston.GUI import zoom_window
+from ston.tests.test_gui_main_window import wait_for, data_directory
+
+###Some useful variables
+test_image = os.path.join(data_directory, 'cluster1_1sthalf', '1-ker-ppl.jpg')
+
+
+class TestDetailWindow(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'DetailWindow'
+    '''
+    def setUp(self):
+        '''
+        A detail window with an image
+        '''
+        self.app = QApplication.instance() or QApplication([])
+        config = conf.load_conf(os.path.join(data_directory, 'test.conf'))[0]
+        self.window = zoom_window.DetailWindow(test_image, config)
+        self.window.resize(800, 600)
+        self.window.show()
+        QApplication.processEvents()
+        self.window.change_image(test_image)
+
+    def tearDown(self):
+        '''
+        Close the window
+        '''
+        self.window.preview_renderer.cancel()
+        self.window.preview_renderer.pool.waitForDone()
+        self.window.close()
+        QApplication.processEvents()
+
+    def test_1_full_resolution_after_release(self):
+        '''
+        When a slider is released, the screen preview is replaced by the
+        enhanced image at full resolution (also given to the analysis tool)
+        '''
+        shape = self.window.data.shape
+        self.window.slider_contrast.setValue(200)
+        self.window.slider_change('con')
+        self.assertLess(self.window.ondisplay.get_array().shape[0], shape[0])
+
+        wait_for(lambda: self.window.data_for_analysis is not None)
+        expected = numpy.array(self.window.pipeline.render(self.window.enhancer_factors()))
+        self.assertEqual(self.window.ondisplay.get_array().shape, shape)
+        self.assertTrue(numpy.array_equal(self.window.ondisplay.get_array(), expected))
+        self.assertTrue(numpy.array_equal(self.window.data_for_analysis, expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,10 +8,14 @@ Year: 2024-2025
 
 ###standard library
 import os
+import csv
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
 
 ###Third party library
+import numpy
 
 ###local imports
 from ston.utils import open_save_files
@@ -117,3 +121,72 @@ class Save(unittest.TestCase):
         ##and check
         expected = f'Directory {savefiledir} does not exist...File not saved'
         self.assertEqual(expected, txt)
+
+
+class Catalogue(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the functions saving and opening region catalogues
+    '''
+    def setUp(self):
+        '''
+        Some regions (more than one block of rows) and a temporary directory
+        '''
+        self.directory = tempfile.mkdtemp()
+        rng = numpy.random.default_rng(1)
+        nregions = open_save_files.BUFFER_ROWS + 123
+        corner = rng.integers(0, 1000, (nregions, 2))
+        self.results = {'x': rng.random(nregions) * 1000, 'y': rng.random(nregions) * 1000,
+                        'area': rng.integers(1, 5000, nregions).astype(float),
+                        'bbox': numpy.concatenate([corner, corner + 10], axis=1)}
+        self.conversion = 0.02 * 0.02
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_a_binary(self):
+        '''
+        The binary catalogue is memory-mapped and has all the columns
+        '''
+        file = os.path.join(self.directory, 'catalogue.npy')
+        status = open_save_files.save_catalogue(file, self.results, self.conversion)
+        self.assertEqual(status, f'File {file} was saved on disk')
+
+        catalogue = open_save_files.open_catalogue(file)
+        self.assertIsInstance(catalogue, numpy.memmap)
+        self.assertEqual(catalogue.dtype, open_save_files.CATALOGUE_DTYPE)
+        self.assertTrue(numpy.array_equal(catalogue['x'], self.results['x']))
+        self.assertTrue(numpy.array_equal(catalogue['y'], self.results['y']))
+        self.assertTrue(numpy.array_equal(catalogue['area_pixels'], self.results['area']))
+        self.assertTrue(numpy.allclose(catalogue['area_mm2'],
+                                       self.results['area'] * self.conversion))
+        self.assertTrue(numpy.array_equal(catalogue['bbox_max_col'],
+                                          self.results['bbox'][:, 3]))
+
+    def test_b_text(self):
+        '''
+        Text catalogues: csv, or tab separated with a commented header
+        '''
+        file = os.path.join(self.directory, 'catalogue.csv')
+        open_save_files.save_catalogue(file, self.results, self.conversion)
+        with open(file, 'r', newline='', encoding='utf-8') as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        self.assertEqual(len(rows), len(self.results['x']))
+        self.assertEqual(float(rows[-1]['x']), self.results['x'][-1])
+        self.assertEqual(int(rows[5]['bbox_min_row']), self.results['bbox'][5, 0])
+
+        file = os.path.join(self.directory, 'catalogue.txt')
+        open_save_files.save_catalogue(file, self.results, self.conversion)
+        catalogue = numpy.loadtxt(file, delimiter='\t')
+        self.assertEqual(catalogue.shape, (len(self.results['x']), 8))
+        self.assertTrue(numpy.array_equal(catalogue[:, 2], self.results['area']))
+
+    def test_c_no_region(self):
+        '''
+        An empty catalogue can be saved and opened
+        '''
+        results = {'x': numpy.array([]), 'y': numpy.array([]), 'area': numpy.array([]),
+                   'bbox': numpy.array([])}
+        file = os.path.join(self.directory, 'catalogue.npy')
+        open_save_files.save_catalogue(file, results, self.conversion)
+        self.assertEqual(len(open_save_files.open_catalogue(file)), 0)
@@ -0,0 +1,128 @@
+'''
+This file contains the tests for STON/ston/processing/batch_segmentation.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+
+###local imports
+from ston.processing import batch_segmentation, segmentation_regions
+
+###Some useful variables
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                              'test_data')
+config = {'Analysis': {'minimum_size': 2, 'pix_to_mm': 0.02}}
+
+
+class TestBatchSegment(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the function 'batch_segment'
+    '''
+    def setUp(self):
+        '''
+        Each test gets its own project and output directory
+        '''
+        self.directory = tempfile.mkdtemp()
+        self.images = []
+        for subdirectory, name in [('a', 'test_segmentation.png'),
+                                   ('b', 'test_segmentation2.png'),
+                                   ('c', 'test_segmentation.png')]:
+            os.makedirs(os.path.join(self.directory, 'project', subdirectory))
+            image = os.path.join(self.directory, 'project', subdirectory, name)
+            shutil.copyfile(os.path.join(data_directory, name), image)
+            self.images.append(image)
+        self.output = os.path.join(self.directory, 'output')
+        self.messages = []
+
+    def tearDown(self):
+        '''
+        Remove the project and the results
+        '''
+        shutil.rmtree(self.directory)
+
+    def test_1_catalogues(self):
+        '''
+        Each image gets its catalogue, with the same regions as find_regions
+        '''
+        summary, failed = batch_segmentation.batch_segment(self.images, config, self.output,
+                                                           1, report=self.messages.append)
+        self.assertFalse(failed)
+
+        with open(summary, 'r', encoding='utf-8') as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        self.assertEqual(sorted(row['image'] for row in rows), self.images)
+
+        ##same name in two directories: two catalogues
+        for row in rows:
+            _, results = segmentation_regions.find_regions(
+                            numpy.array(Image.open(row['image'])), config)
+            with open(row['catalogue'], 'r', encoding='utf-8') as csvfile:
+                catalogue = list(csv.DictReader(csvfile))
+            self.assertEqual(int(row['n_regions']), len(results['area']))
+            self.assertEqual([int(i['area[pixels]']) for i in catalogue],
+                             list(results['area']))
+            self.assertEqual(float(row['black_ratio']), results['black_ratio'])
+
+    def test_2_resume(self):
+        '''
+        An interrupted run is resumed: the images done are not processed again,
+        an incomplete line of the summary is ignored
+        '''
+        summary, _ = batch_segmentation.batch_segment(self.images[:2], config, self.output, 1,
+                                                      report=self.messages.append)
+        ##simulate an interruption while the summary was written
+        with open(summary, 'a', encoding='utf-8') as csvfile:
+            csvfile.write(self.images[2])
+
+        batch_segmentation.batch_segment(self.images, config, self.output, 1, resume=True,
+                                         report=self.messages.append)
+        self.assertIn('3 images, 2 already done', self.messages)
+
+        with open(summary, 'r', encoding='utf-8') as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        self.assertEqual(sorted(row['image'] for row in rows), self.images)
+
+    def test_3_failed_image(self):
+        '''
+        An image that can not be read is reported, the others are processed
+        '''
+        broken = os.path.join(self.directory, 'project', 'a', 'broken.png')
+        with open(broken, 'w', encoding='utf-8') as brokenfile:
+            brokenfile.write('not an image')
+
+        _, failed = batch_segmentation.batch_segment(self.images + [broken], config,
+                                                     self.output, 1,
+                                                     report=self.messages.append)
+        self.assertEqual([i[0] for i in failed], [broken])
+
+    def test_4_tiles(self):
+        '''
+        The catalogues are the same when the images are segmented by tiles
+        '''
+        summary, _ = batch_segmentation.batch_segment(self.images, config, self.output, 1,
+                                                      report=self.messages.append)
+        with open(summary, 'r', encoding='utf-8') as csvfile:
+            rows = list(csv.DictReader(csvfile))
+        catalogues = {}
+        for row in rows:
+            with open(row['catalogue'], 'r', encoding='utf-8') as csvfile:
+                catalogues[row['catalogue']] = csvfile.read()
+
+        batch_segmentation.batch_segment(self.images, config, self.output, 1, tile_size=100,
+                                         report=self.messages.append)
+        for catalogue, content in catalogues.items():
+            with open(catalogue, 'r', encoding='utf-8') as csvfile:
+                self.assertEqual(csvfile.read(), content)
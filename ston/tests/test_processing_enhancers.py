@@ -0,0 +1,142 @@
+'''
+This file contains the tests for STON/ston/processing/enhancers.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+
+###local imports
+from ston.processing import enhancers
+
+###Some useful variables
+test_image = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                          'test_data', 'cluster1_1sthalf', '1-ker-ppl.jpg')
+
+
+class TestEnhancementPipeline(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'EnhancementPipeline'
+    '''
+    def setUp(self):
+        self.image = Image.open(test_image)
+        self.pipeline = enhancers.EnhancementPipeline(self.image)
+
+    def test_1_full_resolution(self):
+        '''
+        Same image as the enhancers applied one after the other
+        '''
+        factors = {'color': 300, 'contrast': 150, 'sharpness': 200}
+        expected = enhancers.sharpness(enhancers.contrast(enhancers.color(self.image, 300),
+                                                          150), 200)
+        enhanced = self.pipeline.render(factors)
+        self.assertTrue(numpy.array_equal(numpy.asarray(enhanced), numpy.asarray(expected)))
+
+        ##no enhancer: the image itself
+        self.assertIs(self.pipeline.render({}), self.pipeline.source)
+
+    def test_2_preview(self):
+        '''
+        The preview fits in the given size and is the enhanced downscaled image
+        '''
+        factors = {'brightness': 120, 'sharpness': 50}
+        preview = self.pipeline.render(factors, (300, 200))
+        self.assertLessEqual(preview.size[0], 300)
+        self.assertLessEqual(preview.size[1], 200)
+
+        expected = enhancers.apply_enhancers(self.pipeline.downscaled((300, 200)), factors)
+        self.assertTrue(numpy.array_equal(numpy.asarray(preview), numpy.asarray(expected)))
+
+    def test_3_stages_reused(self):
+        '''
+        When only the last enhancer changes, the first ones are not applied again
+        '''
+        factors = {'color': 300, 'contrast': 150, 'brightness': 80, 'sharpness': 200}
+        self.pipeline.render(factors, (300, 200))
+        brightness_output = self.pipeline.stages[0][1]
+
+        factors['sharpness'] = 250
+        self.pipeline.render(factors, (300, 200))
+        self.assertIs(self.pipeline.stages[0][1], brightness_output)
+
+        ##an earlier change invalidates the next stages
+        factors['contrast'] = 100
+        preview = self.pipeline.render(factors, (300, 200))
+        self.assertIsNot(self.pipeline.stages[0][1], brightness_output)
+        expected = enhancers.apply_enhancers(self.pipeline.downscaled((300, 200)), factors)
+        self.assertTrue(numpy.array_equal(numpy.asarray(preview), numpy.asarray(expected)))
+
+
+class TestFusedPointEnhancers(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the function 'fused_point_enhancers'
+    '''
+    def setUp(self):
+        self.image = Image.open(test_image)
+        self.image.thumbnail((400, 400))
+
+    def chained(self, image, factors):
+        '''
+        color, contrast and brightness applied one after the other
+        '''
+        for stage in enhancers.POINT_STAGES:
+            if stage in factors:
+                image = enhancers.ENHANCERS[stage](image, factors[stage])
+        return numpy.asarray(image)
+
+    def test_1_same_as_chained(self):
+        '''
+        Same values as the PIL enhancers, for RGB and grayscale images
+        '''
+        all_factors = [{'color': 300, 'contrast': 150, 'brightness': 80},
+                       {'color': 0, 'contrast': 0, 'brightness': 0},
+                       {'color': 500, 'contrast': 500, 'brightness': 500},
+                       {'color': 37, 'contrast': 213},
+                       {'contrast': 600, 'brightness': 130},
+                       {'color': 700, 'brightness': 45}, {}]
+        for image in [self.image, self.image.convert('L')]:
+            for factors in all_factors:
+                fused = enhancers.fused_point_enhancers(image, factors)
+                self.assertEqual(fused.mode, image.mode)
+                self.assertTrue(numpy.array_equal(numpy.asarray(fused),
+                                                  self.chained(image, factors)),
+                                msg=f'{image.mode} {factors}')
+
+    def test_2_lookup_table(self):
+        '''
+        Contrast and brightness lookup table
+        '''
+        ##nothing applied: identity
+        lut = enhancers.point_lut(None, None, 0)
+        self.assertTrue(numpy.array_equal(lut, numpy.arange(256)))
+
+        ##brightness 50%: values divided by 2 (truncated)
+        lut = enhancers.point_lut(None, 50, 0)
+        self.assertTrue(numpy.array_equal(lut, numpy.arange(256) // 2))
+
+        ##contrast 0%: every value becomes the mean
+        lut = enhancers.point_lut(0, None, 100)
+        self.assertTrue(numpy.all(lut == 100))
+
+    def test_3_other_modes(self):
+        '''
+        Other image modes use the PIL enhancers
+        '''
+        image = self.image.convert('RGBA')
+        factors = {'color': 200, 'contrast': 150}
+        enhanced = enhancers.apply_enhancers(image, factors)
+        self.assertEqual(enhanced.mode, 'RGBA')
+        self.assertTrue(numpy.array_equal(numpy.asarray(enhanced), self.chained(image, factors)))
+
+if __name__ == "__main__":
+    unittest.main()
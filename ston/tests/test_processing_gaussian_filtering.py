@@ -0,0 +1,80 @@
+'''
+This file contains the tests for STON/ston/processing/gaussian_filtering.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import threading
+import unittest
+
+###Third party library
+import numpy
+from skimage import filters
+
+###local imports
+from ston.processing import gaussian_filtering
+
+
+class TestGaussianFilter(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the function 'gaussian_filter'
+    '''
+    def setUp(self):
+        rng = numpy.random.default_rng(4)
+        self.image = rng.integers(0, 256, size=(150, 97, 3), dtype=numpy.uint8)
+
+    def test_1_same_as_skimage(self):
+        '''
+        Same values as skimage (channels filtered separately)
+        '''
+        for sigma in [0.5, 2, 5]:
+            expected = filters.gaussian(self.image, sigma=sigma, channel_axis=-1)
+
+            filtered = gaussian_filtering.gaussian_filter(self.image, sigma,
+                                                          preserve_dtype=False)
+            self.assertEqual(filtered.dtype, numpy.float32)
+            self.assertTrue(numpy.allclose(filtered, expected, atol=1e-5))
+
+            ##uint8 image stays uint8 (rounded values)
+            filtered = gaussian_filtering.gaussian_filter(self.image, sigma)
+            self.assertEqual(filtered.dtype, numpy.uint8)
+            self.assertLessEqual(numpy.abs(filtered.astype(int) -
+                                           numpy.rint(expected * 255)).max(), 1)
+
+    def test_2_bands(self):
+        '''
+        Cutting the image in bands (with threads) gives the same result
+        '''
+        gray = self.image[..., 0]
+        whole = gaussian_filtering.gaussian_filter(gray, 3, n_threads=1)
+
+        band_bytes = gaussian_filtering.BAND_BYTES
+        gaussian_filtering.BAND_BYTES = 4 * gray.shape[1] * 7
+        try:
+            self.assertGreater(len(gaussian_filtering.band_rows(gray.shape, 3, 3)), 3)
+            banded = gaussian_filtering.gaussian_filter(gray, 3, n_threads=3)
+        finally:
+            gaussian_filtering.BAND_BYTES = band_bytes
+
+        self.assertTrue(numpy.array_equal(banded, whole))
+
+    def test_3_sigma_zero_and_cancel(self):
+        '''
+        Sigma 0 gives a copy of the image, a cancelled filtering raises
+        '''
+        filtered = gaussian_filtering.gaussian_filter(self.image, 0)
+        self.assertTrue(numpy.array_equal(filtered, self.image))
+        self.assertIsNot(filtered, self.image)
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(gaussian_filtering.FilterCancelled):
+            gaussian_filtering.gaussian_filter(self.image, 2, cancel_event=cancel_event)
+
+
+if __name__ == "__main__":
+    unittest.main()
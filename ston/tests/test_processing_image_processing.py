@@ -185,6 +185,22 @@ class MASHUP(unittest.TestCase):
         ##remove the created image
         os.remove(conf['name'])
 
+    def test_mashup_d_n_processes(self):
+        '''
+        The number of threads decoding the images does not change the mashup
+        '''
+        images = [os.path.join(data_directory, f'cluster1_1sthalf/{i}-ker-ppl.jpg')
+                  for i in [1, 2, 3]]
+        conf = {'name': 'testmashup_threads.png', '1-ker-ppl.jpg': '2',
+                '2-ker-ppl.jpg': '1', '3-ker-ppl.jpg': '3'}
+
+        image_processing.make_mashup(conf, images, 1)
+        serial = numpy.array(Image.open(conf['name']))
+        image_processing.make_mashup(conf, images, 3)
+        self.assertTrue(numpy.array_equal(serial, numpy.array(Image.open(conf['name']))))
+
+        ##remove the created image
+        os.remove(conf['name'])
 
 class META(unittest.TestCase):
     '''This class tests the function 'create_meta_image'
@@ -300,3 +316,139 @@ class META(unittest.TestCase):
 
         ##remove the created image
         os.remove(final_image_name)
+
+    def test_meta_d_layout_from_headers(self):
+        '''
+        The size computed from the headers is the size of the thumbnails
+        '''
+        image = os.path.join(data_directory, 'cluster1_1sthalf/1-ker-ppl.jpg')
+        for box in [(100, 100), (51.3, 20), (20, 51.3), (5000, 5000)]:
+            im = Image.open(image)
+            size = image_processing.thumbnail_size(im.size, box)
+            im.thumbnail(box)
+            self.assertEqual(size, im.size)
+
+    def test_meta_e_tiff_streamed(self):
+        '''
+        The meta image written line by line in a TIFF file is the same
+        as the one saved in PNG
+        '''
+        image = os.path.join(data_directory, 'cluster1_1sthalf/1-ker-ppl.jpg')
+        image2 = os.path.join(data_directory, 'cluster1_1sthalf/3-ker-ppl.jpg')
+
+        conf = {}
+        conf['Meta_image_options'] = {}
+        conf['Meta_image_options']['downgrade_factor'] = 10
+        conf['Meta_image_options']['name_on_images'] = True
+        conf['Meta_image_options']['ncol_meta_image'] = 2
+        conf['Meta_image_options']['meta_txt_fontsize'] = 10
+
+        image_processing.create_meta_image([image, image2, image], 'meta_image.png', conf)
+        image_processing.create_meta_image([image, image2, image], 'meta_image.tif', conf)
+
+        self.assertTrue(numpy.array_equal(numpy.array(Image.open('meta_image.png')),
+                                          numpy.array(Image.open('meta_image.tif'))))
+
+        ##remove the created images
+        os.remove('meta_image.png')
+        os.remove('meta_image.tif')
+
+    def test_meta_f_parallel(self):
+        '''
+        The meta image made with several processes is the same as
+        the one made in a single process
+        '''
+        images = [os.path.join(data_directory, f'cluster1_1sthalf/{i}-ker-ppl.jpg')
+                  for i in [3, 1, 2, 1, 3]]
+
+        conf = {}
+        conf['Meta_image_options'] = {}
+        conf['Meta_image_options']['downgrade_factor'] = 10
+        conf['Meta_image_options']['name_on_images'] = True
+        conf['Meta_image_options']['ncol_meta_image'] = 2
+        conf['Meta_image_options']['meta_txt_fontsize'] = 10
+
+        conf['Meta_image_options']['n_processes'] = 1
+        image_processing.create_meta_image(images, 'meta_image_serial.png', conf)
+        conf['Meta_image_options']['n_processes'] = 2
+        image_processing.create_meta_image(images, 'meta_image_parallel.png', conf)
+
+        self.assertTrue(numpy.array_equal(numpy.array(Image.open('meta_image_serial.png')),
+                                          numpy.array(Image.open('meta_image_parallel.png'))))
+
+        ##remove the created images
+        os.remove('meta_image_serial.png')
+        os.remove('meta_image_parallel.png')
+
+    def test_meta_g_pool_reused(self):
+        '''
+        The pool of processes is created once and reused for the next
+        meta images
+        '''
+        images = [os.path.join(data_directory, f'cluster1_1sthalf/{i}-ker-ppl.jpg')
+                  for i in [1, 2, 3]]
+
+        conf = {}
+        conf['Meta_image_options'] = {}
+        conf['Meta_image_options']['downgrade_factor'] = 10
+        conf['Meta_image_options']['name_on_images'] = False
+        conf['Meta_image_options']['ncol_meta_image'] = 2
+        conf['Meta_image_options']['meta_txt_fontsize'] = 10
+        conf['Meta_image_options']['n_processes'] = 2
+
+        image_processing.create_meta_image(images, 'meta_image_first.png', conf)
+        pool = image_processing.PROCESS_POOLS[2]
+        image_processing.create_meta_image(images, 'meta_image_second.png', conf)
+        self.assertIs(image_processing.PROCESS_POOLS[2], pool)
+
+        ##remove the created images
+        os.remove('meta_image_first.png')
+        os.remove('meta_image_second.png')
+
+
+class REDUCED(unittest.TestCase):
+    '''This class tests the function 'open_image_reduced'
+    '''
+
+    def test_reduced_a_jpeg(self):
+        '''
+        A JPEG is decoded at a lower resolution, but never smaller
+        than the requested size
+        '''
+        image = os.path.join(data_directory, 'cluster1_1sthalf/1-ker-ppl.jpg')
+        full = Image.open(image)
+
+        reduced, full_size = image_processing.open_image_reduced(image, 10)
+        reduced.load()
+
+        self.assertEqual(full_size, full.size)
+        self.assertLess(reduced.size[0], full.size[0])
+        self.assertGreaterEqual(reduced.size[0], full.size[0] // 10)
+        self.assertGreaterEqual(reduced.size[1], full.size[1] // 10)
+
+    def test_reduced_b_pyramidal_tiff(self):
+        '''
+        For a TIFF with reduced-resolution pages, the smallest page that
+        is bigger than the requested size is used
+        '''
+        name = 'test_pyramid.tif'
+        base = Image.new('RGB', (800, 400), color=(10, 20, 30))
+        levels = [base.resize((400, 200)), base.resize((200, 100)), base.resize((100, 50))]
+        base.save(name, save_all=True, append_images=levels)
+
+        reduced, full_size = image_processing.open_image_reduced(name, 3)
+        self.assertEqual(full_size, (800, 400))
+        self.assertEqual(reduced.size, (400, 200))
+
+        reduced, full_size = image_processing.open_image_reduced(name, 8)
+        self.assertEqual(reduced.size, (100, 50))
+
+        os.remove(name)
+
+    def test_reduced_c_other_format(self):
+        '''
+        Other formats are opened at full resolution
+        '''
+        image = os.path.join(data_directory, 'test_segmentation.png')
+        reduced, full_size = image_processing.open_image_reduced(image, 10)
+        self.assertEqual(reduced.size, full_size)
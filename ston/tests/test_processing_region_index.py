@@ -0,0 +1,85 @@
+'''
+This file contains the tests for STON/ston/processing/region_index.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+
+###local imports
+from ston.processing import region_index, segmentation_regions
+
+###Some useful variables
+dummy_image = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                           'test_data/test_segmentation.png')
+
+
+def brute_force(bbox, row, col):
+    '''
+    Regions whose bounding box contains the pixel, by looking at all of them
+    '''
+    return numpy.flatnonzero((bbox[:, 0] <= row) & (row < bbox[:, 2]) &
+                             (bbox[:, 1] <= col) & (col < bbox[:, 3]))
+
+
+class TestRegionIndex(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'RegionIndex'
+    '''
+    def test_1_random_boxes(self):
+        '''
+        Same regions as a search over all the boxes, including
+        very large boxes and pixels outside the grid
+        '''
+        rng = numpy.random.default_rng(2)
+        corner = rng.integers(0, 1000, (5000, 2))
+        size = rng.integers(1, 30, (5000, 2))
+        size[:5] = 800
+        bbox = numpy.concatenate([corner, corner + size], axis=1)
+        index = region_index.RegionIndex(bbox)
+        self.assertEqual(len(index.large), 5)
+
+        for row, col in rng.integers(-50, 1850, (1000, 2)):
+            self.assertEqual(sorted(index.candidates(row, col)),
+                             sorted(brute_force(bbox, row, col)))
+
+    def test_2_regions_of_an_image(self):
+        '''
+        A pixel of each region finds that region (or a smaller one
+        whose box contains the pixel)
+        '''
+        data = numpy.array(Image.open(dummy_image))
+        _, results = segmentation_regions.find_regions(data, {'Analysis': {'minimum_size': 1}})
+        index = region_index.RegionIndex(results['bbox'], cell_size=16)
+
+        for number, (min_row, min_col, max_row, max_col) in enumerate(results['bbox']):
+            ##the smallest box is chosen
+            region = index.find(min_row, min_col)
+            self.assertIn(number, brute_force(results['bbox'], min_row, min_col))
+            box = results['bbox'][region]
+            self.assertLessEqual((box[2] - box[0]) * (box[3] - box[1]),
+                                 (max_row - min_row) * (max_col - min_col))
+
+        ##outside any region
+        self.assertEqual(index.find(-5, -5), -1)
+
+    def test_3_no_region(self):
+        '''
+        An empty list of regions gives no region
+        '''
+        index = region_index.RegionIndex(numpy.zeros((0, 4)))
+        self.assertEqual(index.find(3, 3), -1)
+        self.assertEqual(len(index.candidates(0, 0)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
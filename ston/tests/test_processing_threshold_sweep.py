@@ -0,0 +1,126 @@
+'''
+This file contains the tests for STON/ston/processing/threshold_sweep.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import threading
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+from scipy import ndimage
+
+###local imports
+from ston.processing import threshold_sweep
+
+###Some useful variables
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                              'test_data')
+test_image = os.path.join(data_directory, 'cluster1_1sthalf', '1-ker-ppl.jpg')
+
+
+def label_areas(gray, threshold, minimum_size=1):
+    '''
+    Areas of the regions of 'gray > threshold' by labelling the image
+    '''
+    labels, nlabels = ndimage.label(gray > threshold, numpy.ones((3, 3)))
+    areas = numpy.bincount(labels.ravel(), minlength=nlabels + 1)[1:]
+    return numpy.sort(areas[areas >= minimum_size])[::-1]
+
+
+class TestThresholdSweep(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'ThresholdSweep'
+    '''
+    def test_1_random_image(self):
+        '''
+        Same regions as the labelling for every threshold
+        '''
+        rng = numpy.random.default_rng(4)
+        gray = ndimage.uniform_filter(rng.integers(0, 256, (60, 80)), 3).astype(numpy.uint8)
+        sweep = threshold_sweep.ThresholdSweep(gray)
+
+        for minimum_size in [1, 5]:
+            counts = sweep.counts(minimum_size)
+            for threshold in range(threshold_sweep.NLEVELS):
+                areas = label_areas(gray, threshold, minimum_size)
+                self.assertEqual(counts[threshold], len(areas))
+                self.assertTrue(numpy.array_equal(sweep.areas(threshold, minimum_size),
+                                                  areas))
+
+    def test_2_photo(self):
+        '''
+        Same regions as the labelling on a colour image
+        '''
+        sweep = threshold_sweep.ThresholdSweep(numpy.array(Image.open(test_image)))
+        counts = sweep.counts(10)
+        for threshold in [0, 50, sweep.default_threshold(), 200, 255]:
+            areas = label_areas(sweep.gray, threshold, 10)
+            self.assertEqual(counts[threshold], len(areas))
+            self.assertTrue(numpy.array_equal(sweep.areas(threshold, 10), areas))
+
+    def test_3_white_ratios(self):
+        '''
+        Ratio of white pixels for each threshold
+        '''
+        gray = numpy.array([[0, 10, 10], [200, 255, 3]], dtype=numpy.uint8)
+        ratios = threshold_sweep.ThresholdSweep(gray).white_ratios()
+        for threshold in [0, 5, 10, 199, 200, 255]:
+            self.assertAlmostEqual(ratios[threshold], numpy.mean(gray > threshold))
+
+    def test_4_gray_conversion(self):
+        '''
+        Other grayscale images are rescaled between 0 and 255
+        '''
+        gray = threshold_sweep.to_gray_uint8(numpy.array([[100, 200], [300, 1100]],
+                                                         dtype=numpy.uint16))
+        self.assertEqual(gray.dtype, numpy.uint8)
+        self.assertTrue(numpy.array_equal(gray, [[0, 26], [51, 255]]))
+
+        ##uniform image: no region for any threshold
+        sweep = threshold_sweep.ThresholdSweep(numpy.zeros((5, 5), dtype=numpy.uint8))
+        self.assertEqual(sweep.counts().sum(), 0)
+        self.assertEqual(sweep.default_threshold(), 0)
+
+    def test_5_edges_once(self):
+        '''
+        Each pair of neighbouring pixels is given once, at the level of
+        its darkest pixel, with int32 indices
+        '''
+        gray = numpy.random.default_rng(1).integers(0, 4, size=(7, 9), dtype=numpy.uint8)
+        flat = gray.ravel()
+        pixels = numpy.arange(flat.size, dtype=numpy.int32)
+
+        pairs = []
+        for level in range(4):
+            first, second = threshold_sweep.neighbour_edges(flat, gray.shape,
+                                                            pixels[flat == level], level)
+            self.assertEqual(first.dtype, numpy.int32)
+            self.assertTrue(numpy.all(numpy.minimum(flat[first], flat[second]) == level))
+            pairs += [tuple(sorted(pair)) for pair in zip(first.tolist(), second.tolist())]
+
+        ##8-connectivity: right, down and the two diagonals
+        expected = 7 * 8 + 6 * 9 + 2 * 6 * 8
+        self.assertEqual(len(pairs), expected)
+        self.assertEqual(len(set(pairs)), expected)
+
+    def test_6_cancel(self):
+        '''
+        The sweep stops when it is cancelled
+        '''
+        event = threading.Event()
+        event.set()
+        with self.assertRaises(threshold_sweep.SweepCancelled):
+            threshold_sweep.ThresholdSweep(numpy.zeros((5, 5), dtype=numpy.uint8),
+                                           cancel_event=event)
+
+
+if __name__ == "__main__":
+    unittest.main()
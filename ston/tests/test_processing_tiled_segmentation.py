@@ -0,0 +1,96 @@
+'''
+This file contains the tests for STON/ston/processing/tiled_segmentation.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import shutil
+import tempfile
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+
+###local imports
+from ston.processing import segmentation_regions, tiled_segmentation, batch_segmentation
+
+###Some useful variables
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                              'test_data')
+dummy_images = [os.path.join(data_directory, 'test_segmentation.png'),
+                os.path.join(data_directory, 'test_segmentation2.png')]
+
+
+class TestTiledSegmentation(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the function 'find_regions_tiled'
+    '''
+    def compare(self, data, conf, tile_size, n_processes=1):
+        '''
+        Check that the tiled segmentation gives the same results
+        as find_regions
+        '''
+        labeled, results = segmentation_regions.find_regions(data, conf)
+
+        output = numpy.zeros(data.shape[:2], dtype=numpy.uint8)
+        _, results_tiled = tiled_segmentation.find_regions_tiled(data, conf, tile_size,
+                                                                 n_processes, output)
+
+        self.assertTrue(numpy.array_equal(labeled, output))
+        for key in ['x', 'y', 'area', 'bbox', 'black_ratio', 'white_ratio']:
+            self.assertTrue(numpy.array_equal(results[key], results_tiled[key]), key)
+
+    def test_1_dummy_images(self):
+        '''
+        Same results as find_regions, with tiles that cut the regions
+        '''
+        conf = {'Analysis': {'minimum_size': 2}}
+        for image in dummy_images:
+            data = numpy.array(Image.open(image))
+            for tile_size in [37, 100, 256, 5000]:
+                self.compare(data, conf, tile_size)
+
+    def test_2_minimum_size_and_colour(self):
+        '''
+        Same results with a colour image and a bigger minimum size
+        '''
+        data = numpy.array(Image.open(os.path.join(data_directory,
+                                                   'cluster1_1sthalf/1-ker-ppl.jpg')))
+        self.compare(data, {'Analysis': {'minimum_size': 50}}, 300)
+        self.compare(data, {'Analysis': {'minimum_size': 50, 'low_memory': True}}, 300)
+        self.compare(data, {'Analysis': {'minimum_size': 50, 'grayscale': 'integer'}}, 300)
+
+    def test_3_parallel(self):
+        '''
+        Same results when the tiles are processed in a pool of processes
+        '''
+        data = numpy.array(Image.open(dummy_images[1]))
+        self.compare(data, {'Analysis': {'minimum_size': 2}}, 128, n_processes=2)
+
+    def test_4_union_find(self):
+        '''
+        Labels connected through several borders end up in the same region
+        '''
+        roots = tiled_segmentation.union_find(5, numpy.array([[4, 5], [2, 4], [5, 2], [1, 3]]))
+        self.assertEqual(list(roots), [0, 1, 2, 1, 2, 2])
+
+    def test_5_memmap(self):
+        '''
+        A memory-mapped image is read tile by tile
+        '''
+        directory = tempfile.mkdtemp()
+        name = os.path.join(directory, 'image.npy')
+        numpy.save(name, numpy.array(Image.open(dummy_images[0])))
+
+        data = batch_segmentation.open_image_memmap(name)
+        self.assertIsInstance(data, numpy.memmap)
+        self.compare(data, {'Analysis': {'minimum_size': 2}}, 200)
+
+        del data
+        shutil.rmtree(directory)
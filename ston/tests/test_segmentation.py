@@ -9,6 +9,7 @@ import unittest
 ###Third party library
 import numpy
 from PIL import Image
+from skimage import measure, color
 
 ###local imports
 from ston.processing import segmentation_regions
@@ -106,3 +107,117 @@ class Testsegmentation(unittest.TestCase):
         bbox = (results['bbox'][-1][2]-results['bbox'][-1][0]) * \
                (results['bbox'][-1][3]-results['bbox'][-1][1])
         self.assertEqual(bbox, 4620)
+
+    def test_4_same_as_regionprops(self):
+        '''
+        The measures of all the regions are the same as the ones
+        given by skimage.measure.regionprops
+        '''
+        for image in [dummy_image2,
+                      os.path.join(os.path.dirname(dummy_image), 'cluster1_1sthalf/1-ker-ppl.jpg')]:
+            data = numpy.array(Image.open(image))
+            if len(data.shape) == 3:
+                data = color.rgb2gray(data)
+            labeled = measure.label(data > numpy.mean(data))
+
+            ##small blocks to test the accumulation
+            area, centroid_row, centroid_col, bbox = \
+                    segmentation_regions.measure_regions(labeled, chunk_rows=100)
+
+            properties = measure.regionprops(labeled)
+            self.assertTrue(numpy.array_equal(area, [i.area for i in properties]))
+            self.assertTrue(numpy.array_equal(centroid_row, [i.centroid[0] for i in properties]))
+            self.assertTrue(numpy.array_equal(centroid_col, [i.centroid[1] for i in properties]))
+            self.assertTrue(numpy.array_equal(bbox, [i.bbox for i in properties]))
+
+    def test_5_no_region(self):
+        '''
+        If all the regions are too small, the results are empty
+        '''
+        dummy = numpy.array(Image.open(dummy_image))
+        conf = {}
+        conf['Analysis'] = {'minimum_size':10**9}
+
+        _, results = segmentation_regions.find_regions(dummy, conf)
+        self.assertEqual(len(results['x']), 0)
+        self.assertEqual(len(results['bbox']), 0)
+
+    def test_6_low_memory(self):
+        '''
+        The low memory mode finds the same regions, with smaller labels,
+        and gives the peak memory used
+        '''
+        for image in [dummy_image, dummy_image2,
+                      os.path.join(os.path.dirname(dummy_image), 'cluster1_1sthalf/1-ker-ppl.jpg')]:
+            data = numpy.array(Image.open(image))
+
+            conf = {}
+            conf['Analysis'] = {'minimum_size':2}
+            labeled, results = segmentation_regions.find_regions(data, conf)
+            conf['Analysis']['low_memory'] = True
+            labeled_low, results_low = segmentation_regions.find_regions(data, conf)
+
+            self.assertEqual(labeled_low.dtype, numpy.uint16)
+            self.assertGreater(results_low['peak_memory'], 0)
+
+            if len(data.shape) == 2:
+                ##no grayscale conversion: the results are the same
+                self.assertTrue(numpy.array_equal(labeled, labeled_low))
+                for key in ['x', 'y', 'area', 'bbox', 'black_ratio', 'white_ratio']:
+                    self.assertTrue(numpy.array_equal(results[key], results_low[key]))
+            else:
+                ##float32 grayscale: only pixels at the threshold can change
+                self.assertLess(numpy.count_nonzero(labeled != labeled_low), 10)
+                self.assertAlmostEqual(results['white_ratio'], results_low['white_ratio'],
+                                       places=2)
+
+    def test_7_many_regions(self):
+        '''
+        When there are too many regions for 16 bits labels, 32 bits are used
+        '''
+        binary = numpy.zeros((600, 600), dtype=bool)
+        binary[::2, ::2] = True
+        labeled = segmentation_regions.label_low_memory(binary)
+        self.assertEqual(labeled.dtype, numpy.int32)
+        self.assertEqual(labeled.max(), 300 * 300)
+
+    def test_8_integer_grayscale(self):
+        '''
+        The integer grayscale gives the rgb2gray values (rounded to 256 levels)
+        and regions very close to the ones of the float conversion
+        '''
+        data = numpy.array(Image.open(os.path.join(os.path.dirname(dummy_image),
+                                                   'cluster1_1sthalf/1-ker-ppl.jpg')))
+        gray = segmentation_regions.grayscale_uint8(data)
+        self.assertEqual(gray.dtype, numpy.uint8)
+        self.assertLessEqual(numpy.abs(gray - color.rgb2gray(data) * 255).max(), 1)
+
+        ##extreme values do not overflow
+        white = numpy.full((2, 2, 3), 255, dtype=numpy.uint8)
+        self.assertTrue(numpy.all(segmentation_regions.grayscale_uint8(white) == 255))
+
+        ##integer threshold: integer part of the mean
+        self.assertEqual(segmentation_regions.mean_threshold(gray), int(numpy.mean(gray)))
+
+        conf = {}
+        conf['Analysis'] = {'minimum_size':2}
+        labeled, results = segmentation_regions.find_regions(data, conf)
+        conf['Analysis']['grayscale'] = 'integer'
+        labeled_int, results_int = segmentation_regions.find_regions(data, conf)
+
+        ##only pixels very close to the threshold can change
+        self.assertLess(numpy.count_nonzero(labeled != labeled_int), 0.005 * labeled.size)
+        self.assertAlmostEqual(results['white_ratio'], results_int['white_ratio'], places=2)
+        self.assertLess(abs(len(results['area']) - len(results_int['area'])),
+                        0.02 * len(results['area']))
+        self.assertTrue(numpy.allclose(results['area'][:10], results_int['area'][:10],
+                                       rtol=0.05))
+
+        ##grayscale images are not converted: same results
+        data = numpy.array(Image.open(dummy_image2))
+        conf['Analysis']['grayscale'] = 'float'
+        labeled, results = segmentation_regions.find_regions(data, conf)
+        conf['Analysis']['grayscale'] = 'integer'
+        labeled_int, results_int = segmentation_regions.find_regions(data, conf)
+        self.assertTrue(numpy.array_equal(labeled, labeled_int))
+        self.assertTrue(numpy.array_equal(results['area'], results_int['area']))
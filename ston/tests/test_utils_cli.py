@@ -56,3 +56,17 @@ class CommandLine(unittest.TestCase):
         self.assertFalse(parsed['tests'])
         self.assertEqual(parsed['config'], 'test')
         self.assertFalse(parsed['makeconfig'])
+
+    def test_4_batchsegment(self):
+        '''
+        Use of the batch segmentation args
+        '''
+        ##Call the function
+        parsed = cli.command_line_interface(['--batchsegment', 'results', '--resume',
+                                             '--processes', '4'])
+
+        ##check arguments
+        self.assertEqual(parsed['batchsegment'], 'results')
+        self.assertTrue(parsed['resume'])
+        self.assertEqual(parsed['processes'], 4)
+        self.assertIsNone(parsed['images'])
@@ -8,6 +8,9 @@ Year: 2024-2025
 
 ###standard library
 import os
+import re
+import shutil
+import tempfile
 import unittest
 
 ###Third party library
@@ -52,6 +55,7 @@ class TestGetDefaultConf(unittest.TestCase):
 
         self.assertEqual(default['General_image_display']['image_width'], 200)
         self.assertEqual(default['General_image_display']['downgrade_factor'], 10)
+        self.assertEqual(default['General_image_display']['image_cache_size'], 1000)
 
         self.assertEqual(default['Analysis']['pix_to_mm'], 0.02)
         self.assertEqual(default['Analysis']['minimum_size'], 1)
@@ -104,3 +108,19 @@ class TestConfGetLoadConf(unittest.TestCase):
         self.assertEqual(loaded['Project_info']['name'], 'Test_configuration')
         self.assertCountEqual(loaded['Project_info']['extensions'], ['*.tif', '*.jpeg', '*.JPG', '*.JPEG', '*.jpg'])
         self.assertTrue(loaded['Meta_image_options']['name_on_images'])
+
+    def test_c_invalid_grayscale(self):
+        '''
+        Test that an invalid grayscale conversion is rejected
+        '''
+        with open(self.test_conf, encoding='utf-8') as conffile:
+            text = conffile.read()
+
+        directory = tempfile.mkdtemp()
+        invalid_conf = os.path.join(directory, 'invalid.conf')
+        with open(invalid_conf, 'w', encoding='utf-8') as conffile:
+            conffile.write(re.sub(r'(?im)^grayscale\s*=.*$', 'Grayscale = double', text))
+
+        with self.assertRaises(ValueError):
+            conf.load_conf(invalid_conf)
+        shutil.rmtree(directory)
@@ -121,6 +121,50 @@ class ExploreGetDirAndFiles(unittest.TestCase):
         ###check that we have an empty dict
         self.assertFalse(file_dict)
 
+class TestIndexDirAndFiles(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the function 'index_dir_and_files'
+    '''
+    def test_1_same_as_get_dir_and_files(self):
+        '''
+        The directory dictionary is the one given by get_dir_and_files
+        '''
+        file_dict, _ = explore_files.index_dir_and_files(data_directory, extensions)
+        self.assertEqual(file_dict, explore_files.get_dir_and_files(data_directory, extensions))
+
+    def test_2_name_index(self):
+        '''
+        The reverse index gives the path of each file
+        '''
+        file_dict, name_index = explore_files.index_dir_and_files(data_directory, extensions)
+
+        ##Same number of files in the index and the dictionary
+        nfiles = sum(len(files) for files in file_dict.values())
+        self.assertEqual(nfiles, sum(len(paths) for paths in name_index.values()))
+
+        ##And check one of them
+        expected = os.path.join(data_directory, 'cluster1_1sthalf', '5-ker-ppl.jpg')
+        self.assertEqual(name_index['5-ker-ppl.jpg'], [expected])
+
+    def test_3_extensions_with_star(self):
+        '''
+        Extensions from the configuration start with a star
+        '''
+        file_dict, _ = explore_files.index_dir_and_files(data_directory, ['*.jpg'])
+        self.assertEqual(file_dict, explore_files.get_dir_and_files(data_directory, ['.jpg']))
+
+    def test_4_match_extension(self):
+        '''
+        File names are matched on the end of their name
+        '''
+        lookup = explore_files.make_extension_lookup(['*.jpg', '.tif', 'FITS'])
+        self.assertTrue(explore_files.match_extension('image.jpg', lookup))
+        self.assertTrue(explore_files.match_extension('image.tif', lookup))
+        self.assertTrue(explore_files.match_extension('imageFITS', lookup))
+        self.assertFalse(explore_files.match_extension('image.jpeg', lookup))
+        self.assertFalse(explore_files.match_extension('jpg', lookup))
+
 class TestGetFilesAndPath(unittest.TestCase):
     '''
     This is the class where the tests are defined
@@ -202,3 +246,34 @@ class TestGetFilesAndPath(unittest.TestCase):
         ##And check
         self.assertCountEqual(expected_file_no_path, file_no_path)
         self.assertCountEqual(expected_file_with_path, file_with_path)
+
+    def test_e_folder_expansion(self):
+        '''
+        A directory name gives all the files of that directory
+        '''
+        ##prepare expected output
+        expected_file_no_path = ['1-ker-ppl.jpg', '2-ker-ppl.jpg', '3-ker-ppl.jpg',
+                                 '4-ker-ppl.jpg', '5-ker-ppl.jpg']
+        expected_file_with_path = [os.path.join(data_directory, 'cluster1_1sthalf', i)
+                                   for i in expected_file_no_path]
+
+        ##call the function (the file 5 is also selected, it must appear once)
+        file_with_path,\
+            file_no_path = explore_files.get_files_and_path(['cluster1_1sthalf', '5-ker-ppl.jpg'],
+                                                            self.file_dict, [])
+
+        ##And check
+        self.assertCountEqual(expected_file_no_path, file_no_path)
+        self.assertCountEqual(expected_file_with_path, file_with_path)
+
+    def test_f_folder_expansion_with_ignore(self):
+        '''
+        Files to ignore are not added when a directory is expanded
+        '''
+        ##call the function
+        _, file_no_path = explore_files.get_files_and_path(['cluster1_1sthalf'],
+                                                           self.file_dict,
+                                                           ['1-ker-ppl.jpg', '2-ker-ppl.jpg'])
+
+        ##And check
+        self.assertCountEqual(['3-ker-ppl.jpg', '4-ker-ppl.jpg', '5-ker-ppl.jpg'], file_no_path)
@@ -0,0 +1,116 @@
+'''
+This file contains the tests for STON/ston/utils/image_cache.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import shutil
+import tempfile
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+
+###local imports
+from ston.utils import image_cache
+
+
+class TestImageCache(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'ImageCache'
+    '''
+    def setUp(self):
+        '''
+        Each test gets its own directory, with 3 images of 30 kB
+        '''
+        self.directory = tempfile.mkdtemp()
+        self.images = []
+        for n in range(3):
+            name = os.path.join(self.directory, f'image{n}.png')
+            Image.fromarray(numpy.full((100, 100, 3), n, dtype=numpy.uint8)).save(name)
+            self.images.append(name)
+
+    def tearDown(self):
+        '''
+        Remove the directory
+        '''
+        shutil.rmtree(self.directory)
+
+    def test_1_hit(self):
+        '''
+        The second time, the same (read-only) array is given
+        '''
+        cache = image_cache.ImageCache(1)
+        first = cache.get(self.images[0])
+        self.assertTrue(numpy.array_equal(first, numpy.array(Image.open(self.images[0]))))
+        self.assertFalse(first.flags.writeable)
+        with self.assertRaises(ValueError):
+            first[0, 0, 0] = 1
+
+        self.assertIs(cache.get(self.images[0]), first)
+        self.assertIs(cache.peek(self.images[0]), first)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+        ##not in the cache: not decoded by peek
+        self.assertIsNone(cache.peek(self.images[1]))
+
+    def test_2_memory_budget(self):
+        '''
+        The least recently used images are removed (size in bytes)
+        '''
+        cache = image_cache.ImageCache(70000 / (1024 * 1024))
+        cache.get(self.images[0])
+        cache.get(self.images[1])
+        cache.get(self.images[0])
+        cache.get(self.images[2])
+
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+        self.assertIsNotNone(cache.peek(self.images[0]))
+        self.assertIsNone(cache.peek(self.images[1]))
+        self.assertIsNotNone(cache.peek(self.images[2]))
+
+        ##an image bigger than the cache is given but not kept
+        cache = image_cache.ImageCache(10000 / (1024 * 1024))
+        self.assertEqual(cache.get(self.images[0]).shape, (100, 100, 3))
+        self.assertEqual(cache.nbytes, 0)
+
+    def test_3_modified_file(self):
+        '''
+        A modified file is decoded again
+        '''
+        cache = image_cache.ImageCache(1)
+        first = cache.get(self.images[0])
+
+        Image.fromarray(numpy.full((100, 100, 3), 200, dtype=numpy.uint8)).save(self.images[0])
+        stat = os.stat(self.images[0])
+        os.utime(self.images[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.assertIsNone(cache.peek(self.images[0]))
+        second = cache.get(self.images[0])
+        self.assertIsNot(second, first)
+        self.assertTrue(numpy.all(second == 200))
+        self.assertEqual(cache.nbytes, second.nbytes)
+
+    def test_4_conf(self):
+        '''
+        Cache created from the configuration (0: no cache)
+        '''
+        cache = image_cache.cache_from_conf({'General_image_display': {'image_cache_size': 5}})
+        self.assertEqual(cache.max_bytes, 5 * 1024 * 1024)
+        self.assertIsNone(image_cache.cache_from_conf({'General_image_display':
+                                                       {'image_cache_size': 0}}))
+
+        ##without cache the image is decoded each time
+        data = image_cache.load_image_data(self.images[1])
+        self.assertFalse(data.flags.writeable)
+        self.assertIsNot(image_cache.load_image_data(self.images[1]), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
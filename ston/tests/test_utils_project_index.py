@@ -0,0 +1,145 @@
+'''
+This file contains the tests for STON/ston/utils/project_index.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import shutil
+import tempfile
+import unittest
+
+###Third party library
+
+###local imports
+from ston.utils import project_index, explore_files
+
+
+def touch(name):
+    '''
+    Create an empty file
+    '''
+    with open(name, 'w', encoding='utf-8'):
+        pass
+
+def age_directories(root):
+    '''
+    Put the modification time of all the directories in the past
+    (so the index trusts them)
+    '''
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (1e9, 1e9))
+
+
+class TestProjectIndex(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'ProjectIndex'
+    '''
+    def setUp(self):
+        '''
+        Create a small project
+        '''
+        self.root = tempfile.mkdtemp()
+        for directory in ['a', 'a/b', 'c']:
+            os.makedirs(os.path.join(self.root, directory))
+            touch(os.path.join(self.root, directory, 'image.jpg'))
+            touch(os.path.join(self.root, directory, 'notes.txt'))
+        age_directories(self.root)
+        self.extensions = ['*.jpg']
+
+    def tearDown(self):
+        '''
+        Remove the project
+        '''
+        shutil.rmtree(self.root)
+
+    def test_1_same_as_explore_files(self):
+        '''
+        The files dictionary is the same as the one from get_dir_and_files
+        '''
+        index = project_index.ProjectIndex(self.root, self.extensions)
+        index.refresh()
+        self.assertEqual(index.files_dict(),
+                         explore_files.get_dir_and_files(self.root, self.extensions))
+        self.assertEqual(index.nscanned, 4)
+
+    def test_2_saved_index(self):
+        '''
+        When the project is opened again, no directory is listed
+        '''
+        project_index.ProjectIndex(self.root, self.extensions).refresh()
+        age_directories(self.root)
+
+        index = project_index.ProjectIndex(self.root, self.extensions)
+        added, removed = index.refresh()
+        self.assertEqual(index.nscanned, 0)
+        self.assertFalse(added)
+        self.assertFalse(removed)
+        self.assertEqual(len(index.files_dict()), 3)
+
+    def test_3_new_and_removed_files(self):
+        '''
+        Only the directories that changed are listed again
+        '''
+        index = project_index.ProjectIndex(self.root, self.extensions)
+        index.refresh()
+        ##the first save of the index modified the root directory
+        age_directories(self.root)
+        index.refresh()
+
+        touch(os.path.join(self.root, 'a', 'b', 'new.jpg'))
+        os.remove(os.path.join(self.root, 'c', 'image.jpg'))
+        added, removed = index.refresh()
+
+        self.assertEqual(index.nscanned, 2)
+        self.assertEqual(added, {os.path.join(self.root, 'a', 'b'): ['new.jpg']})
+        self.assertEqual(removed, {os.path.join(self.root, 'c'): ['image.jpg']})
+        self.assertNotIn(os.path.join(self.root, 'c'), index.files_dict())
+
+    def test_4_new_directory(self):
+        '''
+        A new directory is found
+        '''
+        index = project_index.ProjectIndex(self.root, self.extensions)
+        index.refresh()
+
+        os.makedirs(os.path.join(self.root, 'a', 'd'))
+        touch(os.path.join(self.root, 'a', 'd', 'image.jpg'))
+        added, _ = index.refresh()
+        self.assertEqual(added, {os.path.join(self.root, 'a', 'd'): ['image.jpg']})
+
+    def test_5_other_extensions(self):
+        '''
+        An index made with other extensions is not used
+        '''
+        project_index.ProjectIndex(self.root, self.extensions).refresh()
+
+        index = project_index.ProjectIndex(self.root, ['*.txt'])
+        index.refresh()
+        self.assertEqual(index.nscanned, 4)
+        self.assertEqual(index.files_dict()[os.path.join(self.root, 'c')], ['notes.txt'])
+
+    def test_6_lookups(self):
+        '''
+        Files are found from their names, directories are expanded
+        '''
+        index = project_index.ProjectIndex(self.root, self.extensions)
+        index.refresh()
+
+        ##several files have that name, we get one of them
+        self.assertIn(index.find('image.jpg'),
+                      [os.path.join(self.root, i, 'image.jpg') for i in ['a', 'a/b', 'c']])
+        self.assertIsNone(index.find('missing.jpg'))
+
+        with_path, without_path = index.resolve(['b', 'image.jpg'], [])
+        self.assertEqual(with_path, [os.path.join(self.root, 'a', 'b', 'image.jpg')])
+        self.assertEqual(without_path, ['image.jpg'])
+
+        ##the lookups follow the changes of the project
+        touch(os.path.join(self.root, 'c', 'new.jpg'))
+        index.refresh()
+        self.assertEqual(index.find('new.jpg'), os.path.join(self.root, 'c', 'new.jpg'))
@@ -0,0 +1,170 @@
+'''
+This file contains the tests for STON/ston/utils/region_cache.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+###Third party library
+import numpy
+from PIL import Image
+
+###local imports
+from ston.utils import region_cache
+from ston.processing import segmentation_regions
+
+#####define some variable that we will use everywhere
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                              'test_data')
+image = numpy.array(Image.open(os.path.join(data_directory, 'test_segmentation2.png')))
+
+
+class CountCalls:
+    '''
+    find_regions, counting the number of calls
+    '''
+    def __init__(self):
+        self.ncalls = 0
+
+    def __call__(self, image_data, conf):
+        self.ncalls += 1
+        return segmentation_regions.find_regions(image_data, conf)
+
+
+class TestRegionCache(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'RegionCache'
+    '''
+    def setUp(self):
+        '''
+        Each test gets its own directory
+        '''
+        self.directory = tempfile.mkdtemp()
+        self.conf = {'Analysis': {'minimum_size': 2}}
+
+    def tearDown(self):
+        '''
+        Remove the directory
+        '''
+        shutil.rmtree(self.directory)
+
+    def check_same(self, first, second):
+        '''
+        Check that two results of find_regions are the same
+        '''
+        self.assertTrue(numpy.array_equal(first[0], second[0]))
+        self.assertEqual(first[0].dtype, second[0].dtype)
+        self.assertEqual(first[1].keys(), second[1].keys())
+        for key in first[1]:
+            self.assertTrue(numpy.array_equal(first[1][key], second[1][key]))
+
+    def test_1_memory(self):
+        '''
+        The second call with the same image and parameters is not computed
+        '''
+        cache = region_cache.RegionCache()
+        function = CountCalls()
+
+        first = cache.find_regions(image, self.conf, function)
+        second = cache.find_regions(image.copy(), self.conf, function)
+        self.assertEqual(function.ncalls, 1)
+        self.check_same(first, second)
+        self.check_same(first, segmentation_regions.find_regions(image, self.conf))
+
+    def test_2_parameters_and_content(self):
+        '''
+        Another minimum size, or another image, is computed again
+        '''
+        cache = region_cache.RegionCache()
+        function = CountCalls()
+
+        cache.find_regions(image, self.conf, function)
+        cache.find_regions(image, {'Analysis': {'minimum_size': 3000}}, function)
+        cache.find_regions(image[100:, 100:], self.conf, function)
+        self.assertEqual(function.ncalls, 3)
+
+    def test_3_lru(self):
+        '''
+        The least recently used results are removed when the cache is full
+        '''
+        ##each result is about 65kB
+        cache = region_cache.RegionCache(max_size=0.15)
+        function = CountCalls()
+        crops = [image, image[1:], image[2:]]
+
+        cache.find_regions(crops[0], self.conf, function)
+        cache.find_regions(crops[1], self.conf, function)
+        cache.find_regions(crops[0], self.conf, function)
+        cache.find_regions(crops[2], self.conf, function)
+        self.assertEqual(function.ncalls, 3)
+
+        ##crops[1] was removed, not crops[0]
+        cache.find_regions(crops[0], self.conf, function)
+        self.assertEqual(function.ncalls, 3)
+        cache.find_regions(crops[1], self.conf, function)
+        self.assertEqual(function.ncalls, 4)
+
+    def test_4_disk(self):
+        '''
+        Results saved on disk are found by a new cache (new session)
+        '''
+        function = CountCalls()
+        first = region_cache.RegionCache(directory=self.directory).find_regions(
+                    image, self.conf, function)
+        second = region_cache.RegionCache(directory=self.directory).find_regions(
+                    image, self.conf, function)
+        self.assertEqual(function.ncalls, 1)
+        self.check_same(first, second)
+
+    def test_5_from_conf(self):
+        '''
+        The cache is disabled with a size of 0, on disk in the project if requested
+        '''
+        config = {'Project_info': {'directory': self.directory},
+                  'Analysis': {'region_cache_size': 0}}
+        self.assertIsNone(region_cache.cache_from_conf(config))
+
+        config['Analysis'] = {'region_cache_on_disk': True}
+        cache = region_cache.cache_from_conf(config)
+        self.assertTrue(cache.directory.startswith(self.directory))
+
+    def test_6_peak_memory(self):
+        '''
+        The peak memory is given by the computation, not by the cache
+        '''
+        cache = region_cache.RegionCache(directory=self.directory)
+        conf = {'Analysis': {'minimum_size': 2, 'low_memory': True}}
+
+        _, computed = cache.find_regions(image, conf, segmentation_regions.find_regions)
+        self.assertGreater(computed['peak_memory'], 0)
+        _, cached = cache.find_regions(image, conf, segmentation_regions.find_regions)
+        self.assertNotIn('peak_memory', cached)
+        _, cached = region_cache.RegionCache(directory=self.directory).find_regions(
+                        image, conf, segmentation_regions.find_regions)
+        self.assertNotIn('peak_memory', cached)
+
+    def test_7_key_of_crop(self):
+        '''
+        A cropped image has the key of its copy, and is not copied to
+        compute it
+        '''
+        crop = numpy.repeat(image, 20, axis=0)[50:-50, 10:-10]
+        self.assertFalse(crop.flags.c_contiguous)
+        expected = region_cache.RegionCache.make_key(crop.copy(), self.conf)
+
+        tracemalloc.start()
+        key = region_cache.RegionCache.make_key(crop, self.conf)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.assertEqual(key, expected)
+        self.assertLess(peak, crop.nbytes // 10)
@@ -0,0 +1,180 @@
+'''
+This file contains the tests for STON/ston/utils/thumbnail_cache.py
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+'''
+
+###standard library
+import os
+import shutil
+import tempfile
+import unittest
+
+###Third party library
+
+###local imports
+from ston.utils import thumbnail_cache
+
+#####define some variable that we will use everywhere
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                              'test_data')
+image = os.path.join(data_directory, 'cluster1_1sthalf/1-ker-ppl.jpg')
+
+
+class TestThumbnailCache(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the class 'ThumbnailCache'
+    '''
+    def setUp(self):
+        '''
+        Each test gets its own cache and a copy of an image
+        '''
+        self.directory = tempfile.mkdtemp()
+        self.image = os.path.join(self.directory, 'image.jpg')
+        shutil.copyfile(image, self.image)
+        self.cache = thumbnail_cache.ThumbnailCache(os.path.join(self.directory,
+                                                                 'cache.sqlite'), 1)
+
+    def tearDown(self):
+        '''
+        Remove the cache and the image
+        '''
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_1_miss_then_hit(self):
+        '''
+        A thumbnail is not found before it is stored, and found after
+        '''
+        data, size = self.cache.get(self.image, 10)
+        self.assertIsNone(data)
+        self.assertIsNone(size)
+
+        self.cache.put(self.image, 10, b'\x01' * 400, (10, 10))
+        data, size = self.cache.get(self.image, 10)
+        self.assertEqual(data, b'\x01' * 400)
+        self.assertEqual(size, (10, 10))
+
+    def test_2_downgrade_factor_in_key(self):
+        '''
+        The same image with another downgrade factor is another thumbnail
+        '''
+        self.cache.put(self.image, 10, b'\x01' * 400, (10, 10))
+        data, _ = self.cache.get(self.image, 5)
+        self.assertIsNone(data)
+
+    def test_3_modified_file(self):
+        '''
+        When the file is modified the thumbnail is not valid anymore
+        '''
+        self.cache.put(self.image, 10, b'\x01' * 400, (10, 10))
+
+        ##change the modification time of the file
+        stat = os.stat(self.image)
+        os.utime(self.image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        data, _ = self.cache.get(self.image, 10)
+        self.assertIsNone(data)
+
+    def test_4_eviction(self):
+        '''
+        When the cache is full, the least recently used thumbnails are removed
+        '''
+        ##random data do not compress: 3 x 400kB in a cache of 1MB
+        images = []
+        for i in range(3):
+            name = os.path.join(self.directory, f'image{i}.jpg')
+            shutil.copyfile(image, name)
+            images.append(name)
+
+        self.cache.put(images[0], 10, os.urandom(400000), (500, 200))
+        self.cache.put(images[1], 10, os.urandom(400000), (500, 200))
+        ##use the first one, the second is now the least recently used
+        self.cache.get(images[0], 10)
+        self.cache.put(images[2], 10, os.urandom(400000), (500, 200))
+
+        self.assertIsNotNone(self.cache.get(images[0], 10)[0])
+        self.assertIsNone(self.cache.get(images[1], 10)[0])
+        self.assertIsNotNone(self.cache.get(images[2], 10)[0])
+        self.assertLessEqual(self.cache.size(), 1024 * 1024)
+
+    def test_5_accesses_in_batches(self):
+        '''
+        The last accesses are written every ACCESS_BATCH hits and when
+        the cache is closed
+        '''
+        self.cache.put(self.image, 10, b'\x01' * 400, (10, 10))
+        key = self.cache.make_key(self.image, 10)
+        stored = self.cache.connection.execute('SELECT last_access FROM thumbnails '
+                                               'WHERE key = ?', (key,)).fetchone()[0]
+
+        self.cache.get(self.image, 10)
+        self.assertIn(key, self.cache.accessed)
+        written = self.cache.connection.execute('SELECT last_access FROM thumbnails '
+                                                'WHERE key = ?', (key,)).fetchone()[0]
+        self.assertEqual(written, stored)
+
+        ##written after ACCESS_BATCH hits
+        for _ in range(thumbnail_cache.ACCESS_BATCH - 1):
+            self.cache.get(self.image, 10)
+        self.assertEqual(self.cache.accessed, {})
+        written = self.cache.connection.execute('SELECT last_access FROM thumbnails '
+                                                'WHERE key = ?', (key,)).fetchone()[0]
+        self.assertGreater(written, stored)
+
+        ##the last access is written when the cache is closed
+        self.cache.get(self.image, 10)
+        last = self.cache.accessed[key]
+        self.cache.close()
+        self.cache = thumbnail_cache.ThumbnailCache(os.path.join(self.directory,
+                                                                 'cache.sqlite'), 1)
+        written = self.cache.connection.execute('SELECT last_access FROM thumbnails '
+                                                'WHERE key = ?', (key,)).fetchone()[0]
+        self.assertEqual(written, last)
+
+    def test_6_size(self):
+        '''
+        The size of the cache is kept when thumbnails are replaced,
+        and read again when the cache is opened
+        '''
+        self.cache.put(self.image, 10, os.urandom(1000), (20, 10))
+        self.cache.put(self.image, 10, os.urandom(2000), (20, 25))
+        self.cache.put(self.image, 5, os.urandom(3000), (30, 25))
+        size = self.cache.size()
+        self.assertEqual(size, self.cache.connection.execute(
+                         'SELECT SUM(nbytes) FROM thumbnails').fetchone()[0])
+
+        self.cache.close()
+        self.cache = thumbnail_cache.ThumbnailCache(os.path.join(self.directory,
+                                                                 'cache.sqlite'), 1)
+        self.assertEqual(self.cache.size(), size)
+
+
+class TestCacheFromConf(unittest.TestCase):
+    '''
+    This is the class where the tests are defined
+    for the function 'cache_from_conf'
+    '''
+    def test_a_disabled(self):
+        '''
+        A size of 0 disables the cache
+        '''
+        config = {'Project_info': {'directory': tempfile.gettempdir()},
+                  'General_image_display': {'thumbnail_cache_size': 0}}
+        self.assertIsNone(thumbnail_cache.cache_from_conf(config))
+
+    def test_b_in_project(self):
+        '''
+        The cache is created in the project directory
+        '''
+        directory = tempfile.mkdtemp()
+        config = {'Project_info': {'directory': directory},
+                  'General_image_display': {}}
+        cache = thumbnail_cache.cache_from_conf(config)
+        self.assertTrue(os.path.isfile(os.path.join(directory, thumbnail_cache.CACHE_DIRECTORY,
+                                                    thumbnail_cache.CACHE_FILE)))
+        cache.close()
+        shutil.rmtree(directory)
@@ -45,6 +45,20 @@ def command_line_interface(args):
     parser.add_argument('--makeconfig', help='This command will create blank configuration'+\
                                              ' file in the current directory', action='store_true')
     parser.add_argument('--tests', action='store_true', help='Run ston tests')
+    parser.add_argument('--batchsegment', metavar='OUTPUT_DIRECTORY', default=None,
+                        help='Run the region identification on all the images of'+\
+                             '\nthe project (without GUI) and save the results in'+\
+                             '\nOUTPUT_DIRECTORY')
+    parser.add_argument('--images', default=None,
+                        help='With --batchsegment: glob pattern of the images to process'+\
+                             "\n(e.g. 'data/**/*.tif'). Default: all the project images")
+    parser.add_argument('--resume', action='store_true',
+                        help='With --batchsegment: skip the images already processed')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='With --batchsegment: number of processes (default: all cores)')
+    parser.add_argument('--tilesize', type=int, default=0,
+                        help='With --batchsegment: segment the images by tiles of'+\
+                             '\nTILESIZE pixels (for images that do not fit in memory)')
     parser.add_argument('--version', action='version', version='1.0')
 
     ###analyse the arguments
@@ -14,6 +14,10 @@ import os
 import configparser
 from pathlib import Path
 
+###Conversions to grayscale of the region identification
+###(see segmentation_regions.to_grayscale)
+GRAYSCALE_OPTIONS = ('float', 'integer')
+
 def default_conf():
     '''
     This function creates an default configuration
@@ -85,6 +89,11 @@ def load_conf(file):
     ------
     config	: dict
                   configuration
+
+    Raises
+    ------
+    ValueError
+                  if an option has an invalid value
     '''
 
     ###Check that the file exist
@@ -109,6 +118,11 @@ def load_conf(file):
     extensions = loadconf['Project_info']['extensions'].split(';')
     config['Project_info']['extensions'] = ['*'+i for i in extensions]
 
+    ###Interval (in seconds) between two checks of the project directory
+    ###(0 or missing: the directory is not watched)
+    config['Project_info']['watch_interval'] = \
+                int(config['Project_info'].get('watch_interval', 0))
+
     ##zoom
     config['Zoom_window']['closeup_window_size'] = \
                 int(config['Zoom_window']['closeup_window_size'])
@@ -119,7 +133,18 @@ def load_conf(file):
 
     ##All elements in the 'Analysis' section are float
     for i in config['Analysis']:
-        config['Analysis'][i] = float(config['Analysis'][i])
+        if i == 'grayscale':
+            config['Analysis'][i] = config['Analysis'][i].lower()
+            if config['Analysis'][i] not in GRAYSCALE_OPTIONS:
+                raise ValueError(f"Invalid grayscale '{config['Analysis'][i]}' "
+                                 f"(options: {', '.join(GRAYSCALE_OPTIONS)})")
+        elif i not in ['low_memory', 'region_cache_on_disk']:
+            config['Analysis'][i] = float(config['Analysis'][i])
+        else:
+            if config['Analysis'][i].lower() == 'yes':
+                config['Analysis'][i] = True
+            else:
+                config['Analysis'][i] = False
 
     ##All elements in the 'Option' section are ints
     for i in config['General_image_display']:
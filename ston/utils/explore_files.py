@@ -10,13 +10,148 @@ Year: 2024-2025
 
 ####Standard Library
 import os
-import glob
-from collections import Counter
 
 ##Third party
 
 ##local imports
 
+def make_extension_lookup(extensions):
+    '''
+    This function prepares the extensions for a fast matching of the file names.
+    Extensions are grouped by length, so that checking a file name only needs
+    one set lookup per extension length (usually a single one).
+
+    Parameters
+    ----------
+    extensions  : list
+                  of possible files extensions (e.g. ['*.jpg', '.tif'])
+
+    return
+    ------
+    lookup      :   dict
+                    with key=length of the extension
+                         value=set of extensions with that length
+    '''
+    lookup = {}
+    for ext in extensions:
+        ##Remove stars from extension
+        ext = os.path.normcase(ext.lstrip('*'))
+        lookup.setdefault(len(ext), set()).add(ext)
+
+    return lookup
+
+
+def match_extension(filename, lookup):
+    '''
+    This function checks if a file name ends with one of the extensions
+
+    Parameters
+    ----------
+    filename    :   str
+                    name of the file
+    lookup      :   dict
+                    from make_extension_lookup
+
+    return
+    ------
+    match       :   bool
+                    True if the extension of the file is one of the extensions
+    '''
+    filename = os.path.normcase(filename)
+    for length, exts in lookup.items():
+        if len(filename) >= length and filename[len(filename)-length:] in exts:
+            return True
+
+    return False
+
+
+def scan_directory(directory, lookup):
+    '''
+    This function lists a single directory (not recursive).
+    Hidden files and directories (starting with a '.') are ignored.
+
+    Parameters
+    ----------
+    directory   :   str
+                    directory to list
+    lookup      :   dict
+                    from make_extension_lookup
+
+    return
+    ------
+    files       :   list
+                    names of the files with a matching extension
+    subdirs     :   list
+                    paths of the sub directories
+    '''
+    files = []
+    subdirs = []
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                    elif match_extension(entry.name, lookup):
+                        files.append(entry.name)
+                except OSError:
+                    ##e.g. broken link
+                    continue
+    except OSError:
+        ##Directory that we can not read
+        pass
+
+    return files, subdirs
+
+
+def index_dir_and_files(root, extensions):
+    '''
+    This function gets all the files and sub directories
+    from a root path given in argument, in a single walk of the tree.
+    It also creates a reverse index to find files from their names.
+
+    Parameters
+    ----------
+    root  : str
+            root path
+    extensions  : list
+                  of possible files extensions
+
+    return
+    ------
+    files_dict    :   dictionary
+                      with key=directory
+                           value=list of files in that directory
+    name_index    :   dictionary
+                      with key=file name
+                           value=list of files (with path) with that name
+    '''
+    file_dict = {}
+    name_index = {}
+    lookup = make_extension_lookup(extensions)
+
+    ##Walk the tree
+    to_visit = [root]
+    while to_visit:
+        directory = to_visit.pop()
+        files, subdirs = scan_directory(directory, lookup)
+
+        if files:
+            ###same key as os.path.dirname of a file in that directory
+            key = os.path.dirname(os.path.join(directory, files[0]))
+            file_dict[key] = files
+            for file in files:
+                name_index.setdefault(file, []).append(os.path.join(key, file))
+
+        ##go deeper (reversed so the directories are visited in the listing order)
+        to_visit.extend(reversed(subdirs))
+
+    return file_dict, name_index
+
+
 def get_dir_and_files(root, extensions):
     '''
     This function gets all the files and sub directories
@@ -37,38 +172,92 @@ def get_dir_and_files(root, extensions):
                       with key=directory
                            value=list of files in that directory
     '''
+    file_dict, _ = index_dir_and_files(root, extensions)
 
-    file_dict = {}
-    all_files = []
+    return file_dict
 
-    ##Remove stars from extension
-    extensions = [i.lstrip('*') for i in extensions]
 
-    ##Get all files, recusrively
-    for ext in extensions:
-        all_files_for_that_extension = glob.glob(os.path.join(root, f'**/*{ext}'),
-                                                 recursive=True)
+def build_name_index(file_dict):
+    '''
+    This function creates the lookup tables used to find files from
+    their names, and the directories from their names
+
+    Parameters
+    ----------
+    file_dict   :   dict
+                    files dictionary
+                    keys = absolute path
+                    values = filename
 
-        all_files += all_files_for_that_extension
+    Returns
+    -------
+    name_index      :   dict
+                        with key=file name
+                             value=list of files (with path) with that name
+    folder_index    :   dict
+                        with key=name of the directory (without path)
+                             value=list of directories (with path) with that name
+    '''
+    name_index = {}
+    folder_index = {}
+    for folder, files in file_dict.items():
+        folder_index.setdefault(os.path.basename(folder), []).append(folder)
+        for file in files:
+            name_index.setdefault(file, []).append(os.path.join(folder, file))
 
-    ##Extract directory names
-    all_dir = []
-    for file in all_files:
-        all_dir.append(os.path.dirname(file))
+    return name_index, folder_index
 
-    ###Using Counter with are counting the number of time each directory
-    ###Appears. We don't care about the number but just the list of
-    ###directories. With them we create the entries in the final dictionary
-    for directory in Counter(all_dir):
-        file_dict[directory] = []
 
-    ###And fill up the dictionary
-    for file in all_files:
-        for directory in file_dict:
-            if os.path.dirname(file) == directory:
-                file_dict[directory].append(os.path.basename(file))
+def resolve_files(filelist_selected, file_dict, name_index, folder_index, ignorefiles):
+    '''
+    This function creates a list of files (with their path) from
+    a list of names, using the lookup tables from build_name_index.
+    If a name is the name of a directory, all the files of that
+    directory are added.
 
-    return file_dict
+    Parameters
+    ----------
+    filelist_selected   :   list
+                            list of names (files or directories)
+    file_dict           :   dict
+                            files dictionary
+    name_index          :   dict
+                            from build_name_index
+    folder_index        :   dict
+                            from build_name_index
+    ignorefiles         :   list
+                            of files not to add to the final list
+
+    Returns
+    -------
+    list_with_path      : list
+                          of files with their path
+    list_without_path   : list
+                          list of filenames
+    '''
+    list_with_path = []
+    list_without_path = []
+
+    ##files already found (only once per name) or to be ignored
+    seen = set(ignorefiles)
+
+    for name in filelist_selected:
+        ###a directory: we take all its files
+        if name in folder_index:
+            for folder in folder_index[name]:
+                for file in file_dict[folder]:
+                    if file not in seen:
+                        seen.add(file)
+                        list_with_path.append(os.path.join(folder, file))
+                        list_without_path.append(file)
+
+        ###a file: we take the first one with that name
+        elif name in name_index and name not in seen:
+            seen.add(name)
+            list_with_path.append(name_index[name][0])
+            list_without_path.append(name)
+
+    return list_with_path, list_without_path
 
 
 def get_files_and_path(filelist_selected, original_file_dict, ignorefiles):
@@ -76,6 +265,8 @@ def get_files_and_path(filelist_selected, original_file_dict, ignorefiles):
     This function checks creates a list of files (with there path).
     If goes over the filelist_selected list and find where they are
     located in the original_file_dict
+    If a name is the name of a directory, all the files of that
+    directory are added.
 
     Parameters
     ----------
@@ -96,19 +287,7 @@ def get_files_and_path(filelist_selected, original_file_dict, ignorefiles):
     list_without_path   : list
                           list of filenames
     '''
-    list_with_path = []
-    list_without_path = []
+    name_index, folder_index = build_name_index(original_file_dict)
 
-    for name in filelist_selected:
-        ##for each entry in the list we check in the dictionary
-        for folder in original_file_dict:
-            ###first we have to check the name is a folder
-            if os.path.basename(folder) != name:
-                ##if not we can try to find the file. We also check that it was not already
-                ##found in another folder
-                for file in original_file_dict[folder]:
-                    if file == name and file not in list_without_path and file not in ignorefiles:
-                        list_with_path.append(os.path.join(folder,name))
-                        list_without_path.append(name)
-
-    return list_with_path, list_without_path
+    return resolve_files(filelist_selected, original_file_dict,
+                         name_index, folder_index, ignorefiles)
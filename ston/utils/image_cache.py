@@ -0,0 +1,248 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the cache of the decoded images, shared by all the windows:
+an image opened in the detail window, the comparison window, etc. is
+decoded once and kept in memory while there is room for it.
+
+The images are kept as read-only numpy arrays (the windows never modify
+them, they get the same array each time). The least recently used
+images are removed first when the cache is bigger than its maximum size
+(in bytes), and an image is decoded again if its file was modified.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import os
+import threading
+from collections import OrderedDict
+
+##Third party
+import numpy
+from PIL import Image
+
+##local imports
+
+###Default maximum size of the cache [MB]
+DEFAULT_SIZE = 1000
+
+
+def decode_image(name_and_path):
+    '''
+    This function opens and decodes an image
+
+    Parameters
+    ----------
+    name_and_path   :   str
+                        name of the image with its path
+
+    Return
+    ------
+    data            :   numpy array
+                        decoded image (read-only), palette images
+                        are converted to RGB(A)
+    '''
+    with Image.open(name_and_path) as image:
+        ##palette images are given with their colours
+        if image.mode in ['P', 'PA']:
+            transparent = image.mode == 'PA' or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+        data = numpy.array(image)
+    data.flags.writeable = False
+
+    return data
+
+
+class ImageCache:
+    '''
+    This class keeps the decoded images
+    '''
+    def __init__(self, max_size=DEFAULT_SIZE):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        max_size    :   float
+                        maximum size of the cache in MB
+        '''
+        self.max_bytes = max_size * 1024 * 1024
+        self.lock = threading.Lock()
+
+        ###{path: (modification time, size of the file, data)}
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+        ###number of images found in the cache, and decoded
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_state(name_and_path):
+        '''
+        Modification time and size of a file (to know if it changed)
+
+        Parameters
+        ----------
+        name_and_path   :   str
+                            name of the image with its path
+
+        Return
+        ------
+        state           :   tuple
+                            (modification time [ns], size [bytes])
+        '''
+        stat = os.stat(name_and_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def peek(self, name_and_path):
+        '''
+        Retrieve an image if it is in the cache (it is not decoded otherwise)
+
+        Parameters
+        ----------
+        name_and_path   :   str
+                            name of the image with its path
+
+        Return
+        ------
+        data            :   numpy array or None
+                            decoded image (read-only), None if not in the cache
+        '''
+        key = os.path.abspath(name_and_path)
+        try:
+            state = self.file_state(key)
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[:2] != state:
+                ##the file was modified
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def get(self, name_and_path):
+        '''
+        Retrieve an image from the cache, or decode it (and keep it)
+
+        Parameters
+        ----------
+        name_and_path   :   str
+                            name of the image with its path
+
+        Return
+        ------
+        data            :   numpy array
+                            decoded image (read-only)
+        '''
+        data = self.peek(name_and_path)
+        if data is not None:
+            return data
+
+        key = os.path.abspath(name_and_path)
+        state = self.file_state(key)
+        data = decode_image(key)
+
+        with self.lock:
+            self.misses += 1
+            self.remember(key, state, data)
+
+        return data
+
+    def remember(self, key, state, data):
+        '''
+        Add an image to the cache and remove the least recently used
+        images if the cache is too big (called with the lock)
+
+        Parameters
+        ----------
+        key     :   str
+                    absolute path of the image
+        state   :   tuple
+                    (modification time, size) of the file
+        data    :   numpy array
+                    decoded image
+        '''
+        ##an image bigger than the cache is not kept
+        if data.nbytes > self.max_bytes:
+            return
+
+        self.remove(key)
+        self.entries[key] = (state[0], state[1], data)
+        self.nbytes += data.nbytes
+
+        while self.nbytes > self.max_bytes:
+            _, oldest = self.entries.popitem(last=False)
+            self.nbytes -= oldest[2].nbytes
+
+    def remove(self, key):
+        '''
+        Remove an image from the cache (called with the lock)
+
+        Parameters
+        ----------
+        key     :   str
+                    absolute path of the image
+        '''
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2].nbytes
+
+    def clear(self):
+        '''
+        Remove all the images from the cache
+        '''
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+def load_image_data(name_and_path, cache=None):
+    '''
+    This function gives the decoded image, from the cache if there is one
+
+    Parameters
+    ----------
+    name_and_path   :   str
+                        name of the image with its path
+    cache           :   ImageCache or None
+                        cache of the decoded images
+
+    Return
+    ------
+    data            :   numpy array
+                        decoded image (read-only)
+    '''
+    if cache is None:
+        return decode_image(name_and_path)
+
+    return cache.get(name_and_path)
+
+
+def cache_from_conf(config):
+    '''
+    This function creates the cache of the decoded images
+
+    Parameters
+    ----------
+    config  :   dict
+                configuration of STON
+
+    Return
+    ------
+    cache   :   ImageCache or None
+                None if the cache is disabled (size of 0)
+    '''
+    max_size = config['General_image_display'].get('image_cache_size', DEFAULT_SIZE)
+    if max_size <= 0:
+        return None
+
+    return ImageCache(max_size)
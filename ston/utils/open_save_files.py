@@ -8,11 +8,26 @@ Year: 2024-2025
 """
 ###Python standard library
 import os
+import csv
 
 ##Third party
+import numpy
 
 ##Local imports
 
+###Columns of the region catalogues (text files)
+CATALOGUE_COLUMNS = ['x', 'y', 'area[pixels]', 'area[mm2]',
+                     'bbox_min_row', 'bbox_min_col', 'bbox_max_row', 'bbox_max_col']
+
+###Typed columns of the region catalogues (binary files)
+CATALOGUE_DTYPE = numpy.dtype([('x', numpy.float64), ('y', numpy.float64),
+                               ('area_pixels', numpy.int64), ('area_mm2', numpy.float64),
+                               ('bbox_min_row', numpy.int64), ('bbox_min_col', numpy.int64),
+                               ('bbox_max_row', numpy.int64), ('bbox_max_col', numpy.int64)])
+
+###Number of rows formatted at once when writing text catalogues
+BUFFER_ROWS = 10000
+
 def save_txt_to_file(file, txt):
     '''
     This function open the file given in argument
@@ -69,3 +84,139 @@ def open_txt_file(file):
         txt = 'The file was not found'
 
     return txt
+
+def catalogue_columns(results, conversion):
+    '''
+    This function gives the columns of the catalogue of regions
+
+    Parameters
+    ----------
+    results     :   dict
+                    results of find_regions (x, y, area, bbox)
+    conversion  :   float
+                    area of a pixel in mm2
+
+    Return
+    ------
+    columns     :   list
+                    of numpy arrays, in the order of CATALOGUE_DTYPE
+    '''
+    area = numpy.asarray(results['area'])
+    bbox = numpy.asarray(results['bbox']).reshape(-1, 4)
+
+    return [numpy.asarray(results['x']), numpy.asarray(results['y']),
+            area.astype(numpy.int64), conversion * area.astype(numpy.float64),
+            *[bbox[:, i].astype(numpy.int64) for i in range(4)]]
+
+
+def save_catalogue_text(file, results, conversion, delimiter=',', comment=''):
+    '''
+    This function writes the catalogue of regions in a text file.
+    The rows are formatted and written by blocks of BUFFER_ROWS, so the
+    whole catalogue is never held as text in memory.
+
+    Parameters
+    ----------
+    file        :   str
+                    path/to/file
+    results     :   dict
+                    results of find_regions (x, y, area, bbox)
+    conversion  :   float
+                    area of a pixel in mm2
+    delimiter   :   str
+                    between the columns
+    comment     :   str
+                    added before the header (e.g. '#')
+    '''
+    columns = catalogue_columns(results, conversion)
+
+    with open(file, 'w', newline='', encoding='utf-8') as textfile:
+        writer = csv.writer(textfile, delimiter=delimiter, lineterminator='\n')
+        textfile.write(comment)
+        writer.writerow(CATALOGUE_COLUMNS)
+        for start in range(0, len(columns[0]), BUFFER_ROWS):
+            writer.writerows(zip(*[column[start:start + BUFFER_ROWS].tolist()
+                                   for column in columns]))
+
+
+def save_catalogue_npy(file, results, conversion):
+    '''
+    This function writes the catalogue of regions in a binary numpy file
+    (structured array with the columns of CATALOGUE_DTYPE). The rows are
+    written by blocks of BUFFER_ROWS after the header of the file.
+
+    Parameters
+    ----------
+    file        :   str
+                    path/to/file.npy
+    results     :   dict
+                    results of find_regions (x, y, area, bbox)
+    conversion  :   float
+                    area of a pixel in mm2
+    '''
+    columns = catalogue_columns(results, conversion)
+    nrows = len(columns[0])
+
+    with open(file, 'wb') as npyfile:
+        numpy.lib.format.write_array_header_1_0(npyfile, {
+            'descr': numpy.lib.format.dtype_to_descr(CATALOGUE_DTYPE),
+            'fortran_order': False, 'shape': (nrows,)})
+
+        block = numpy.empty(min(nrows, BUFFER_ROWS), dtype=CATALOGUE_DTYPE)
+        for start in range(0, nrows, BUFFER_ROWS):
+            rows = block[:min(BUFFER_ROWS, nrows - start)]
+            for name, column in zip(CATALOGUE_DTYPE.names, columns):
+                rows[name] = column[start:start + len(rows)]
+            npyfile.write(rows.tobytes())
+
+
+def open_catalogue(file):
+    '''
+    This function opens a binary catalogue of regions without loading it:
+    the file is memory-mapped and only the columns (or rows) used are read
+
+    Parameters
+    ----------
+    file        :   str
+                    path/to/file.npy
+
+    Return
+    ------
+    catalogue   :   numpy memmap
+                    structured array, e.g. catalogue['area_mm2']
+    '''
+    return numpy.load(file, mmap_mode='r')
+
+
+def save_catalogue(file, results, conversion):
+    '''
+    This function saves the catalogue of regions. The format is chosen with
+    the extension: .npy (binary), .csv (comma separated), other extensions
+    are tab separated text with a commented header
+
+    Parameters
+    ----------
+    file        :   str
+                    path/to/file
+    results     :   dict
+                    results of find_regions (x, y, area, bbox)
+    conversion  :   float
+                    area of a pixel in mm2
+
+    Return
+    ------
+    status      :  str
+                   message
+    '''
+    if not os.path.isdir(os.path.dirname(os.path.abspath(file))):
+        return f'Directory {os.path.dirname(file)} does not exist...File not saved'
+
+    extension = os.path.splitext(file)[1].lower()
+    if extension == '.npy':
+        save_catalogue_npy(file, results, conversion)
+    elif extension == '.csv':
+        save_catalogue_text(file, results, conversion)
+    else:
+        save_catalogue_text(file, results, conversion, delimiter='\t', comment='#')
+
+    return f'File {file} was saved on disk'
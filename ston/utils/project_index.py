@@ -0,0 +1,243 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the index of the project files.
+The index records the modification time of each directory and is
+saved in the project directory. When the project is opened again
+(or when it is refreshed), only the directories that changed are
+listed again.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import os
+import json
+import time
+
+##Third party
+
+##local imports
+from . import explore_files
+from .thumbnail_cache import CACHE_DIRECTORY
+
+###Name of the index file (in the cache directory of the project)
+INDEX_FILE = 'project_index.json'
+
+
+class ProjectIndex:
+    '''
+    This class keeps the list of the files of the project, directory
+    by directory, with the modification time of each directory.
+    '''
+    ###A directory modified less than this (in ns) before it was listed
+    ###might still change within the same mtime tick: we will list it again
+    RACY_WINDOW = 2 * 10**9
+
+    def __init__(self, root, extensions, index_file=None):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        root        :   str
+                        root directory of the project
+        extensions  :   list
+                        of possible files extensions
+        index_file  :   str or None
+                        where the index is saved. By default it is
+                        in the cache directory of the project
+        '''
+        self.root = root
+        self.extensions = list(extensions)
+        self.lookup = explore_files.make_extension_lookup(self.extensions)
+
+        if index_file is None:
+            index_file = os.path.join(root, CACHE_DIRECTORY, INDEX_FILE)
+        self.index_file = index_file
+
+        ###key = directory, value = {'mtime', 'files', 'subdirs'}
+        self.directories = {}
+
+        ###number of directories listed during the last refresh
+        self.nscanned = 0
+
+        ###files dictionary and lookup tables (see explore_files.build_name_index)
+        ###kept in a single tuple so they are always replaced together
+        self.tables = ({}, {}, {})
+
+        self.load()
+
+    def load(self):
+        '''
+        Load the index saved on disk (if it exists and was made for
+        the same root directory and extensions)
+        '''
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as indexfile:
+                saved = json.load(indexfile)
+        except (OSError, ValueError):
+            return
+
+        if saved.get('root') == self.root and \
+           sorted(saved.get('extensions', [])) == sorted(self.extensions):
+            self.directories = saved.get('directories', {})
+
+    def save(self):
+        '''
+        Save the index on disk. If the project directory is read-only
+        the index is simply not saved.
+        '''
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            tmpfile = self.index_file + '.tmp'
+            with open(tmpfile, 'w', encoding='utf-8') as indexfile:
+                json.dump({'root': self.root, 'extensions': self.extensions,
+                           'directories': self.directories}, indexfile)
+            os.replace(tmpfile, self.index_file)
+        except OSError:
+            pass
+
+    def refresh(self):
+        '''
+        Update the index. Only the directories whose modification time
+        changed are listed again.
+
+        Return
+        ------
+        added       :   dict
+                        with key=directory
+                             value=list of new files in that directory
+        removed     :   dict
+                        with key=directory
+                             value=list of files removed from that directory
+        '''
+        old = self.directories
+        new = {}
+        self.nscanned = 0
+
+        to_visit = [self.root]
+        while to_visit:
+            directory = to_visit.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                ##removed in the meantime
+                continue
+
+            previous = old.get(directory)
+            if previous is not None and previous['mtime'] == mtime:
+                entry = previous
+            else:
+                files, subdirs = explore_files.scan_directory(directory, self.lookup)
+                self.nscanned += 1
+
+                ##Do not trust an mtime that is too recent
+                if time.time_ns() - mtime < self.RACY_WINDOW:
+                    mtime = None
+                entry = {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+
+            new[directory] = entry
+            to_visit.extend(reversed(entry['subdirs']))
+
+        ###Compare the old and new lists
+        added = {}
+        removed = {}
+        for directory in new.keys() | old.keys():
+            new_files = new[directory]['files'] if directory in new else []
+            old_files = old[directory]['files'] if directory in old else []
+            if new_files is old_files:
+                continue
+
+            old_set = set(old_files)
+            new_set = set(new_files)
+            key = self.directory_key(directory)
+            if new_set - old_set:
+                added[key] = [file for file in new_files if file not in old_set]
+            if old_set - new_set:
+                removed[key] = [file for file in old_files if file not in new_set]
+
+        self.directories = new
+        if added or removed or not self.tables[0]:
+            files = {self.directory_key(directory): list(entry['files'])
+                     for directory, entry in new.items() if entry['files']}
+            self.tables = (files, *explore_files.build_name_index(files))
+        self.save()
+
+        return added, removed
+
+    @staticmethod
+    def directory_key(directory):
+        '''
+        Key of a directory in the files dictionary (same as
+        os.path.dirname of a file in that directory)
+
+        Parameters
+        ----------
+        directory   :   str
+                        directory
+
+        Return
+        ------
+        key         :   str
+                        key of the directory
+        '''
+        return os.path.dirname(os.path.join(directory, 'file'))
+
+    def files_dict(self):
+        '''
+        Return the files dictionary (same as explore_files.get_dir_and_files)
+
+        Return
+        ------
+        files_dict    :   dictionary
+                          with key=directory
+                               value=list of files in that directory
+        '''
+        return self.tables[0]
+
+    def find(self, name):
+        '''
+        Find a file from its name
+
+        Parameters
+        ----------
+        name    :   str
+                    name of the file
+
+        Return
+        ------
+        path    :   str or None
+                    the file with its path (the first one if several
+                    files have that name), None if it is not found
+        '''
+        paths = self.tables[1].get(name)
+        if paths:
+            return paths[0]
+
+        return None
+
+    def resolve(self, filelist_selected, ignorefiles):
+        '''
+        Create a list of files (with their path) from a list of names
+        (see explore_files.resolve_files)
+
+        Parameters
+        ----------
+        filelist_selected   :   list
+                                list of names (files or directories)
+        ignorefiles         :   list
+                                of files not to add to the final list
+
+        Returns
+        -------
+        list_with_path      : list
+                              of files with their path
+        list_without_path   : list
+                              list of filenames
+        '''
+        files, name_index, folder_index = self.tables
+
+        return explore_files.resolve_files(filelist_selected, files, name_index,
+                                           folder_index, ignorefiles)
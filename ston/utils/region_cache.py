@@ -0,0 +1,342 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the cache of the region identification results.
+Results are keyed by a hash of the image data and of the analysis
+parameters. They are kept in memory (least recently used are removed
+first) and, optionally, on disk in the project directory (compressed
+npz files) so they are kept between sessions.
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import os
+import hashlib
+from collections import OrderedDict
+
+##Third party
+import numpy
+
+##local imports
+from .thumbnail_cache import CACHE_DIRECTORY
+
+###Where the results are saved on disk, inside the project directory
+REGIONS_DIRECTORY = 'regions'
+
+###Default maximum size of the in-memory cache [MB]
+DEFAULT_SIZE = 200
+
+###Maximum size of the on-disk cache [MB]
+DISK_SIZE = 500
+
+###Parameters of the analysis that change the results
+PARAMETERS = ['minimum_size', 'low_memory', 'grayscale']
+
+###Keys of the results that are arrays
+ARRAYS = ['x', 'y', 'area', 'bbox']
+
+###Keys of the results measured during the computation: they are not
+###stored (they would be wrong when the results come from the cache)
+MEASURED = ['peak_memory']
+
+
+class RegionCache:
+    '''
+    This class keeps the results of find_regions
+    '''
+    def __init__(self, max_size=DEFAULT_SIZE, directory=None):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        max_size    :   float
+                        maximum size of the in-memory cache in MB
+        directory   :   str or None
+                        where the results are saved on disk.
+                        None: the results are only kept in memory
+        '''
+        self.max_bytes = max_size * 1024 * 1024
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    @staticmethod
+    def make_key(image_data, conf):
+        '''
+        Create the key of an image and of the analysis parameters.
+        The image on display may have been enhanced, cropped or filtered,
+        so the key is a hash of its pixels: it reads the whole image once
+        (about as long as reading it from memory), but does not copy it.
+        A cropped image (not contiguous) is hashed row by row, so at most
+        one row is copied.
+
+        Parameters
+        ----------
+        image_data  :   numpy array
+                        data of the image
+        conf        :   dict
+                        configuration of STON
+
+        Return
+        ------
+        key         :   str
+                        key of the results in the cache
+        '''
+        data = numpy.asarray(image_data)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f'{data.shape}|{data.dtype.str}|'.encode('utf-8'))
+        digest.update(f"{[conf['Analysis'].get(i) for i in PARAMETERS]}|".encode('utf-8'))
+
+        ##same bytes as the contiguous image, without copying it
+        rows = [data] if data.flags.c_contiguous or data.ndim < 2 else data
+        for row in rows:
+            digest.update(memoryview(numpy.ascontiguousarray(row)).cast('B'))
+
+        return digest.hexdigest()
+
+    def get(self, key):
+        '''
+        Retrieve results from the cache (memory first, then disk)
+
+        Parameters
+        ----------
+        key         :   str
+                        key of the results
+
+        Return
+        ------
+        entry       :   dict or None
+                        packed results (see pack), None if not in the cache
+        '''
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        entry = self.load(key)
+        if entry is not None:
+            self.remember(key, entry)
+
+        return entry
+
+    def remember(self, key, entry):
+        '''
+        Add results to the in-memory cache and remove the least
+        recently used results if the cache is too big
+
+        Parameters
+        ----------
+        key         :   str
+                        key of the results
+        entry       :   dict
+                        packed results
+        '''
+        self.entries[key] = entry
+        self.nbytes += entry_size(entry)
+
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, oldest = self.entries.popitem(last=False)
+            self.nbytes -= entry_size(oldest)
+
+    def load(self, key):
+        '''
+        Load results from the disk
+
+        Parameters
+        ----------
+        key         :   str
+                        key of the results
+
+        Return
+        ------
+        entry       :   dict or None
+                        packed results, None if not on disk
+        '''
+        if self.directory is None:
+            return None
+
+        name = os.path.join(self.directory, key + '.npz')
+        try:
+            with numpy.load(name, allow_pickle=False) as npz:
+                entry = {i: npz[i] for i in npz.files}
+            ##for the eviction of the oldest files
+            os.utime(name)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return entry
+
+    def save(self, key, entry):
+        '''
+        Save results on disk (if there is a directory). The oldest files
+        are removed when the directory is bigger than DISK_SIZE
+
+        Parameters
+        ----------
+        key         :   str
+                        key of the results
+        entry       :   dict
+                        packed results
+        '''
+        if self.directory is None:
+            return
+
+        name = os.path.join(self.directory, key + '.npz')
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(name + '.tmp', 'wb') as npzfile:
+                numpy.savez_compressed(npzfile, **entry)
+            os.replace(name + '.tmp', name)
+
+            files = [i for i in os.scandir(self.directory) if i.name.endswith('.npz')]
+            total = sum(i.stat().st_size for i in files)
+            for oldfile in sorted(files, key=lambda i: i.stat().st_mtime):
+                if total <= DISK_SIZE * 1024 * 1024:
+                    break
+                total -= oldfile.stat().st_size
+                os.remove(oldfile.path)
+        except OSError:
+            ##read-only project directory: results stay in memory
+            pass
+
+    def find_regions(self, image_data, conf, function):
+        '''
+        Return the results of the region identification from the cache,
+        or compute them (and store them) if they are not in the cache
+
+        Parameters
+        ----------
+        image_data  :   numpy array
+                        data of the image
+        conf        :   dict
+                        configuration of STON
+        function    :   callable
+                        segmentation_regions.find_regions (or equivalent)
+
+        Return
+        ------
+        labeled     :   numpy array
+                        segmented images
+        result      :   dict
+                        with results
+        '''
+        key = self.make_key(image_data, conf)
+        entry = self.get(key)
+        if entry is not None:
+            return unpack(entry)
+
+        labeled_image, results = function(image_data, conf)
+        entry = pack(labeled_image, results)
+        self.remember(key, entry)
+        self.save(key, entry)
+
+        ##the measurements of this computation are given back
+        labeled_image, cached = unpack(entry)
+        for name in MEASURED:
+            if name in results:
+                cached[name] = results[name]
+
+        return labeled_image, cached
+
+
+def pack(labeled_image, results):
+    '''
+    This function packs the results to store them: the segmented image
+    (0/1) is saved as bits, the numbers as arrays (the measurements of
+    the computation, see MEASURED, are not stored)
+
+    Parameters
+    ----------
+    labeled_image   :   numpy array
+                        segmented image (0/1)
+    results         :   dict
+                        with results
+
+    Return
+    ------
+    entry           :   dict
+                        of numpy arrays
+    '''
+    entry = {'labeled': numpy.packbits(labeled_image > 0),
+             'shape': numpy.array(labeled_image.shape),
+             'dtype': numpy.array(labeled_image.dtype.str)}
+    for key, value in results.items():
+        if key not in MEASURED:
+            entry['result_' + key] = numpy.asarray(value)
+
+    return entry
+
+
+def unpack(entry):
+    '''
+    This function rebuilds the results from what was stored
+
+    Parameters
+    ----------
+    entry           :   dict
+                        of numpy arrays (see pack)
+
+    Return
+    ------
+    labeled_image   :   numpy array
+                        segmented image (0/1)
+    results         :   dict
+                        with results (copies: they can be modified)
+    '''
+    shape = tuple(entry['shape'])
+    labeled_image = numpy.unpackbits(entry['labeled'], count=int(numpy.prod(shape)))
+    labeled_image = labeled_image.reshape(shape).astype(str(entry['dtype']))
+
+    results = {}
+    for key, value in entry.items():
+        name = key[len('result_'):]
+        if key.startswith('result_') and name not in MEASURED:
+            results[name] = value.copy() if name in ARRAYS else float(value)
+
+    return labeled_image, results
+
+
+def entry_size(entry):
+    '''
+    Size of stored results
+
+    Parameters
+    ----------
+    entry   :   dict
+                of numpy arrays
+
+    Return
+    ------
+    nbytes  :   int
+                size in bytes
+    '''
+    return sum(value.nbytes for value in entry.values())
+
+
+def cache_from_conf(config):
+    '''
+    This function creates the region cache of the project given
+    in the configuration
+
+    Parameters
+    ----------
+    config  :   dict
+                configuration of STON
+
+    Return
+    ------
+    cache   :   RegionCache or None
+                None if the cache is disabled (size of 0)
+    '''
+    max_size = config['Analysis'].get('region_cache_size', DEFAULT_SIZE)
+    if max_size <= 0:
+        return None
+
+    directory = None
+    if config['Analysis'].get('region_cache_on_disk', False):
+        directory = os.path.join(config['Project_info']['directory'], CACHE_DIRECTORY,
+                                 REGIONS_DIRECTORY)
+
+    return RegionCache(max_size, directory)
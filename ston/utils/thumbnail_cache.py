@@ -0,0 +1,261 @@
+"""
+This file is part of the STON project (P.I. E. Dammer)
+It contains the on-disk cache of the thumbnails.
+Thumbnails are stored in a single SQLite file in the project
+directory, keyed by the file path, size, modification time and
+downgrade factor. The least recently used thumbnails are removed
+when the cache grows bigger than its maximum size.
+
+Reading a thumbnail does not write in the file: the last accesses are
+kept in memory and written in batches (every ACCESS_BATCH hits, before
+an eviction, and when the cache is closed).
+
+Author: R. Thomas
+Place: U. of Sheffield, RSE team
+Year: 2024-2025
+"""
+
+####Standard Library
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+##Third party
+
+##local imports
+
+###Where the cache is stored, inside the project directory
+CACHE_DIRECTORY = '.ston_cache'
+CACHE_FILE = 'thumbnails.sqlite'
+
+###Default maximum size of the cache [MB]
+DEFAULT_SIZE = 500
+
+###Number of last accesses kept in memory before they are written
+ACCESS_BATCH = 64
+
+
+class ThumbnailCache:
+    '''
+    This class gives access to the thumbnail cache.
+    It can be shared between threads (the thumbnail loader uses it
+    from its thread pool).
+    '''
+    def __init__(self, cache_file, max_size):
+        '''
+        Class constructor
+
+        Parameters
+        ----------
+        cache_file  :   str
+                        path/to/the/cache/file (created if it does not exist)
+
+        max_size    :   int
+                        maximum size of the cache in MB
+        '''
+        self.cache_file = cache_file
+        self.max_bytes = max_size * 1024 * 1024
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(cache_file, timeout=10,
+                                          check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS thumbnails '
+                                '(key TEXT PRIMARY KEY, width INTEGER, height INTEGER, '
+                                'nbytes INTEGER, last_access REAL, data BLOB)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS access '
+                                'ON thumbnails (last_access)')
+        self.connection.commit()
+
+        ###size of the data in the cache [bytes], kept up to date by put/evict
+        self.nbytes = self.connection.execute('SELECT COALESCE(SUM(nbytes), 0) '
+                                              'FROM thumbnails').fetchone()[0]
+
+        ###last accesses not written yet {key: time}, and number of hits since
+        ###they were last written
+        self.accessed = {}
+        self.nhits = 0
+
+    @staticmethod
+    def make_key(name_and_path, downgrade_factor):
+        '''
+        Create the key of an image. It changes when the file is modified
+
+        Parameters
+        ----------
+        name_and_path   :   str
+                            name of the image with its path
+        downgrade_factor:   float
+                            downgrade factor applied to the original image
+
+        Return
+        ------
+        key             :   str
+                            key of the thumbnail in the cache
+        '''
+        stat = os.stat(name_and_path)
+        identity = f'{os.path.abspath(name_and_path)}|{stat.st_size}|' +\
+                   f'{stat.st_mtime_ns}|{downgrade_factor}'
+
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+    def get(self, name_and_path, downgrade_factor):
+        '''
+        Retrieve a thumbnail from the cache
+
+        Parameters
+        ----------
+        name_and_path   :   str
+                            name of the image with its path
+        downgrade_factor:   float
+                            downgrade factor applied to the original image
+
+        Return
+        ------
+        data            :   bytes or None
+                            RGBA data of the thumbnail (None if not in the cache)
+        size            :   tuple or None
+                            (width, height) of the thumbnail
+        '''
+        key = self.make_key(name_and_path, downgrade_factor)
+
+        with self.lock:
+            row = self.connection.execute('SELECT width, height, data FROM thumbnails '
+                                          'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None, None
+
+            ##keep the last access (for the LRU eviction), written later
+            self.accessed[key] = time.time()
+            self.nhits += 1
+            if self.nhits >= ACCESS_BATCH:
+                self.flush_accesses()
+                self.connection.commit()
+
+        width, height, data = row
+        return zlib.decompress(data), (width, height)
+
+    def put(self, name_and_path, downgrade_factor, data, size):
+        '''
+        Store a thumbnail in the cache
+
+        Parameters
+        ----------
+        name_and_path   :   str
+                            name of the image with its path
+        downgrade_factor:   float
+                            downgrade factor applied to the original image
+        data            :   bytes
+                            RGBA data of the thumbnail
+        size            :   tuple
+                            (width, height) of the thumbnail
+        '''
+        key = self.make_key(name_and_path, downgrade_factor)
+        compressed = zlib.compress(data, 1)
+
+        with self.lock:
+            ##a thumbnail already in the cache is replaced
+            old = self.connection.execute('SELECT nbytes FROM thumbnails WHERE key = ?',
+                                          (key,)).fetchone()
+            if old is not None:
+                self.nbytes -= old[0]
+
+            self.connection.execute('INSERT OR REPLACE INTO thumbnails '
+                                    'VALUES (?, ?, ?, ?, ?, ?)',
+                                    (key, size[0], size[1], len(compressed),
+                                     time.time(), compressed))
+            self.accessed.pop(key, None)
+            self.nbytes += len(compressed)
+            self.evict()
+            self.connection.commit()
+
+    def flush_accesses(self):
+        '''
+        Write the last accesses kept in memory. Must be called with the lock
+        (the caller commits).
+        '''
+        self.nhits = 0
+        if not self.accessed:
+            return
+        self.connection.executemany('UPDATE thumbnails SET last_access = ? WHERE key = ?',
+                                    [(when, key) for key, when in self.accessed.items()])
+        self.accessed.clear()
+
+    def evict(self):
+        '''
+        Remove the least recently used thumbnails until the cache
+        is smaller than its maximum size. Must be called with the lock.
+        '''
+        if self.nbytes <= self.max_bytes:
+            return
+
+        ##the order of the thumbnails needs the last accesses
+        self.flush_accesses()
+
+        rows = self.connection.execute('SELECT key, nbytes FROM thumbnails '
+                                       'ORDER BY last_access')
+        to_remove = []
+        for key, nbytes in rows:
+            if self.nbytes <= self.max_bytes:
+                break
+            to_remove.append((key,))
+            self.nbytes -= nbytes
+
+        self.connection.executemany('DELETE FROM thumbnails WHERE key = ?', to_remove)
+
+    def size(self):
+        '''
+        Return the size of the cached data
+
+        Return
+        ------
+        nbytes  :   int
+                    size in bytes of the data in the cache
+        '''
+        with self.lock:
+            return self.nbytes
+
+    def close(self):
+        '''
+        Write the last accesses and close the cache file
+        '''
+        with self.lock:
+            try:
+                self.flush_accesses()
+                self.connection.commit()
+            except sqlite3.Error:
+                ##the last accesses are lost, the thumbnails are still valid
+                pass
+            self.connection.close()
+
+
+def cache_from_conf(config):
+    '''
+    This function creates the thumbnail cache of the project
+    given in the configuration
+
+    Parameters
+    ----------
+    config  :   dict
+                configuration of STON
+
+    Return
+    ------
+    cache   :   ThumbnailCache or None
+                None if the cache is disabled (size of 0) or if it
+                can not be created (e.g. read-only project directory)
+    '''
+    max_size = config['General_image_display'].get('thumbnail_cache_size', DEFAULT_SIZE)
+    if max_size <= 0:
+        return None
+
+    directory = os.path.join(config['Project_info']['directory'], CACHE_DIRECTORY)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        cache = ThumbnailCache(os.path.join(directory, CACHE_FILE), max_size)
+    except (OSError, sqlite3.Error):
+        cache = None
+
+    return cache